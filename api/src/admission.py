@@ -0,0 +1,364 @@
+"""
+Admission Control
+
+Bounds the judging done by the API endpoints that compile and run code in the
+request (/solution, /custom_test and their streaming variants, /vote, match
+setting validation), so that a burst of submissions waits or is turned away
+instead of starting an unbounded number of compilers and sandboxes.
+
+- Global limit: at most JUDGE_ADMISSION_MAX_CONCURRENT requests judge at once in
+  this API process.
+- Per-user limit: a user has at most JUDGE_ADMISSION_MAX_PER_USER requests judging
+  or waiting.
+- Bounded wait: when every slot is taken, up to JUDGE_ADMISSION_MAX_WAITING requests
+  wait for one, first come first served, for at most JUDGE_ADMISSION_MAX_WAIT_SECONDS.
+  The wait happens on the event loop: a waiting request holds no threadpool
+  thread, so waiters cannot starve the sync endpoints of the API.
+
+Requests that cannot be admitted are answered 429 with a Retry-After header,
+estimated from the current backlog. Queued judge jobs (judge_queue.py) do not go
+through admission: they are already bounded by the number of queue workers.
+
+On top of that, each student has a token bucket (JUDGE_RATE_LIMIT_PER_MINUTE,
+bursts of JUDGE_RATE_LIMIT_BURST) spent by every request to a student judge
+endpoint, queued submissions included (see rate_limit_or_raise()).
+
+Counters (queue depth, wait times, rejections) are reported at GET /api/judge/stats
+(teachers and admins).
+"""
+
+import asyncio
+import collections
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+JUDGE_ADMISSION_ENABLED = os.getenv("JUDGE_ADMISSION_ENABLED", "true").lower() == "true"
+JUDGE_ADMISSION_MAX_CONCURRENT = int(os.getenv("JUDGE_ADMISSION_MAX_CONCURRENT", str(os.cpu_count() or 2)))
+JUDGE_ADMISSION_MAX_PER_USER = int(os.getenv("JUDGE_ADMISSION_MAX_PER_USER", "2"))
+JUDGE_ADMISSION_MAX_WAITING = int(os.getenv("JUDGE_ADMISSION_MAX_WAITING", "32"))
+JUDGE_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("JUDGE_ADMISSION_MAX_WAIT_SECONDS", "15"))
+JUDGE_ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("JUDGE_ADMISSION_RETRY_AFTER_SECONDS", "5"))
+
+JUDGE_RATE_LIMIT_ENABLED = os.getenv("JUDGE_RATE_LIMIT_ENABLED", "true").lower() == "true"
+JUDGE_RATE_LIMIT_PER_MINUTE = float(os.getenv("JUDGE_RATE_LIMIT_PER_MINUTE", "12"))
+JUDGE_RATE_LIMIT_BURST = int(os.getenv("JUDGE_RATE_LIMIT_BURST", "5"))
+
+# Rejection reasons
+REJECTED_QUEUE_FULL = "queue_full"
+REJECTED_USER_LIMIT = "user_limit"
+REJECTED_TIMEOUT = "timeout"
+
+_MAX_RETRY_AFTER_SECONDS = 60
+# Weight of the latest request in the average time a slot is held
+_HOLD_TIME_SMOOTHING = 0.2
+# Number of buckets above which the full (idle) ones are dropped
+_MAX_IDLE_BUCKETS = 10000
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    A judging slot held by a request; release() it once the judging is over
+    (releasing twice is harmless).
+    """
+
+    def __init__(self, controller: Optional["AdmissionController"], user_key: Optional[str]):
+        self._controller = controller
+        self.user_key = user_key
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._controller is None:
+            return
+        self._controller._release(self)
+
+
+class AdmissionController:
+    """
+    Global and per-user concurrency limits with a bounded FIFO wait.
+
+    Attributes:
+        max_concurrent: Requests judging at the same time.
+        max_per_user: Requests of one user judging or waiting.
+        max_waiting: Requests waiting for a slot.
+        max_wait_seconds: Longest wait for a slot before being rejected.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int, max_waiting: int, max_wait_seconds: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+        self.max_waiting = max(0, max_waiting)
+        self.max_wait_seconds = max_wait_seconds
+
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+        self._active = 0
+        self._by_user: Dict[str, int] = {}
+        self._hold_seconds = 0.0
+
+        self._admitted = 0
+        self._rejected = {REJECTED_QUEUE_FULL: 0, REJECTED_USER_LIMIT: 0, REJECTED_TIMEOUT: 0}
+        self._waited = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    async def acquire(self, user_key: Optional[str] = None) -> AdmissionTicket:
+        """
+        Take a judging slot, waiting for one on the event loop if they are all taken.
+
+        Args:
+            user_key: Identifies the user for the per-user limit (None: no per-user limit).
+
+        Returns:
+            AdmissionTicket: The slot, to release once the judging is over.
+
+        Raises:
+            AdmissionRejectedError: The user already holds too many slots, too many
+                requests are waiting, or no slot was freed in time.
+        """
+        started = time.monotonic()
+        with self._lock:
+            if user_key is not None and self._by_user.get(user_key, 0) >= self.max_per_user:
+                raise self._reject(REJECTED_USER_LIMIT)
+
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._count_user(user_key, 1)
+                self._admitted += 1
+                return AdmissionTicket(self, user_key)
+
+            if len(self._waiters) >= self.max_waiting:
+                raise self._reject(REJECTED_QUEUE_FULL)
+
+            waiter = {"user_key": user_key, "future": asyncio.get_running_loop().create_future(), "admitted": False}
+            self._waiters.append(waiter)
+            self._count_user(user_key, 1)
+
+        try:
+            await asyncio.wait_for(waiter["future"], self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The request went away while waiting: give up its place, or the
+            # slot it was handed meanwhile
+            with self._lock:
+                if waiter["admitted"]:
+                    self._free_slot(user_key)
+                else:
+                    self._waiters.remove(waiter)
+                    self._count_user(user_key, -1)
+            raise
+
+        with self._lock:
+            waited = time.monotonic() - started
+            self._waited += 1
+            self._wait_seconds_total += waited
+            self._wait_seconds_max = max(self._wait_seconds_max, waited)
+
+            if not waiter["admitted"]:
+                self._waiters.remove(waiter)
+                self._count_user(user_key, -1)
+                raise self._reject(REJECTED_TIMEOUT)
+
+            self._admitted += 1
+            return AdmissionTicket(self, user_key)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        with self._lock:
+            if ticket._released:
+                return
+            ticket._released = True
+
+            held = time.monotonic() - ticket.admitted_at
+            self._hold_seconds += _HOLD_TIME_SMOOTHING * (held - self._hold_seconds)
+
+            self._free_slot(ticket.user_key)
+
+    def _free_slot(self, user_key: Optional[str]) -> None:
+        """Give back a slot and hand the free slots to the oldest waiters (lock held)."""
+        self._active -= 1
+        self._count_user(user_key, -1)
+
+        while self._waiters and self._active < self.max_concurrent:
+            waiter = self._waiters.popleft()
+            waiter["admitted"] = True
+            self._active += 1
+            # Tickets are also released from threadpool threads
+            future = waiter["future"]
+            future.get_loop().call_soon_threadsafe(_wake, future)
+
+    def _count_user(self, user_key: Optional[str], delta: int) -> None:
+        if user_key is None:
+            return
+        count = self._by_user.get(user_key, 0) + delta
+        if count > 0:
+            self._by_user[user_key] = count
+        else:
+            self._by_user.pop(user_key, None)
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        self._rejected[reason] += 1
+        return AdmissionRejectedError(reason, self._retry_after())
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free: the backlog times the average hold time."""
+        if self._hold_seconds <= 0:
+            return JUDGE_ADMISSION_RETRY_AFTER_SECONDS
+        backlog = (len(self._waiters) + 1) / self.max_concurrent
+        return min(_MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(self._hold_seconds * backlog)))
+
+    def stats(self) -> Dict:
+        """
+        Report the admission counters of this process.
+
+        Returns:
+            Dict: enabled, limits, active, waiting, admitted, rejections per reason,
+                and wait times (requests that had to wait).
+        """
+        with self._lock:
+            return {
+                "enabled": JUDGE_ADMISSION_ENABLED,
+                "max_concurrent": self.max_concurrent,
+                "max_per_user": self.max_per_user,
+                "max_waiting": self.max_waiting,
+                "active": self._active,
+                "waiting": len(self._waiters),
+                "admitted": self._admitted,
+                "rejected_queue_full": self._rejected[REJECTED_QUEUE_FULL],
+                "rejected_user_limit": self._rejected[REJECTED_USER_LIMIT],
+                "rejected_timeout": self._rejected[REJECTED_TIMEOUT],
+                "waited": self._waited,
+                "wait_ms_avg": int(self._wait_seconds_total * 1000 / self._waited) if self._waited else 0,
+                "wait_ms_max": int(self._wait_seconds_max * 1000),
+                "hold_ms_avg": int(self._hold_seconds * 1000),
+                "rate_limited": judge_rate_limiter.limited,
+            }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets: each key gets `burst` tokens, refilled at
+    `rate_per_second`; a request spends one token.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate_per_second = max(rate_per_second, 1e-9)
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}
+        self.limited = 0
+
+    def take(self, key: str) -> float:
+        """
+        Spend a token of a key.
+
+        Returns:
+            float: 0 if a token was spent, otherwise the seconds until one is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= _MAX_IDLE_BUCKETS:
+                    self._drop_full_buckets(now)
+                bucket = self._buckets[key] = [float(self.burst), now]
+
+            tokens, updated = bucket
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate_per_second)
+            if tokens >= 1:
+                bucket[0], bucket[1] = tokens - 1, now
+                return 0.0
+
+            bucket[0], bucket[1] = tokens, now
+            self.limited += 1
+            return (1 - tokens) / self.rate_per_second
+
+    def _drop_full_buckets(self, now: float) -> None:
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate_per_second >= self.burst:
+                del self._buckets[key]
+
+
+judge_admission = AdmissionController(
+    JUDGE_ADMISSION_MAX_CONCURRENT,
+    JUDGE_ADMISSION_MAX_PER_USER,
+    JUDGE_ADMISSION_MAX_WAITING,
+    JUDGE_ADMISSION_MAX_WAIT_SECONDS
+)
+
+
+judge_rate_limiter = TokenBucketLimiter(JUDGE_RATE_LIMIT_PER_MINUTE / 60, JUDGE_RATE_LIMIT_BURST)
+
+
+def rate_limit_or_raise(user_key: str) -> None:
+    """
+    Spend a token of the user's bucket, or answer 429 with the time until the
+    next token as Retry-After. No-op when JUDGE_RATE_LIMIT_ENABLED is off.
+    """
+    if not JUDGE_RATE_LIMIT_ENABLED:
+        return
+    wait_seconds = judge_rate_limiter.take(user_key)
+    if wait_seconds > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many submissions, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(wait_seconds)))}
+        )
+
+
+async def acquire_or_raise(user_key: Optional[str] = None) -> AdmissionTicket:
+    """
+    judge_admission.acquire() for API handlers: rejections become 429 errors with
+    a Retry-After header. Always admits when JUDGE_ADMISSION_ENABLED is off.
+    """
+    if not JUDGE_ADMISSION_ENABLED:
+        return AdmissionTicket(None, user_key)
+    try:
+        return await judge_admission.acquire(user_key)
+    except AdmissionRejectedError as e:
+        logger.info(f"Judge request rejected ({e.reason}), retry after {e.retry_after}s")
+        if e.reason == REJECTED_USER_LIMIT:
+            detail = "You already have code being judged, please wait for it to finish"
+        else:
+            detail = "The judge is busy, please retry shortly"
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+
+@asynccontextmanager
+async def admit_or_raise(user_key: Optional[str] = None):
+    """
+    Hold a judging slot for the duration of the block, see acquire_or_raise().
+    Run the judging itself in the threadpool (run_in_threadpool()).
+    """
+    ticket = await acquire_or_raise(user_key)
+    try:
+        yield ticket
+    finally:
+        ticket.release()
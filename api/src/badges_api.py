@@ -18,7 +18,7 @@ from models import (
     Test,
     VoteType
 )
-from database import get_db
+from database import get_db, get_read_db
 from leaderboard_api import _assign_ranks
 from student_results_api import get_game_session_scores_list
 
@@ -49,7 +49,7 @@ class AssignBadgeRequest(BaseModel):
 # ============================================================================
 
 @router.get("/student/{student_id}", response_model=List[BadgeResponse])
-def get_student_badges(student_id: int, db: Session = Depends(get_db)):
+def get_student_badges(student_id: int, db: Session = Depends(get_read_db)):
     """
     Get all badges earned by a student.
     """
@@ -0,0 +1,194 @@
+"""
+Checkers
+
+Decide whether a program's output answers a test, according to the checker of
+the match setting:
+
+    exact            stripped outputs are equal (the default)
+    tokens           same whitespace-separated tokens, whatever the spacing
+    float            same tokens, numbers equal within checker_tolerance
+                     (absolute or relative error)
+    unordered_lines  same non-blank lines (stripped), in any order
+    custom           a checker program written by the teacher (checker_source)
+
+A custom checker is a C++ program run in the sandbox like any submission. It
+reads three sections from stdin, each one a line with its length in bytes
+followed by that many bytes: the test input, the expected output and the
+program's output. It exits with 0 to accept the output and 1 to reject it; when
+rejecting, the first line it prints is shown to the student. The outputs checked
+together are run as one judge_code() call: they share one compilation and one
+sandbox, and their verdicts are memoized like any run.
+
+Verdicts are decided when a solution is judged and stored with its results
+(StudentSolutionTest.passed); reading results never compares outputs again.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+from judge_tasks import judge_code
+
+logger = logging.getLogger(__name__)
+
+CHECKER_EXACT = "exact"
+CHECKER_TOKENS = "tokens"
+CHECKER_FLOAT = "float"
+CHECKER_UNORDERED_LINES = "unordered_lines"
+CHECKER_CUSTOM = "custom"
+
+CHECKER_MODES = (CHECKER_EXACT, CHECKER_TOKENS, CHECKER_FLOAT, CHECKER_UNORDERED_LINES, CHECKER_CUSTOM)
+
+# Keys of a checker dict (the checker columns of a MatchSetting), see get_match_checker()
+CHECKER_KEYS = ("checker_mode", "checker_tolerance", "checker_source")
+
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+
+MISMATCH_MESSAGE = "Output mismatch"
+
+
+def get_match_checker(match_setting) -> Dict:
+    """
+    Checker of a match setting (its checker columns; None for the exact checker).
+
+    Returns:
+        Dict: CHECKER_KEYS entries set on the match setting, to pass as `checker`.
+    """
+    if match_setting is None:
+        return {}
+    return {key: getattr(match_setting, key) for key in CHECKER_KEYS if getattr(match_setting, key) is not None}
+
+
+def get_checker_mode(checker: Optional[Dict]) -> str:
+    """Mode of a checker dict (CHECKER_EXACT when unset)."""
+    return (checker or {}).get("checker_mode") or CHECKER_EXACT
+
+
+def supports_streaming(checker: Optional[Dict]) -> bool:
+    """
+    Tell whether outputs can be compared while they are produced (expected_outputs
+    of judge_tasks.judge_code()): only the exact checker compares that way.
+    """
+    return get_checker_mode(checker) == CHECKER_EXACT
+
+
+def runs_in_sandbox(checker: Optional[Dict]) -> bool:
+    """
+    Tell whether the checker is a program run in the sandbox (custom checker):
+    its outputs should be checked together, with one check_outputs() call.
+    """
+    return get_checker_mode(checker) == CHECKER_CUSTOM
+
+
+def check_output(checker: Optional[Dict], input_str: str, expected: str, actual: str) -> Tuple[bool, str]:
+    """
+    Check one output, see check_outputs().
+    """
+    return check_outputs(checker, [(input_str, expected, actual)])[0]
+
+
+def check_outputs(checker: Optional[Dict], cases: List[Tuple[str, str, str]]) -> List[Tuple[bool, str]]:
+    """
+    Check outputs against the expected ones.
+
+    Args:
+        checker: Checker of the match setting, see get_match_checker().
+        cases: (test input, expected output, program output) triples.
+
+    Returns:
+        List[Tuple[bool, str]]: (passed, message) per case, in order. The message
+            is empty for accepted outputs.
+    """
+    checker = checker or {}
+    mode = get_checker_mode(checker)
+
+    if mode == CHECKER_CUSTOM:
+        return _run_custom_checker(checker.get("checker_source") or "", cases)
+
+    if mode == CHECKER_TOKENS:
+        compare = _tokens_equal
+    elif mode == CHECKER_FLOAT:
+        tolerance = checker.get("checker_tolerance") or DEFAULT_FLOAT_TOLERANCE
+
+        def compare(expected: str, actual: str) -> bool:
+            return _floats_equal(expected, actual, tolerance)
+    elif mode == CHECKER_UNORDERED_LINES:
+        compare = _lines_equal_unordered
+    else:
+        if mode != CHECKER_EXACT:
+            logger.warning(f"Unknown checker mode '{mode}', comparing outputs exactly")
+        compare = _exact_equal
+
+    return [
+        (True, "") if compare(expected or "", actual or "") else (False, MISMATCH_MESSAGE)
+        for _, expected, actual in cases
+    ]
+
+
+def _exact_equal(expected: str, actual: str) -> bool:
+    return actual.strip() == expected.strip()
+
+
+def _tokens_equal(expected: str, actual: str) -> bool:
+    return actual.split() == expected.split()
+
+
+def _floats_equal(expected: str, actual: str, tolerance: float) -> bool:
+    expected_tokens = expected.split()
+    actual_tokens = actual.split()
+    if len(expected_tokens) != len(actual_tokens):
+        return False
+
+    for expected_token, actual_token in zip(expected_tokens, actual_tokens):
+        if expected_token == actual_token:
+            continue
+        try:
+            expected_value = float(expected_token)
+            actual_value = float(actual_token)
+        except ValueError:
+            return False
+        if not (math.isfinite(expected_value) and math.isfinite(actual_value)):
+            return False
+        error = abs(actual_value - expected_value)
+        if error > tolerance and error > tolerance * abs(expected_value):
+            return False
+    return True
+
+
+def _lines_equal_unordered(expected: str, actual: str) -> bool:
+    def lines(text: str) -> List[str]:
+        return sorted(line.strip() for line in text.splitlines() if line.strip())
+    return lines(actual) == lines(expected)
+
+
+def _section(text: str) -> str:
+    data = text.encode("utf-8")
+    return f"{len(data)}\n{text}"
+
+
+def _run_custom_checker(checker_source: str, cases: List[Tuple[str, str, str]]) -> List[Tuple[bool, str]]:
+    if not cases:
+        return []
+    if not checker_source.strip():
+        return [(False, "Checker error: the match setting has no checker program")] * len(cases)
+
+    judged = judge_code(
+        checker_source,
+        [_section(input_str or "") + _section(expected or "") + _section(actual or "") for input_str, expected, actual in cases]
+    )
+    if judged["compile_error"] is not None:
+        logger.error(f"Custom checker does not compile: {judged['compile_error']}")
+        return [(False, "Checker error: the checker program does not compile")] * len(cases)
+
+    verdicts = []
+    for result in judged["results"]:
+        lines = (result["stdout"] or "").strip().splitlines()
+        message = lines[0] if lines else ""
+        if result["status"] == "success":
+            verdicts.append((True, ""))
+        elif result["status"] == "runtime_error" and result["exit_code"] == 1:
+            verdicts.append((False, message or MISMATCH_MESSAGE))
+        else:
+            logger.warning(f"Custom checker failed ({result['status']}): {result['stderr']}")
+            verdicts.append((False, f"Checker error: {result['status']}"))
+    return verdicts
@@ -1,25 +1,211 @@
 import subprocess
 import tempfile
 import os
+import sys
+import shutil
+import zipfile
+import glob
+import hashlib
+import io
+import codecs
 import logging
-from typing import Tuple, Dict, Optional
+import queue
+import re
+import shlex
+import signal
+import threading
+import time
+import traceback
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Tuple, Dict, Optional, List, Iterator
+
+from compile_cache import compile_cache, COMPILE_CACHE_ENABLED, COMPILE_CACHE_DIR
+from precompiled_headers import precompiled_headers, leading_includes, COMPILE_PCH_ENABLED, PCH_HEADER_NAME
 
 logger = logging.getLogger(__name__)
 
 NSJAIL_CONFIG_PATH = "/app/nsjail.cfg"
 
-def compile_cpp(code: str) -> Tuple[Optional[str], Optional[str]]:
+CPP_COMPILER = "g++"
+CPP_COMPILE_FLAGS = ["-O2"]
+
+C_COMPILER = "gcc"
+
+# Languages of the match settings (MatchSetting.language), see LANGUAGE_DRIVERS
+LANGUAGE_CPP = "cpp"
+LANGUAGE_C = "c"
+LANGUAGE_PYTHON = "python"
+LANGUAGE_JAVA = "java"
+
+# Compile profiles: flags used for each kind of build.
+# "submission" builds are graded, "custom_test" builds favour compile speed.
+COMPILE_PROFILE_SUBMISSION = "submission"
+COMPILE_PROFILE_CUSTOM_TEST = "custom_test"
+COMPILE_PROFILES = {
+    COMPILE_PROFILE_SUBMISSION: shlex.split(os.getenv("COMPILE_FLAGS_SUBMISSION", " ".join(CPP_COMPILE_FLAGS))),
+    COMPILE_PROFILE_CUSTOM_TEST: shlex.split(os.getenv("COMPILE_FLAGS_CUSTOM_TEST", "-O0")),
+}
+C_COMPILE_PROFILES = {
+    COMPILE_PROFILE_SUBMISSION: shlex.split(os.getenv("COMPILE_FLAGS_C_SUBMISSION", "-O2 -std=gnu11")),
+    COMPILE_PROFILE_CUSTOM_TEST: shlex.split(os.getenv("COMPILE_FLAGS_C_CUSTOM_TEST", "-O0 -std=gnu11")),
+}
+
+# Python programs run on the interpreter of the API itself (its standard library is
+# mounted read-only in the sandbox), without site-packages
+PYTHON_INTERPRETER = os.path.realpath(sys.executable)
+SANDBOX_HARNESS_PY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_harness.py")
+
+# Java programs are compiled with javac and run from a jar; JAVA_BIN defaults to the
+# `java` of the PATH (resolved, so that the sandbox can mount its JDK)
+JAVA_COMPILER = os.getenv("JAVA_COMPILER", "javac")
+JAVA_BIN = os.getenv("JAVA_BIN", "")
+JAVA_OPTIONS = shlex.split(os.getenv(
+    "JAVA_OPTIONS",
+    "-XX:+UseSerialGC -XX:TieredStopAtLevel=1 -XX:ActiveProcessorCount=1 -XX:-UsePerfData -Xshare:auto -Xss64m"
+))
+
+# Batch execution: all the tests of a submission run in one sandbox (see sandbox_driver.cpp)
+SANDBOX_BATCH_ENABLED = os.getenv("SANDBOX_BATCH_ENABLED", "true").lower() == "true"
+SANDBOX_DRIVER_SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_driver.cpp")
+
+# Default per-test limits, used when a match setting does not set its own (see get_run_limits())
+SANDBOX_TIME_LIMIT_MS = int(os.getenv("SANDBOX_TIME_LIMIT_MS", "2000"))
+SANDBOX_CPU_TIME_LIMIT_MS = int(os.getenv("SANDBOX_CPU_TIME_LIMIT_MS", "2000"))
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "256"))
+SANDBOX_OUTPUT_LIMIT_KB = int(os.getenv("SANDBOX_OUTPUT_LIMIT_KB", "8192"))
+# Extra time granted to a whole batch for sandbox setup and teardown
+SANDBOX_BATCH_OVERHEAD_SECONDS = 5
+
+COMPILE_TIMEOUT_SECONDS = int(os.getenv("COMPILE_TIMEOUT_SECONDS", "10"))
+
+# Keys of a run limits dict, see get_run_limits()
+RUN_LIMIT_KEYS = ("time_limit_ms", "cpu_time_limit_ms", "memory_limit_mb", "output_limit_kb")
+
+# Statuses of runs whose stdout is an answer to compare with the expected output
+# (wrong_answer: stopped as soon as the output diverged, see OutputMatcher)
+ANSWER_STATUSES = ("success", "wrong_answer")
+
+# Parallel execution: the tests of one executable are split into sandbox batches that run
+# on a worker pool shared by the whole API process (JUDGE_MAX_WORKERS concurrent sandboxes)
+JUDGE_MAX_WORKERS = int(os.getenv("JUDGE_MAX_WORKERS", str(os.cpu_count() or 2)))
+JUDGE_MIN_TESTS_PER_SANDBOX = int(os.getenv("JUDGE_MIN_TESTS_PER_SANDBOX", "4"))
+# How often a running sandbox checks whether its run was cancelled
+_CANCEL_POLL_SECONDS = 0.05
+_READ_CHUNK_BYTES = 65536
+
+_driver_lock = threading.Lock()
+_driver_path: Optional[str] = None
+_harness_objects: Dict[Tuple[str, ...], str] = {}
+
+# Harness mode: the student program is linked with the sandbox driver, which runs every
+# test case in a forked copy of itself instead of exec'ing a fresh program
+HARNESS_ENTRY_POINT = "judge_student_main"
+_MAIN_NO_ARGS_RE = re.compile(r"\bint\s+main\s*\(\s*(void)?\s*\)")
+_MAIN_WITH_ARGS_RE = re.compile(r"\bint\s+main\s*\(\s*int\b")
+
+_test_executor = ThreadPoolExecutor(max_workers=JUDGE_MAX_WORKERS, thread_name_prefix="judge")
+
+
+def get_run_limits(limits: Optional[Dict] = None) -> Dict:
+    """
+    Complete a run limits dict with the defaults.
+
+    Args:
+        limits: Any of RUN_LIMIT_KEYS (e.g. the limit columns of a MatchSetting);
+            missing or None values take the SANDBOX_* defaults.
+
+    Returns:
+        Dict: Every RUN_LIMIT_KEYS entry, set.
+    """
+    defaults = {
+        "time_limit_ms": SANDBOX_TIME_LIMIT_MS,
+        "cpu_time_limit_ms": SANDBOX_CPU_TIME_LIMIT_MS,
+        "memory_limit_mb": SANDBOX_MEMORY_LIMIT_MB,
+        "output_limit_kb": SANDBOX_OUTPUT_LIMIT_KB,
+    }
+    limits = limits or {}
+    return {key: limits.get(key) or defaults[key] for key in RUN_LIMIT_KEYS}
+
+
+def _limit_args(limits: Dict, memory_rlimit: bool = True) -> List[str]:
+    """
+    Sandbox driver arguments enforcing run limits (without the address space limit
+    for languages that bound their memory themselves, see LanguageDriver.memory_rlimit).
+    """
+    return [
+        "--wall-ms", str(limits["time_limit_ms"]),
+        "--cpu-ms", str(limits["cpu_time_limit_ms"]),
+        "--memory-kb", str(limits["memory_limit_mb"] * 1024 if memory_rlimit else 0),
+        "--output-bytes", str(limits["output_limit_kb"] * 1024),
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_compiler_version(compiler: str = CPP_COMPILER) -> str:
+    """
+    Returns the version banner of the compiler (used in compile cache keys).
+    """
+    try:
+        result = subprocess.run(
+            [compiler, "--version"],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        return result.stdout.splitlines()[0] if result.stdout else "unknown"
+    except Exception:
+        return "unknown"
+
+
+def get_build_key(code: str, profile: str = COMPILE_PROFILE_SUBMISSION, language: str = LANGUAGE_CPP) -> str:
+    """
+    Identifies the executable compile_program() builds for this code, profile and
+    language (same key as the compile cache).
+
+    Raises:
+        ValueError: If the language has no driver.
+    """
+    return get_language_driver(language).build_key(code, profile)
+
+
+def compile_cpp(code: str, profile: str = COMPILE_PROFILE_SUBMISSION) -> Tuple[Optional[str], Optional[str]]:
     """
     Compiles C++ code.
+
+    Successful builds are stored in the compile cache, so compiling the same code
+    again only costs a file lookup. The standard headers included at the top of the
+    code are taken from a precompiled header when one is available. The returned
+    executable is always owned by the caller, who is responsible for removing it.
     
     Args:
         code (str): The C++ source code.
+        profile (str): Compile profile (key of COMPILE_PROFILES) selecting the flags.
         
     Returns:
         Tuple[str, str]: (executable_path, error_message)
         If success, executable_path is set and error_message is None.
         If failure, executable_path is None and error_message contains stderr.
     """
+    flags = COMPILE_PROFILES.get(profile, CPP_COMPILE_FLAGS)
+
+    cache_key = None
+    if COMPILE_CACHE_ENABLED:
+        cache_key = get_build_key(code, profile)
+        cached_path = compile_cache.checkout(cache_key)
+        if cached_path:
+            return cached_path, None
+
+    pch_header = None
+    if COMPILE_PCH_ENABLED:
+        pch_header = precompiled_headers.get_header(
+            leading_includes(code),
+            CPP_COMPILER,
+            flags,
+            get_compiler_version()
+        )
+
     # Create a temporary file for the source code
     with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False) as source_file:
         source_file.write(code)
@@ -30,17 +216,32 @@ def compile_cpp(code: str) -> Tuple[Optional[str], Optional[str]]:
     
     try:
         # Compile command
-        cmd = ["g++", "-O2", "-o", executable_path, source_path]
+        cmd = [CPP_COMPILER, *flags, "-o", executable_path, source_path]
+        if pch_header:
+            cmd[1:1] = ["-include", pch_header]
         
         result = subprocess.run(
             cmd,
             capture_output=True,
             text=True,
-            timeout=10
+            timeout=COMPILE_TIMEOUT_SECONDS
         )
+
+        if result.returncode != 0 and pch_header and PCH_HEADER_NAME in result.stderr:
+            # The bundle was evicted under our feet: compile without it
+            cmd = [CPP_COMPILER, *flags, "-o", executable_path, source_path]
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=COMPILE_TIMEOUT_SECONDS
+            )
         
         if result.returncode != 0:
             return None, result.stderr
+
+        if cache_key:
+            compile_cache.store(cache_key, executable_path)
             
         return executable_path, None
 
@@ -53,16 +254,596 @@ def compile_cpp(code: str) -> Tuple[Optional[str], Optional[str]]:
         if os.path.exists(source_path):
             os.remove(source_path)
 
-def run_cpp_executable(executable_path: str, input_str: str) -> Dict:
+def _get_harness_object(flags: List[str]) -> Optional[str]:
+    """
+    Compiles the sandbox driver in harness mode once per set of flags.
+
+    Returns:
+        Optional[str]: Path to the driver object file, or None if it cannot be built.
+    """
+    key = tuple(flags)
+    with _driver_lock:
+        object_path = _harness_objects.get(key)
+        if object_path and os.path.exists(object_path):
+            return object_path
+
+        try:
+            with open(SANDBOX_DRIVER_SOURCE_PATH, "rb") as f:
+                source_hash = hashlib.sha256(f.read() + "\0".join(flags).encode()).hexdigest()[:16]
+
+            object_path = os.path.join(COMPILE_CACHE_DIR, f"sandbox-harness-{source_hash}.o")
+            if not os.path.exists(object_path):
+                os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{object_path}.{os.getpid()}.tmp"
+                result = subprocess.run(
+                    [CPP_COMPILER, *flags, "-DJUDGE_HARNESS", "-c", "-x", "c++", SANDBOX_DRIVER_SOURCE_PATH, "-o", tmp_path],
+                    capture_output=True,
+                    text=True,
+                    timeout=60
+                )
+                if result.returncode != 0:
+                    logger.error(f"Could not build harness driver: {result.stderr}")
+                    return None
+                os.replace(tmp_path, object_path)
+
+            _harness_objects[key] = object_path
+            return object_path
+        except Exception as e:
+            logger.error(f"Could not build harness driver: {e}")
+            return None
+
+
+def compile_cpp_harness(code: str, profile: str = COMPILE_PROFILE_SUBMISSION) -> Optional[str]:
+    """
+    Compiles C++ code into a test harness: the program linked with the sandbox driver.
+
+    The program's main() is renamed and called by the driver in a forked process for
+    every test case, so a whole test suite runs without a single exec (see
+    run_tests(harness=True)). Run without `--harness`, the executable behaves
+    exactly as the program itself.
+
+    Programs the harness cannot host unchanged (unusual main() signature, main()
+    relying on the implicit `return 0`) are rejected: callers then use compile_cpp().
+
+    Args:
+        code (str): The C++ source code.
+        profile (str): Compile profile (key of COMPILE_PROFILES) selecting the flags.
+
+    Returns:
+        Optional[str]: Path to the harness executable (owned by the caller), or None.
+    """
+    if not SANDBOX_BATCH_ENABLED:
+        return None
+
+    if _MAIN_NO_ARGS_RE.search(code):
+        entry_call = f"{HARNESS_ENTRY_POINT}()"
+    elif _MAIN_WITH_ARGS_RE.search(code):
+        entry_call = f"{HARNESS_ENTRY_POINT}(argc, argv)"
+    else:
+        return None
+
+    flags = COMPILE_PROFILES.get(profile, CPP_COMPILE_FLAGS)
+    driver_object = _get_harness_object(flags)
+    if driver_object is None:
+        return None
+
+    harness_code = (
+        f"{code}\n\n"
+        f"#undef main\n"
+        f"extern \"C\" int judge_harness_entry(int argc, char** argv) {{\n"
+        f"    (void)argc; (void)argv;\n"
+        f"    return {entry_call};\n"
+        f"}}\n"
+    )
+    harness_flags = [*flags, f"-Dmain={HARNESS_ENTRY_POINT}", "-Werror=return-type"]
+
+    cache_key = None
+    if COMPILE_CACHE_ENABLED:
+        cache_key = compile_cache.make_key(
+            harness_code,
+            [*harness_flags, os.path.basename(driver_object)],
+            get_compiler_version()
+        )
+        cached_path = compile_cache.checkout(cache_key)
+        if cached_path:
+            return cached_path
+
+    pch_header = None
+    if COMPILE_PCH_ENABLED:
+        pch_header = precompiled_headers.get_header(
+            leading_includes(code),
+            CPP_COMPILER,
+            flags,
+            get_compiler_version()
+        )
+
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.cpp', delete=False) as source_file:
+        source_file.write(harness_code)
+        source_path = source_file.name
+    executable_path = source_path.replace('.cpp', '.harness.out')
+
+    try:
+        cmd = [CPP_COMPILER, *harness_flags, "-o", executable_path, source_path, driver_object]
+        if pch_header:
+            cmd[1:1] = ["-include", pch_header]
+
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=COMPILE_TIMEOUT_SECONDS)
+        if result.returncode != 0:
+            if os.path.exists(executable_path):
+                os.remove(executable_path)
+            return None
+
+        if cache_key:
+            compile_cache.store(cache_key, executable_path)
+        return executable_path
+    except Exception as e:
+        logger.warning(f"Could not build test harness: {e}")
+        return None
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+
+class LanguageDriver(ABC):
+    """
+    How programs of one language are built and run; the judging pipeline only goes
+    through these methods (see LANGUAGE_DRIVERS).
+
+    A build is a single file, the "executable", handed to the caller and mounted as
+    /sandbox/program: a native executable, a Python source file or a Java jar.
+
+    Attributes:
+        name: Language of the match settings (LANGUAGE_*).
+        memory_rlimit: Whether the memory limit is enforced as an address space
+            rlimit. Runtimes reserving more address space than they use (the JVM)
+            bound their memory themselves (see run_command()).
+        out_of_memory_markers: Strings of stderr telling that a failed run ran out
+            of memory (the run is then reported as 'memory_limit').
+    """
+
+    name = ""
+    memory_rlimit = True
+    out_of_memory_markers: Tuple[str, ...] = ()
+
+    def get_flags(self, profile: str) -> List[str]:
+        """Compile flags of a profile (see COMPILE_PROFILES)."""
+        return []
+
+    def get_version(self) -> str:
+        """Version of the toolchain, part of the build keys."""
+        return "unknown"
+
+    def build_key(self, code: str, profile: str) -> str:
+        """Compile cache key of the build of this code and profile."""
+        return compile_cache.make_key(code, [self.name, *self.get_flags(profile)], self.get_version())
+
+    @abstractmethod
+    def compile(self, code: str, profile: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Builds the program.
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (caller-owned executable path, None)
+                on success, (None, error message) otherwise.
+        """
+
+    def compile_harness(self, code: str, profile: str) -> Optional[str]:
+        """Builds the program in harness mode, if the language has one (see compile_cpp_harness())."""
+        return None
+
+    def run_command(self, limits: Dict) -> List[str]:
+        """Command running /sandbox/program once, inside the sandbox."""
+        return ["/sandbox/program"]
+
+    def batch_command(self, driver_args: List[str]) -> Optional[List[str]]:
+        """
+        Command running a whole batch of tests inside the sandbox, speaking the
+        protocol of sandbox_driver.cpp, for languages with their own warm start;
+        None to have the sandbox driver run run_command() once per test.
+        """
+        return None
+
+    def sandbox_args(self) -> List[str]:
+        """Extra nsjail arguments (mounts of the language runtime)."""
+        return []
+
+
+class CppDriver(LanguageDriver):
+    """C++ with g++: precompiled headers, harness mode (see compile_cpp())."""
+
+    name = LANGUAGE_CPP
+    out_of_memory_markers = ("bad_alloc",)
+
+    def get_flags(self, profile: str) -> List[str]:
+        return COMPILE_PROFILES.get(profile, CPP_COMPILE_FLAGS)
+
+    def build_key(self, code: str, profile: str) -> str:
+        # Same key as before languages were introduced, so existing cache entries stay valid
+        return compile_cache.make_key(code, self.get_flags(profile), get_compiler_version())
+
+    def compile(self, code: str, profile: str) -> Tuple[Optional[str], Optional[str]]:
+        return compile_cpp(code, profile)
+
+    def compile_harness(self, code: str, profile: str) -> Optional[str]:
+        return compile_cpp_harness(code, profile)
+
+
+class CDriver(LanguageDriver):
+    """C with gcc, run like C++ programs by the sandbox driver."""
+
+    name = LANGUAGE_C
+
+    def get_flags(self, profile: str) -> List[str]:
+        return C_COMPILE_PROFILES.get(profile, C_COMPILE_PROFILES[COMPILE_PROFILE_SUBMISSION])
+
+    def get_version(self) -> str:
+        return get_compiler_version(C_COMPILER)
+
+    def compile(self, code: str, profile: str) -> Tuple[Optional[str], Optional[str]]:
+        cache_key = None
+        if COMPILE_CACHE_ENABLED:
+            cache_key = self.build_key(code, profile)
+            cached_path = compile_cache.checkout(cache_key)
+            if cached_path:
+                return cached_path, None
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.c', delete=False) as source_file:
+            source_file.write(code)
+            source_path = source_file.name
+        executable_path = source_path.replace('.c', '.out')
+
+        try:
+            # Libraries come after the source so that the linker resolves its references
+            cmd = [C_COMPILER, *self.get_flags(profile), "-o", executable_path, source_path, "-lm"]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=COMPILE_TIMEOUT_SECONDS)
+            if result.returncode != 0:
+                return None, result.stderr
+
+            if cache_key:
+                compile_cache.store(cache_key, executable_path)
+            return executable_path, None
+        except subprocess.TimeoutExpired:
+            return None, "Compilation timed out."
+        except Exception as e:
+            return None, f"Internal compilation error: {str(e)}"
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
+
+
+class PythonDriver(LanguageDriver):
+    """
+    Python 3 on the interpreter of the API. Compiling only checks the syntax, in
+    this process. Batches run in sandbox_harness.py: one interpreter per sandbox,
+    forked for every test, instead of one interpreter startup per test.
+    """
+
+    name = LANGUAGE_PYTHON
+    out_of_memory_markers = ("MemoryError",)
+
+    def get_version(self) -> str:
+        return sys.version
+
+    def compile(self, code: str, profile: str) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            compile(code, "main.py", "exec", dont_inherit=True)
+        except (SyntaxError, ValueError) as e:
+            return None, "".join(traceback.format_exception_only(type(e), e))
+        except Exception as e:
+            return None, f"Internal compilation error: {str(e)}"
+
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.py', delete=False) as source_file:
+            source_file.write(code)
+        return source_file.name, None
+
+    def _interpreter(self) -> List[str]:
+        # -I -S: no environment variables, user directory or site-packages; -B: no .pyc
+        return [PYTHON_INTERPRETER, "-I", "-S", "-B"]
+
+    def run_command(self, limits: Dict) -> List[str]:
+        return [*self._interpreter(), "/sandbox/program"]
+
+    def batch_command(self, driver_args: List[str]) -> Optional[List[str]]:
+        return [*self._interpreter(), "/sandbox/harness.py", *driver_args, "--", "/sandbox/program"]
+
+    def sandbox_args(self) -> List[str]:
+        prefix = os.path.realpath(sys.base_prefix)
+        args = ["--bindmount_ro", f"{prefix}:{prefix}"]
+        interpreter_dir = os.path.dirname(PYTHON_INTERPRETER)
+        if not interpreter_dir.startswith(prefix + os.sep):
+            args += ["--bindmount_ro", f"{interpreter_dir}:{interpreter_dir}"]
+        return [*args, "--bindmount_ro", f"{SANDBOX_HARNESS_PY_PATH}:/sandbox/harness.py"]
+
+
+_JAVA_PACKAGE_RE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+_JAVA_PUBLIC_CLASS_RE = re.compile(r"\bpublic\s+(?:(?:final|abstract)\s+)*class\s+(\w+)")
+_JAVA_CLASS_RE = re.compile(r"\bclass\s+(\w+)")
+
+
+@lru_cache(maxsize=None)
+def _get_java_bin() -> str:
+    return JAVA_BIN or os.path.realpath(shutil.which("java") or "java")
+
+
+class JavaDriver(LanguageDriver):
+    """
+    Java with javac, packaged as an executable jar (Main-Class: the public class).
+
+    Each test starts its own JVM, so tests stay as isolated as native programs; the
+    JVM options (JAVA_OPTIONS) favour startup time: class data sharing, serial GC,
+    client compiler only. The heap is bounded with -Xmx instead of an address space
+    rlimit.
+    """
+
+    name = LANGUAGE_JAVA
+    memory_rlimit = False
+    out_of_memory_markers = ("OutOfMemoryError",)
+
+    def get_version(self) -> str:
+        return get_compiler_version(JAVA_COMPILER)
+
+    def compile(self, code: str, profile: str) -> Tuple[Optional[str], Optional[str]]:
+        cache_key = None
+        if COMPILE_CACHE_ENABLED:
+            cache_key = self.build_key(code, profile)
+            cached_path = compile_cache.checkout(cache_key)
+            if cached_path:
+                return cached_path, None
+
+        match = _JAVA_PUBLIC_CLASS_RE.search(code) or _JAVA_CLASS_RE.search(code)
+        class_name = match.group(1) if match else "Main"
+        package = _JAVA_PACKAGE_RE.search(code)
+        main_class = f"{package.group(1)}.{class_name}" if package else class_name
+
+        # javac wants the public class in a file of the same name
+        work_dir = tempfile.mkdtemp(prefix="java-")
+        source_path = os.path.join(work_dir, f"{class_name}.java")
+        classes_dir = os.path.join(work_dir, "classes")
+        executable_path = None
+        try:
+            with open(source_path, "w", encoding="utf-8") as source_file:
+                source_file.write(code)
+
+            cmd = [JAVA_COMPILER, "-encoding", "UTF-8", "-nowarn", "-d", classes_dir, source_path]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=COMPILE_TIMEOUT_SECONDS)
+            if result.returncode != 0:
+                return None, result.stderr or result.stdout
+
+            fd, executable_path = tempfile.mkstemp(suffix=".jar")
+            with os.fdopen(fd, "wb") as jar_file, zipfile.ZipFile(jar_file, "w") as jar:
+                jar.writestr("META-INF/MANIFEST.MF", f"Manifest-Version: 1.0\nMain-Class: {main_class}\n")
+                for root, _, files in os.walk(classes_dir):
+                    for file_name in files:
+                        path = os.path.join(root, file_name)
+                        jar.write(path, os.path.relpath(path, classes_dir))
+
+            if cache_key:
+                compile_cache.store(cache_key, executable_path)
+            return executable_path, None
+        except subprocess.TimeoutExpired:
+            return None, "Compilation timed out."
+        except Exception as e:
+            if executable_path and os.path.exists(executable_path):
+                os.remove(executable_path)
+            return None, f"Internal compilation error: {str(e)}"
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run_command(self, limits: Dict) -> List[str]:
+        return [_get_java_bin(), *JAVA_OPTIONS, f"-Xmx{limits['memory_limit_mb']}m", "-jar", "/sandbox/program"]
+
+    def sandbox_args(self) -> List[str]:
+        java_home = os.path.dirname(os.path.dirname(_get_java_bin()))
+        args = []
+        if not java_home.startswith("/usr/lib/"):
+            args += ["--bindmount_ro", f"{java_home}:{java_home}"]
+        # Debian JDKs link part of their configuration to /etc/java-*
+        for config_dir in glob.glob("/etc/java-*"):
+            args += ["--bindmount_ro", f"{config_dir}:{config_dir}"]
+        return args
+
+
+LANGUAGE_DRIVERS: Dict[str, LanguageDriver] = {
+    driver.name: driver for driver in (CppDriver(), CDriver(), PythonDriver(), JavaDriver())
+}
+
+
+def get_language_driver(language: str) -> LanguageDriver:
+    """
+    Driver of a language (a key of LANGUAGE_DRIVERS).
+
+    Raises:
+        ValueError: If the language has no driver.
+    """
+    driver = LANGUAGE_DRIVERS.get(language)
+    if driver is None:
+        raise ValueError(f"Unsupported language: {language}")
+    return driver
+
+
+def compile_program(
+    code: str,
+    language: str = LANGUAGE_CPP,
+    profile: str = COMPILE_PROFILE_SUBMISSION
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Builds a program in any supported language (see LanguageDriver.compile()).
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (executable_path, error_message), like compile_cpp().
+    """
+    try:
+        driver = get_language_driver(language)
+    except ValueError as e:
+        return None, str(e)
+    return driver.compile(code, profile)
+
+
+def _apply_out_of_memory_markers(result: Dict, driver: LanguageDriver) -> Dict:
+    """Reports failed runs whose stderr tells they ran out of memory as 'memory_limit'."""
+    if result.get("status") == "runtime_error" and any(
+        marker in (result.get("stderr") or "") for marker in driver.out_of_memory_markers
+    ):
+        result["status"] = "memory_limit"
+    return result
+
+
+class OutputMatcher:
+    """
+    Follows a program's stdout as it is produced and tells when it can no longer
+    equal the expected output, both stripped of leading and trailing whitespace
+    (the comparison the judge makes once the program ends).
     """
-    Runs a compiled C++ executable inside nsjail.
+
+    def __init__(self, expected_output: str):
+        self.expected = expected_output.strip()
+        self.matched = 0
+        self.started = False
+        self.pending = ""
+        self.diverged = False
+
+    def feed(self, text: str) -> bool:
+        """Takes the next part of the output; returns False once it has diverged."""
+        if self.diverged:
+            return False
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return True
+            self.started = True
+
+        # Trailing whitespace is only compared once more output follows it
+        self.pending += text
+        body = self.pending.rstrip()
+        if body:
+            end = self.matched + len(body)
+            if self.expected[self.matched:end] != body:
+                self.diverged = True
+                return False
+            self.matched = end
+            self.pending = self.pending[len(body):]
+        return True
+
+
+def _communicate_bounded(
+    proc: subprocess.Popen,
+    input_data: bytes,
+    timeout_seconds: float,
+    output_limit_bytes: int,
+    expected_output: Optional[str] = None
+) -> Tuple[str, bytes, Optional[str]]:
+    """
+    Feeds a process its input and reads its output, keeping at most
+    output_limit_bytes of stdout and stderr together.
+
+    The process is killed as soon as it writes more than that, runs past
+    timeout_seconds, or (with expected_output) its stdout diverges from the
+    expected output (see OutputMatcher).
+
+    Returns:
+        Tuple[str, bytes, Optional[str]]: (stdout decoded like _decode_output(),
+            raw stderr, reason the process was killed: None, "output_limit",
+            "timeout" or "wrong_answer").
+    """
+    lock = threading.Lock()
+    state = {"total": 0, "stopped": None}
+    stderr_parts: List[bytes] = []
+
+    def stop(reason: str) -> None:
+        with lock:
+            if state["stopped"] is None:
+                state["stopped"] = reason
+        proc.kill()
+
+    def take(data: bytes) -> bytes:
+        """Counts data against the output limit, returning the part that fits."""
+        with lock:
+            room = max(0, output_limit_bytes - state["total"])
+            state["total"] += len(data)
+            exceeded = state["total"] > output_limit_bytes
+        if exceeded:
+            stop("output_limit")
+        return data[:room]
+
+    def write_input() -> None:
+        try:
+            proc.stdin.write(input_data)
+        except OSError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    def read_stderr() -> None:
+        while True:
+            data = proc.stderr.read1(_READ_CHUNK_BYTES)
+            if not data:
+                return
+            stderr_parts.append(take(data))
+
+    threads = [
+        threading.Thread(target=write_input, daemon=True),
+        threading.Thread(target=read_stderr, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    timer = threading.Timer(timeout_seconds, stop, args=("timeout",))
+    timer.daemon = True
+    timer.start()
+
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True)
+    matcher = OutputMatcher(expected_output) if expected_output is not None else None
+    stdout_parts: List[str] = []
+    try:
+        while True:
+            data = proc.stdout.read1(_READ_CHUNK_BYTES)
+            text = decoder.decode(take(data), final=not data)
+            stdout_parts.append(text)
+            if not data:
+                break
+            if matcher is not None and not matcher.feed(text):
+                stop("wrong_answer")
+                matcher = None
+        proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        for thread in threads:
+            thread.join()
+
+    return "".join(stdout_parts), b"".join(stderr_parts), state["stopped"]
+
+
+def run_executable(
+    executable_path: str,
+    input_str: str,
+    limits: Optional[Dict] = None,
+    expected_output: Optional[str] = None,
+    language: str = LANGUAGE_CPP
+) -> Dict:
+    """
+    Runs a built program inside nsjail.
+
+    The output is read through a buffer bounded by the output limit: a program
+    printing without end costs at most that much memory here.
     
     Args:
         executable_path (str): Path to the compiled executable.
         input_str (str): Input to provide via stdin.
+        limits (Optional[Dict]): Run limits, see get_run_limits(). Time and memory
+            are enforced by nsjail rlimits, to the second and megabyte.
+        expected_output (Optional[str]): Expected stdout. The program is stopped with
+            status 'wrong_answer' as soon as its output cannot match it any more.
+        language (str): Language of the program (key of LANGUAGE_DRIVERS).
         
     Returns:
-        Dict: {'stdout': str, 'stderr': str, 'exit_code': int, 'status': str}
+        Dict: {'stdout': str, 'stderr': str, 'exit_code': int, 'status': str,
+               'wall_time_ms': int, 'cpu_time_ms': None, 'peak_memory_kb': None, 'output_bytes': int}
+        CPU time and memory are only measured by the batch driver (see _iter_batch()).
     """
     if not os.path.exists(executable_path):
         return {
@@ -72,45 +853,70 @@ def run_cpp_executable(executable_path: str, input_str: str) -> Dict:
             "status": "internal_error"
         }
 
+    limits = get_run_limits(limits)
+    time_limit_seconds = -(-limits["time_limit_ms"] // 1000)
+    driver = get_language_driver(language)
+    memory_rlimit = str(limits["memory_limit_mb"]) if driver.memory_rlimit else "inf"
+
     try:
         
         cmd = [
             "nsjail",
             "--config", NSJAIL_CONFIG_PATH,
             "--really_quiet",
+            "--time_limit", str(time_limit_seconds),
+            "--rlimit_cpu", str(-(-limits["cpu_time_limit_ms"] // 1000)),
+            "--rlimit_as", memory_rlimit,
+            "--rlimit_stack", memory_rlimit,
             "--bindmount_ro", f"{executable_path}:/sandbox/program",
+            *driver.sandbox_args(),
             "--",
-            "/sandbox/program"
+            *driver.run_command(limits)
         ]
 
         logger.info(f"Running command: {' '.join(cmd)}")
 
-        result = subprocess.run(
-            cmd,
-            input=input_str,
-            text=True,
-            capture_output=True,
-            timeout=5 
+        started = time.monotonic()
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, raw_stderr, stopped = _communicate_bounded(
+            proc,
+            input_str.encode("utf-8"),
+            time_limit_seconds + SANDBOX_BATCH_OVERHEAD_SECONDS,
+            limits["output_limit_kb"] * 1024,
+            expected_output
         )
-        
-        status = "success" if result.returncode == 0 else "runtime_error"
-        if result.returncode != 0 and "TIME LIMIT" in result.stderr:
+        wall_time_ms = int((time.monotonic() - started) * 1000)
+        stderr = _decode_output(raw_stderr)
+
+        if stopped == "timeout":
+            return {
+                "stdout": "",
+                "stderr": "Execution timed out (subprocess)",
+                "exit_code": -1,
+                "status": "timeout"
+            }
+
+        # The exit status is nsjail's: with --really_quiet, a kill at --time_limit
+        # only shows in the wall time
+        status = "success" if proc.returncode == 0 else "runtime_error"
+        if stopped is not None:
+            status = stopped
+        elif proc.returncode != 0 and wall_time_ms >= time_limit_seconds * 1000:
+            status = "timeout"
+        elif proc.returncode == 128 + signal.SIGXCPU:
             status = "timeout"
 
-        return {
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "exit_code": result.returncode,
-            "status": status
-        }
+        return _apply_out_of_memory_markers({
+            "stdout": stdout,
+            "stderr": stderr,
+            "exit_code": proc.returncode,
+            "status": status,
+            "wall_time_ms": wall_time_ms,
+            "cpu_time_ms": None,
+            "peak_memory_kb": None,
+            "output_bytes": len(stdout.encode("utf-8")) + len(raw_stderr)
+        }, driver)
 
-    except subprocess.TimeoutExpired:
-        return {
-            "stdout": "",
-            "stderr": "Execution timed out (subprocess)",
-            "exit_code": -1,
-            "status": "timeout"
-        }
     except FileNotFoundError:
         return {
             "stdout": "",
@@ -126,3 +932,413 @@ def run_cpp_executable(executable_path: str, input_str: str) -> Dict:
             "exit_code": -1,
             "status": "system_error"
         }
+
+
+def _get_sandbox_driver() -> Optional[str]:
+    """
+    Builds the sandbox batch driver once per process (shared through COMPILE_CACHE_DIR).
+
+    Returns:
+        Optional[str]: Path to the driver executable, or None if it cannot be built.
+    """
+    global _driver_path
+    with _driver_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+
+        try:
+            with open(SANDBOX_DRIVER_SOURCE_PATH, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+
+            target_path = os.path.join(COMPILE_CACHE_DIR, f"sandbox-driver-{source_hash}.out")
+            if not os.path.exists(target_path):
+                os.makedirs(COMPILE_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{target_path}.{os.getpid()}.tmp"
+                result = subprocess.run(
+                    [CPP_COMPILER, "-O2", "-o", tmp_path, SANDBOX_DRIVER_SOURCE_PATH],
+                    capture_output=True,
+                    text=True,
+                    timeout=60
+                )
+                if result.returncode != 0:
+                    logger.error(f"Could not build sandbox driver: {result.stderr}")
+                    return None
+                os.replace(tmp_path, target_path)
+
+            _driver_path = target_path
+            return _driver_path
+        except Exception as e:
+            logger.error(f"Could not build sandbox driver: {e}")
+            return None
+
+
+def _decode_output(data: bytes) -> str:
+    """Decodes program output the same way subprocess text mode does (universal newlines)."""
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _iter_batch(
+    executable_path: str,
+    inputs: List[str],
+    harness: bool = False,
+    cancel_event: Optional[threading.Event] = None,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Runs an executable on every input inside a single nsjail sandbox.
+
+    Yields (index, result) pairs as each test finishes; results have the same shape
+    as run_executable(), with the CPU time (`cpu_time_ms`) and peak resident
+    memory (`peak_memory_kb`) of the test measured by the driver, which enforces
+    the run limits (see get_run_limits()) on every test.
+    A test given an expected output (expected_outputs, None entries for none) is
+    stopped with status 'wrong_answer' as soon as its stdout diverges from it (see
+    _stream_batch(): expected outputs never enter the sandbox).
+    If the batch cannot complete (driver unavailable, sandbox crash), the remaining
+    inputs are run one by one with run_executable().
+    Closing the generator kills the sandbox; so does setting cancel_event, from any
+    thread, without waiting for the running test to finish.
+
+    The batch is run by the sandbox driver, which starts the program once per test,
+    or by the language itself when it has a warm start (LanguageDriver.batch_command()).
+    With harness=True, executable_path comes from compile_cpp_harness() and drives
+    the batch itself.
+    """
+    if not inputs:
+        return
+
+    limits = get_run_limits(limits)
+    expected_outputs = expected_outputs or [None] * len(inputs)
+    language_driver = get_language_driver(language)
+
+    driver_args = _limit_args(limits, language_driver.memory_rlimit)
+
+    cmd = [
+        "nsjail",
+        "--config", NSJAIL_CONFIG_PATH,
+        "--really_quiet",
+        "--time_limit", str(len(inputs) * limits["time_limit_ms"] // 1000 + SANDBOX_BATCH_OVERHEAD_SECONDS),
+        # The driver sets the per-test rlimits itself
+        "--rlimit_as", "inf",
+        "--rlimit_cpu", "inf",
+        "--rlimit_stack", "inf",
+        "--bindmount_ro", f"{executable_path}:/sandbox/program",
+        *language_driver.sandbox_args(),
+    ]
+    batch_cmd = None
+    if harness:
+        batch_cmd = ["/sandbox/program", "--harness", *driver_args]
+    elif SANDBOX_BATCH_ENABLED:
+        batch_cmd = language_driver.batch_command(driver_args)
+        if batch_cmd is None:
+            driver_path = _get_sandbox_driver()
+            if driver_path is not None:
+                cmd += ["--bindmount_ro", f"{driver_path}:/sandbox/driver"]
+                batch_cmd = ["/sandbox/driver", *driver_args, "--", *language_driver.run_command(limits)]
+
+    if batch_cmd is None or not os.path.exists(executable_path):
+        for index, input_str in enumerate(inputs):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield index, run_executable(executable_path, input_str, limits, expected_outputs[index], language)
+        return
+    cmd += ["--", *batch_cmd]
+
+    logger.info(f"Running batch of {len(inputs)} tests: {' '.join(cmd)}")
+
+    completed = 0
+    with tempfile.TemporaryFile() as sandbox_log:
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=sandbox_log)
+        except FileNotFoundError:
+            for index in range(len(inputs)):
+                yield index, {
+                    "stdout": "",
+                    "stderr": "System Configuration Error: nsjail executable not found. Please contact administrator.",
+                    "exit_code": -1,
+                    "status": "system_error"
+                }
+            return
+
+        timeout_seconds = len(inputs) * limits["time_limit_ms"] / 1000 + 2 * SANDBOX_BATCH_OVERHEAD_SECONDS
+        finished = threading.Event()
+        watchdog = threading.Thread(
+            target=_watch_sandbox,
+            args=(proc, timeout_seconds, cancel_event, finished),
+            daemon=True
+        )
+        watchdog.start()
+        try:
+            for result in _stream_batch(proc, inputs, expected_outputs):
+                yield completed, _apply_out_of_memory_markers(result, language_driver)
+                completed += 1
+        finally:
+            finished.set()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.stdout.close()
+
+        if completed < len(inputs) and not (cancel_event is not None and cancel_event.is_set()):
+            sandbox_log.seek(0)
+            logger.warning(
+                f"Batch sandbox stopped after {completed}/{len(inputs)} tests "
+                f"(exit code {proc.returncode}): {sandbox_log.read().decode(errors='replace')}"
+            )
+
+    # Finish whatever the batch could not run, one sandbox per test
+    for index in range(completed, len(inputs)):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        yield index, run_executable(executable_path, inputs[index], limits, expected_outputs[index], language)
+
+
+def _stream_batch(
+    proc: subprocess.Popen,
+    inputs: List[str],
+    expected_outputs: List[Optional[str]]
+) -> Iterator[Dict]:
+    """
+    Runs tests through a started sandbox driver (protocol of sandbox_driver.cpp),
+    yielding the result of each test as it ends; stops early if the driver stops
+    answering.
+
+    The driver gets one test input at a time, after the previous test has ended,
+    and never an expected output: the student code may run in a fork of the driver
+    (harness mode, Python harness) and read anything the driver holds. The output
+    is compared here as it streams out, and the test is stopped (status
+    'wrong_answer') once it can no longer match (see OutputMatcher).
+    """
+    for input_str, expected in zip(inputs, expected_outputs):
+        data = input_str.encode("utf-8")
+        try:
+            proc.stdin.write(f"case {len(data)}\n".encode() + data)
+            proc.stdin.flush()
+        except OSError:
+            return
+
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True)
+        matcher = OutputMatcher(expected) if expected is not None else None
+        stdout_parts: List[bytes] = []
+        stderr_parts: List[bytes] = []
+        while True:
+            header = proc.stdout.readline().split()
+            if len(header) == 6 and header[0] == b"end":
+                break
+            if len(header) != 2 or header[0] not in (b"out", b"err"):
+                return
+            chunk = proc.stdout.read(int(header[1]))
+            if len(chunk) != int(header[1]):
+                return
+            if header[0] == b"err":
+                stderr_parts.append(chunk)
+                continue
+            stdout_parts.append(chunk)
+            if matcher is not None and not matcher.feed(decoder.decode(chunk)):
+                matcher = None
+                try:
+                    proc.stdin.write(b"stop\n")
+                    proc.stdin.flush()
+                except OSError:
+                    pass
+
+        status, exit_code, wall_ms, cpu_ms, peak_rss_kb = header[1:]
+        stdout = b"".join(stdout_parts)
+        stderr = b"".join(stderr_parts)
+        yield {
+            "stdout": _decode_output(stdout),
+            "stderr": _decode_output(stderr),
+            "exit_code": int(exit_code),
+            # Only this function stops tests, when their output diverges
+            "status": "wrong_answer" if status == b"stopped" else status.decode(),
+            "wall_time_ms": int(wall_ms),
+            "cpu_time_ms": int(cpu_ms),
+            "peak_memory_kb": int(peak_rss_kb),
+            "output_bytes": len(stdout) + len(stderr)
+        }
+
+
+def _watch_sandbox(
+    proc: subprocess.Popen,
+    timeout_seconds: float,
+    cancel_event: Optional[threading.Event],
+    finished: threading.Event
+) -> None:
+    """Kills a batch sandbox once it runs past timeout_seconds or its run is cancelled."""
+    deadline = time.monotonic() + timeout_seconds
+    while not finished.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (cancel_event is not None and cancel_event.is_set()):
+            proc.kill()
+            return
+        finished.wait(min(remaining, _CANCEL_POLL_SECONDS))
+
+
+def run_batch(
+    executable_path: str,
+    inputs: List[str],
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> List[Dict]:
+    """
+    Runs a built program on a list of inputs using a single nsjail sandbox.
+
+    The tests share the sandbox, which isolates them less than run_executable():
+    each test gets its own process group, pipes and limits, and after each test the
+    sandbox driver kills every process left in the sandbox and empties /tmp and
+    /sandbox (see sandbox_driver.cpp), but other state of the sandbox (System V
+    IPC objects, /dev) carries over to the next tests.
+    
+    Args:
+        executable_path (str): Path to the compiled executable.
+        inputs (List[str]): Inputs to provide via stdin, one per test.
+        limits (Optional[Dict]): Run limits, see get_run_limits().
+        expected_outputs (Optional[List[Optional[str]]]): Expected stdout of each test,
+            to stop wrong answers early (see _iter_batch()).
+        language (str): Language of the program (key of LANGUAGE_DRIVERS).
+        
+    Returns:
+        List[Dict]: One result per input, in input order, shaped like run_executable().
+    """
+    results: List[Optional[Dict]] = [None] * len(inputs)
+    batch = _iter_batch(executable_path, inputs, limits=limits, expected_outputs=expected_outputs, language=language)
+    for index, result in batch:
+        results[index] = result
+    return results
+
+
+def _run_chunk(
+    executable_path: str,
+    inputs: List[str],
+    offset: int,
+    results_queue: "queue.Queue",
+    cancel_event: threading.Event,
+    harness: bool = False,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> None:
+    """
+    Worker body for iter_tests(): runs one batch and pushes (index, result) pairs.
+    Always finishes by pushing None, so the consumer can count finished chunks.
+    """
+    completed = set()
+    batch = _iter_batch(executable_path, inputs, harness, cancel_event, limits, expected_outputs, language)
+    try:
+        if cancel_event.is_set():
+            return
+        for index, result in batch:
+            completed.add(index)
+            results_queue.put((offset + index, result))
+            if cancel_event.is_set():
+                return
+    except Exception as e:
+        logger.error(f"Error running tests: {e}")
+        for index in range(len(inputs)):
+            if index not in completed:
+                results_queue.put((offset + index, {
+                    "stdout": "",
+                    "stderr": f"System Error: {str(e)}",
+                    "exit_code": -1,
+                    "status": "system_error"
+                }))
+    finally:
+        # Kills the sandbox if the run was cancelled half-way
+        batch.close()
+        results_queue.put(None)
+
+
+def iter_tests(
+    executable_path: str,
+    inputs: List[str],
+    harness: bool = False,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Runs an executable on every input, spreading the tests over the shared judge pool.
+
+    The inputs are split into at most JUDGE_MAX_WORKERS contiguous batches (of at least
+    JUDGE_MIN_TESTS_PER_SANDBOX tests), each one running in its own sandbox. The number
+    of sandboxes running at the same time is bounded for the whole process by the size
+    of the pool, whatever the number of concurrent requests.
+
+    Yields (index, result) pairs in completion order. Closing the generator cancels
+    the batches that are still queued or running. Set harness=True for executables
+    built by compile_cpp_harness(); limits are the run limits of every test (see
+    get_run_limits()); expected_outputs, when given, the expected stdout of each
+    test (None entries for none), to stop wrong answers early; language, the
+    language of the program (key of LANGUAGE_DRIVERS).
+    """
+    if not inputs:
+        return
+
+    chunk_count = max(1, min(JUDGE_MAX_WORKERS, len(inputs) // max(1, JUDGE_MIN_TESTS_PER_SANDBOX)))
+    chunk_size = -(-len(inputs) // chunk_count)
+
+    results_queue: "queue.Queue" = queue.Queue()
+    cancel_event = threading.Event()
+    futures = []
+    for offset in range(0, len(inputs), chunk_size):
+        futures.append(_test_executor.submit(
+            _run_chunk,
+            executable_path,
+            inputs[offset:offset + chunk_size],
+            offset,
+            results_queue,
+            cancel_event,
+            harness,
+            limits,
+            expected_outputs[offset:offset + chunk_size] if expected_outputs else None,
+            language
+        ))
+
+    pending_chunks = len(futures)
+    try:
+        while pending_chunks:
+            item = results_queue.get()
+            if item is None:
+                pending_chunks -= 1
+                continue
+            yield item
+    finally:
+        cancel_event.set()
+        for future in futures:
+            future.cancel()
+
+
+def run_tests(
+    executable_path: str,
+    inputs: List[str],
+    harness: bool = False,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> List[Dict]:
+    """
+    Runs a built program on a list of inputs in parallel sandboxes.
+    
+    Args:
+        executable_path (str): Path to the compiled executable.
+        inputs (List[str]): Inputs to provide via stdin, one per test.
+        harness (bool): Whether the executable was built by compile_cpp_harness().
+        limits (Optional[Dict]): Run limits, see get_run_limits().
+        expected_outputs (Optional[List[Optional[str]]]): Expected stdout of each test,
+            to stop wrong answers early (see _iter_batch()).
+        language (str): Language of the program (key of LANGUAGE_DRIVERS).
+        
+    Returns:
+        List[Dict]: One result per input, in input order, shaped like run_executable().
+    """
+    results: List[Optional[Dict]] = [None] * len(inputs)
+    for index, result in iter_tests(executable_path, inputs, harness, limits, expected_outputs, language):
+        results[index] = result
+    return results
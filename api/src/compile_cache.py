@@ -0,0 +1,206 @@
+"""
+Compile Cache
+
+Content-addressed on-disk cache for compiled executables.
+
+Entries are keyed on a hash of the source code, the compiler flags and the
+compiler version, so an identical (code, toolchain) pair is only ever built once.
+Executables are stored under `<root>/objects` and handed out to callers as hard
+links under `<root>/checkout`: callers can delete their copy as usual without
+affecting the cache, and evicting an entry never breaks a run in progress.
+
+The cache is bounded by size and evicts the least recently used entries first
+(recency is tracked through the file modification time, refreshed on every hit).
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+COMPILE_CACHE_ENABLED = os.getenv("COMPILE_CACHE_ENABLED", "true").lower() == "true"
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "compile_cache"))
+COMPILE_CACHE_MAX_MB = int(os.getenv("COMPILE_CACHE_MAX_MB", "512"))
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, copying instead when links are not available."""
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # e.g. src and dst live on different filesystems
+        shutil.copy2(src, dst)
+
+
+class CompileCache:
+    """
+    Size-bounded LRU store of compiled executables.
+
+    Attributes:
+        root: Directory holding the cache.
+        max_bytes: Maximum total size of the stored executables.
+        hits / misses / stores / evictions: In-process counters.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.checkout_dir = os.path.join(root, "checkout")
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.checkout_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source: str, flags: List[str], compiler_version: str) -> str:
+        """
+        Build the cache key for a compilation.
+
+        Args:
+            source: Source code being compiled.
+            flags: Compiler flags used for the build.
+            compiler_version: Version string of the compiler.
+
+        Returns:
+            str: Hex sha256 digest identifying the build.
+        """
+        digest = hashlib.sha256()
+        for part in (compiler_version, "\0".join(flags), source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0\0")
+        return digest.hexdigest()
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, f"{key}.out")
+
+    def checkout(self, key: str) -> Optional[str]:
+        """
+        Look up an executable and hand out a private link to it.
+
+        Args:
+            key: Cache key from make_key().
+
+        Returns:
+            Optional[str]: Path to a caller-owned executable, or None on a miss.
+        """
+        object_path = self._object_path(key)
+        checkout_path = os.path.join(self.checkout_dir, f"{key[:16]}-{uuid.uuid4().hex}.out")
+
+        try:
+            _link_or_copy(object_path, checkout_path)
+            # Refresh recency for LRU eviction
+            os.utime(object_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return checkout_path
+
+    def store(self, key: str, executable_path: str) -> None:
+        """
+        Add a freshly built executable to the cache.
+
+        The caller keeps ownership of `executable_path`; the cache stores its own link.
+
+        Args:
+            key: Cache key from make_key().
+            executable_path: Path to the built executable.
+        """
+        object_path = self._object_path(key)
+        tmp_path = os.path.join(self.objects_dir, f".{key}-{uuid.uuid4().hex}.tmp")
+
+        try:
+            _link_or_copy(executable_path, tmp_path)
+            os.replace(tmp_path, object_path)
+        except Exception as e:
+            logger.warning(f"Could not store executable in compile cache: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self.stores += 1
+            self._evict()
+
+    def _scan(self) -> List[os.DirEntry]:
+        return [
+            entry for entry in os.scandir(self.objects_dir)
+            if entry.is_file() and entry.name.endswith(".out")
+        ]
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total_size = 0
+        for entry in self._scan():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        if total_size <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def stats(self) -> Dict:
+        """
+        Report cache counters and current usage.
+
+        Returns:
+            Dict: hits, misses, stores, evictions, entries, size_bytes, max_bytes.
+        """
+        entries = self._scan()
+        size_bytes = 0
+        for entry in entries:
+            try:
+                size_bytes += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+
+        with self._lock:
+            return {
+                "enabled": COMPILE_CACHE_ENABLED,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+compile_cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_MB * 1024 * 1024)
@@ -1,14 +1,58 @@
 """
 Database Connection Management
 
-This file sets up the SQLAlchemy engine and session management.
-It provides a reusable 'get_db' dependency for FastAPI endpoints.
+This file sets up the SQLAlchemy engines and session management.
+It provides reusable 'get_db' (sync Session) and 'get_async_db' (AsyncSession,
+asyncpg driver) dependencies for FastAPI endpoints. 'async def' endpoints must use
+get_async_db: a sync Session there blocks the event loop on every query. Plain
+'def' endpoints keep using get_db (FastAPI runs them in its thread pool).
+
+The connection pools are configured from the environment (DB_POOL_*). Every API
+process (uvicorn worker, judge worker) has its own pools, one per engine, so the
+database sees up to DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW connections per engine and
+process. With
+DB_PGBOUNCER_MODE the engine keeps no pool of its own and opens a connection per
+session to PgBouncer, which shares a small set of server connections between all
+the processes (transaction pooling: no session state is kept across transactions).
+
+Pool usage (connections checked out, overflow, time spent waiting for a
+connection) is reported by get_pool_stats().
+
+Read replica: with DATABASE_READ_URL set, 'get_read_db' gives pure-read endpoints
+a read-only session on the replica, taking their traffic off the primary. It
+falls back to the primary when the replica is behind by more than
+DB_READ_MAX_LAG_SECONDS (or unreachable), and for the requests of a user who
+wrote less than DB_READ_YOUR_WRITES_SECONDS ago (recorded by the middleware of
+main.py), so that users read their own writes. Writes are recorded in the memory
+of the API process that served them: the guarantee only holds when a single API
+process (one uvicorn worker) serves the users, and never covers what the judge
+workers write (results of queued submissions), which may show up to
+DB_READ_MAX_LAG_SECONDS late. Without DATABASE_READ_URL get_read_db is the same
+as get_db.
+
+The lag is measured in the request that finds it due, so the read engine bounds
+how long a slow or unreachable replica can hold it: DB_READ_CONNECT_TIMEOUT_SECONDS
+to connect, DB_READ_STATEMENT_TIMEOUT_MS per statement.
 """
 
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Dict, List, Optional
+
+from uuid import uuid4
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
 
 # Get the database URL from the environment variable (set in docker-compose)
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://changeme:changeme@db/changeme")
@@ -16,17 +60,388 @@ DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://changeme:changeme@db/chan
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Same database through the asyncpg driver, unless given explicitly
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(DATABASE_URL).set(
+    drivername="postgresql+asyncpg"
+).render_as_string(hide_password=False)
+
+# Read replica for the pure-read endpoints (get_read_db); unset: reads go to the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Connections older than this are replaced (-1: never)
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER_MODE", "false").lower() == "true"
+
+# Reads of a user go to the primary for this long after one of their writes
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+# Replication lag beyond which reads go to the primary
+DB_READ_MAX_LAG_SECONDS = float(os.getenv("DB_READ_MAX_LAG_SECONDS", "5"))
+# How often the replication lag is measured
+DB_READ_LAG_CHECK_SECONDS = float(os.getenv("DB_READ_LAG_CHECK_SECONDS", "2"))
+# Bounds of the connections and statements of the read engine (0: none)
+DB_READ_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_READ_CONNECT_TIMEOUT_SECONDS", "2"))
+DB_READ_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_READ_STATEMENT_TIMEOUT_MS", "5000"))
+
+# Upper bounds of the pool wait time histogram buckets, in milliseconds
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """
+    Counters of the connection checkouts of a pool: how many, how long callers
+    waited for a connection (histogram), and how many gave up waiting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.wait_ms_max = 0.0
+        self.wait_ms_total = 0.0
+        self.wait_buckets: List[int] = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, wait_seconds: float, timed_out: bool) -> None:
+        wait_ms = wait_seconds * 1000
+        bucket = next(
+            (index for index, bound in enumerate(POOL_WAIT_BUCKETS_MS) if wait_ms <= bound),
+            len(POOL_WAIT_BUCKETS_MS)
+        )
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            self.wait_buckets[bucket] += 1
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            histogram = {f"le_{bound}": count for bound, count in zip(POOL_WAIT_BUCKETS_MS, self.wait_buckets)}
+            histogram["le_inf"] = self.wait_buckets[-1]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "wait_ms_avg": round(self.wait_ms_total / waits, 3) if waits else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "wait_ms_histogram": histogram,
+            }
+
+
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+read_pool_metrics = PoolMetrics()
+
+
+class _InstrumentedPoolMixin:
+    """Times every connection checkout (including the pre-ping) into the metrics of the pool class."""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        started = time.monotonic()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.monotonic() - started, timed_out=True)
+            raise
+        self.metrics.record_wait(time.monotonic() - started, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics = pool_metrics
+
+
+class InstrumentedNullPool(_InstrumentedPoolMixin, NullPool):
+    metrics = pool_metrics
+
+
+class InstrumentedReadQueuePool(_InstrumentedPoolMixin, QueuePool):
+    metrics = read_pool_metrics
+
+
+class InstrumentedReadNullPool(_InstrumentedPoolMixin, NullPool):
+    metrics = read_pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+class InstrumentedAsyncNullPool(_InstrumentedPoolMixin, NullPool):
+    metrics = async_pool_metrics
+
+
+def _engine_options(is_async: bool = False, is_read: bool = False) -> Dict:
+    if DB_PGBOUNCER_MODE:
+        # PgBouncer pools the server connections: keep none here
+        if not is_async:
+            return {"poolclass": InstrumentedReadNullPool if is_read else InstrumentedNullPool}
+        # Prepared statements do not survive transaction pooling: no asyncpg statement
+        # cache, and unique names so two clients never clash on one server connection
+        return {
+            "poolclass": InstrumentedAsyncNullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    if is_async:
+        poolclass = InstrumentedAsyncQueuePool
+    else:
+        poolclass = InstrumentedReadQueuePool if is_read else InstrumentedQueuePool
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Create the SQLAlchemy engines
+engine = create_engine(DATABASE_URL, **_engine_options())
+async_engine = create_async_engine(
+    make_url(ASYNC_DATABASE_URL).update_query_dict({"prepared_statement_cache_size": "0"})
+    if DB_PGBOUNCER_MODE else ASYNC_DATABASE_URL,
+    **_engine_options(is_async=True)
+)
+
+
+def _read_connect_args() -> Dict:
+    connect_args = {}
+    if DB_READ_CONNECT_TIMEOUT_SECONDS > 0:
+        connect_args["connect_timeout"] = DB_READ_CONNECT_TIMEOUT_SECONDS
+    # PgBouncer refuses the options startup parameter: ReplicaMonitor sets the
+    # timeout of its probe itself, set the others on the server role
+    if DB_READ_STATEMENT_TIMEOUT_MS > 0 and not DB_PGBOUNCER_MODE:
+        connect_args["options"] = f"-c statement_timeout={DB_READ_STATEMENT_TIMEOUT_MS}"
+    return connect_args
+
+
+# Read-only transactions: a write sent to the replica by mistake fails even when
+# DATABASE_READ_URL points at a writable database (e.g. a local stand-in)
+read_engine = create_engine(
+    DATABASE_READ_URL,
+    execution_options={"postgresql_readonly": True},
+    connect_args=_read_connect_args(),
+    **_engine_options(is_read=True)
+) if DATABASE_READ_URL else None
+
+
+@event.listens_for(engine, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connect()
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _count_async_connect(dbapi_connection, connection_record):
+    async_pool_metrics.record_connect()
+
+
+if read_engine is not None:
+    @event.listens_for(read_engine, "connect")
+    def _count_read_connect(dbapi_connection, connection_record):
+        read_pool_metrics.record_connect()
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=read_engine
+) if read_engine is not None else SessionLocal
+
+# Async sessions keep their objects loaded after commit: attributes cannot be
+# lazy loaded outside an await, so reload explicitly (refresh, selectinload)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Create a Base class for our models to inherit from see models.py
 Base = declarative_base()
 
 
+def get_pool_stats(is_async: bool = False, is_read: bool = False) -> Optional[Dict]:
+    """
+    Report the state of a connection pool of this process.
+
+    Args:
+        is_async: Report the pool of async_engine instead of the pool of engine.
+        is_read: Report the pool of read_engine (the read replica).
+
+    Returns:
+        Dict: mode ('pool' or 'pgbouncer'), configured size and overflow, connections
+            checked out / idle / in overflow, and the checkout counters of the pool.
+            None for the read pool when no read replica is configured.
+    """
+    if is_read:
+        if read_engine is None:
+            return None
+        pool, metrics = read_engine.pool, read_pool_metrics
+    elif is_async:
+        pool, metrics = async_engine.pool, async_pool_metrics
+    else:
+        pool, metrics = engine.pool, pool_metrics
+    stats = {
+        "mode": "pgbouncer" if DB_PGBOUNCER_MODE else "pool",
+        "pool_size": 0,
+        "max_overflow": 0,
+        "checked_out": 0,
+        "checked_in": 0,
+        "overflow": 0,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(0, pool.overflow()),
+        )
+    stats.update(metrics.snapshot())
+    return stats
+
+
+# --- Read replica routing ---
+
+class RecentWriters:
+    """
+    Users who wrote less than window_seconds ago (in this process): their reads
+    go to the primary, which already has their writes.
+
+    Only the requests served by this process are recorded: with several uvicorn
+    workers, the next request of a user may land on a process that did not see
+    their write, and writes of the judge workers are never recorded.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._last_write: Dict[str, float] = {}
+
+    def record(self, user_key: Optional[str]) -> None:
+        if user_key is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_key] = now
+            # Forget the users outside the window once in a while, not on every write
+            if len(self._last_write) > 1000:
+                self._last_write = {
+                    key: at for key, at in self._last_write.items() if now - at < self.window_seconds
+                }
+
+    def contains(self, user_key: Optional[str]) -> bool:
+        if user_key is None:
+            return False
+        with self._lock:
+            at = self._last_write.get(user_key)
+        return at is not None and time.monotonic() - at < self.window_seconds
+
+
+class ReplicaMonitor:
+    """
+    Measures the replication lag of the read replica, at most once per
+    check_interval_seconds (one request measures, the others use the last value),
+    and counts where the reads were routed. The measure is bounded by the connect
+    timeout of the read engine and DB_READ_STATEMENT_TIMEOUT_MS.
+    """
+
+    # Zero when the replica has replayed everything it received (an idle primary
+    # sends nothing, which must not look like lag), or when the database is not a
+    # standby at all (a local stand-in for the replica)
+    LAG_QUERY = text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, read_engine, max_lag_seconds: float, check_interval_seconds: float):
+        self.read_engine = read_engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self.lag_seconds: Optional[float] = None
+        self.reads_replica = 0
+        self.reads_primary_after_write = 0
+        self.reads_primary_replica_behind = 0
+
+    def _measure(self) -> Optional[float]:
+        try:
+            with self.read_engine.connect() as connection:
+                if DB_READ_STATEMENT_TIMEOUT_MS > 0:
+                    connection.execute(text(f"SET LOCAL statement_timeout = {DB_READ_STATEMENT_TIMEOUT_MS}"))
+                return float(connection.execute(self.LAG_QUERY).scalar())
+        except SQLAlchemyError as error:
+            logger.warning("Read replica unreachable, reading from the primary: %s", error.__class__.__name__)
+            return None
+
+    def is_usable(self) -> bool:
+        """Whether the replica answered the last check and is not too far behind."""
+        now = time.monotonic()
+        due = self._checked_at is None or now - self._checked_at >= self.check_interval_seconds
+        if due and self._lock.acquire(blocking=False):
+            try:
+                self.lag_seconds = self._measure()
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        lag = self.lag_seconds
+        return lag is not None and lag <= self.max_lag_seconds
+
+    def route(self, after_write: bool) -> bool:
+        """Pick the database of a read: True for the replica, False for the primary."""
+        use_replica = not after_write and self.is_usable()
+        with self._counts_lock:
+            if after_write:
+                self.reads_primary_after_write += 1
+            elif not use_replica:
+                self.reads_primary_replica_behind += 1
+            else:
+                self.reads_replica += 1
+        return use_replica
+
+    def stats(self) -> Dict:
+        with self._counts_lock:
+            return {
+                "lag_seconds": self.lag_seconds,
+                "max_lag_seconds": self.max_lag_seconds,
+                "reads_replica": self.reads_replica,
+                "reads_primary_after_write": self.reads_primary_after_write,
+                "reads_primary_replica_behind": self.reads_primary_replica_behind,
+            }
+
+
+recent_writers = RecentWriters(DB_READ_YOUR_WRITES_SECONDS)
+replica_monitor = ReplicaMonitor(
+    read_engine, DB_READ_MAX_LAG_SECONDS, DB_READ_LAG_CHECK_SECONDS
+) if read_engine is not None else None
+
+
+def get_read_routing_stats() -> Optional[Dict]:
+    """Report the replication lag and the routing counters of the reads (None without a replica)."""
+    return replica_monitor.stats() if replica_monitor is not None else None
+
+
 # --- FastAPI Dependency ---
 
 def get_db():
@@ -38,4 +453,31 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request):
+    """
+    FastAPI dependency that provides a read-only database session on the read
+    replica, for endpoints that only read. It uses the primary instead when no
+    replica is configured, when the replica is too far behind, or when the user
+    of the request wrote recently (request.state.read_from_primary, set by the
+    middleware of main.py). It ensures the session is always closed after the request.
+    """
+    use_replica = replica_monitor is not None and replica_monitor.route(
+        getattr(request.state, "read_from_primary", False)
+    )
+    db = ReadSessionLocal() if use_replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """
+    FastAPI dependency that provides an async database session (for 'async def' endpoints).
+    It ensures the session is always closed after the request.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
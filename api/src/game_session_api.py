@@ -8,12 +8,14 @@ from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import re
 
 # Import the database dependency and ORM models
-from database import get_db
+from database import get_async_db
 from models import Match, GameSession, MatchesForGame, Teacher, StudentJoinGame, StudentTest, StudentSolution, StudentSolutionTest, StudentAssignedReview, StudentReviewVote, StudentBadge
+from solution_artifacts import solution_artifacts
 
 # ============================================================================
 # Pydantic Models
@@ -73,7 +75,7 @@ class GameSessionUpdate(BaseModel):
 # Helpers
 # ============================================================================
 
-def _generate_clone_name(original_name: str, creator_id: int, db: Session) -> str:
+async def _generate_clone_name(original_name: str, creator_id: int, db: AsyncSession) -> str:
     """
     Generate a unique clone name with " - Copy N" suffix.
     If the original name already has " - Copy N", extract the base name.
@@ -87,14 +89,12 @@ def _generate_clone_name(original_name: str, creator_id: int, db: Session) -> st
         base_name = original_name
 
     # get all session names for this creator
-    existing_sessions = (
-        db.query(GameSession.name)
-        .filter(GameSession.creator_id == creator_id)
-        .all()
-    )
-
-    # db.query(GameSession.name).all() returns list of tuples like [("Name",), ...]
-    existing_names = [row[0] for row in existing_sessions]
+    existing_names = (
+        await db.scalars(
+            select(GameSession.name)
+            .where(GameSession.creator_id == creator_id)
+        )
+    ).all()
 
     # find the highest copy number
     max_copy_num = 0
@@ -111,10 +111,10 @@ def _generate_clone_name(original_name: str, creator_id: int, db: Session) -> st
     # if there are no existing " - Copy N" instances, return "base_name - Copy 1"
     return f"{base_name} - Copy {max_copy_num + 1}"
 
-def _replace_game_session_matches(
+async def _replace_game_session_matches(
     game_id: int,
     match_ids: List[int],
-    db: Session
+    db: AsyncSession
 ) -> None:
     """
     Replace all MatchesForGame links for a game session with the given match_ids.
@@ -124,9 +124,11 @@ def _replace_game_session_matches(
     For the deletion-only cases, pass an empty list for match_ids.
     """
     # delete existing links
-    db.query(MatchesForGame).filter(
-        MatchesForGame.game_id == game_id
-    ).delete(synchronize_session=False)
+    await db.execute(
+        delete(MatchesForGame)
+        .where(MatchesForGame.game_id == game_id)
+        .execution_options(synchronize_session=False)
+    )
 
     # add new links
     for mid in match_ids:
@@ -159,7 +161,7 @@ router = APIRouter(
 )
 async def create_game_session(
     game_session_data: GameSessionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
     ) -> GameSessionResponse:
 
     if len(game_session_data.match_id) <= 0:
@@ -171,7 +173,7 @@ async def create_game_session(
         )
 
 
-    teacher = db.query(Teacher).filter(Teacher.teacher_id == game_session_data.creator_id).first()
+    teacher = await db.scalar(select(Teacher).where(Teacher.teacher_id == game_session_data.creator_id))
     print(teacher)
     print(game_session_data.creator_id)
     if not teacher:
@@ -181,7 +183,7 @@ async def create_game_session(
             detail=f"Request error"
         )
     
-    matches = db.query(Match).filter(Match.match_id.in_(game_session_data.match_id)).all()
+    matches = (await db.scalars(select(Match).where(Match.match_id.in_(game_session_data.match_id)))).all()
     
     if len(matches) != len(game_session_data.match_id):
         print("Error: match not found")
@@ -193,7 +195,7 @@ async def create_game_session(
     new_game_session = GameSession(creator_id=game_session_data.creator_id, name=game_session_data.name, start_date=game_session_data.start_date, duration_phase1=game_session_data.duration_phase1, duration_phase2=game_session_data.duration_phase2) 
     db.add(new_game_session)
     
-    db.flush() 
+    await db.flush() 
 
     for match in matches:
         match_link = MatchesForGame(
@@ -203,10 +205,10 @@ async def create_game_session(
         db.add(match_link)
 
     try:
-        db.commit()
-        db.refresh(new_game_session)
+        await db.commit()
+        await db.refresh(new_game_session)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Server error"
@@ -223,14 +225,14 @@ async def create_game_session(
 )
 async def list_game_sessions_by_creator(
     creator_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[GameSessionDetail]:
     """
     List all game sessions created by a specific creator (teacher).
     """
     
     # check that the creator (teacher) exists
-    teacher = db.query(Teacher).filter(Teacher.teacher_id == creator_id).first()
+    teacher = await db.scalar(select(Teacher).where(Teacher.teacher_id == creator_id))
     if not teacher:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -238,7 +240,7 @@ async def list_game_sessions_by_creator(
         )
         
     # retrieve game sessions created by the specified creator
-    game_sessions = db.query(GameSession).filter(GameSession.creator_id == creator_id).all()
+    game_sessions = (await db.scalars(select(GameSession).where(GameSession.creator_id == creator_id))).all()
     
     if not game_sessions:
         # return empty list if no game sessions found
@@ -248,7 +250,7 @@ async def list_game_sessions_by_creator(
     game_ids = [gs.game_id for gs in game_sessions]
     
     # get all match links for these game sessions
-    match_links = db.query(MatchesForGame).filter(MatchesForGame.game_id.in_(game_ids)).all()
+    match_links = (await db.scalars(select(MatchesForGame).where(MatchesForGame.game_id.in_(game_ids)))).all()
     
     # build a mapping from game_id to list of match_ids
     match_map = {gid: [] for gid in game_ids}
@@ -282,14 +284,14 @@ async def list_game_sessions_by_creator(
 )
 async def delete_game_session(
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> None:
     """
     Delete a game session and its associated match links.
     """
     
     # check that the game session exists
-    game_session = db.query(GameSession).filter(GameSession.game_id == game_id).first()
+    game_session = await db.scalar(select(GameSession).where(GameSession.game_id == game_id))
     
     if not game_session:
         raise HTTPException(
@@ -299,74 +301,103 @@ async def delete_game_session(
         
     try:
         # Get all matches_for_game IDs for this game session
-        match_for_game_ids = [
-            mfg.match_for_game_id for mfg in 
-            db.query(MatchesForGame).filter(MatchesForGame.game_id == game_id).all()
-        ]
+        match_for_game_ids = (
+            await db.scalars(select(MatchesForGame.match_for_game_id).where(MatchesForGame.game_id == game_id))
+        ).all()
         
         if match_for_game_ids:
             # Get all solution IDs for these matches
-            solution_ids = [
-                s.solution_id for s in 
-                db.query(StudentSolution).filter(StudentSolution.match_for_game_id.in_(match_for_game_ids)).all()
-            ]
+            solution_ids = (
+                await db.scalars(
+                    select(StudentSolution.solution_id).where(StudentSolution.match_for_game_id.in_(match_for_game_ids))
+                )
+            ).all()
             
             # Get all student test IDs for these matches
-            student_test_ids = [
-                t.test_id for t in 
-                db.query(StudentTest).filter(StudentTest.match_for_game_id.in_(match_for_game_ids)).all()
-            ]
+            student_test_ids = (
+                await db.scalars(
+                    select(StudentTest.test_id).where(StudentTest.match_for_game_id.in_(match_for_game_ids))
+                )
+            ).all()
             
             # Delete review votes first (references assigned reviews)
             if solution_ids:
                 # Get assigned review IDs that reference these solutions
-                assigned_review_ids = [
-                    r.student_assigned_review_id for r in
-                    db.query(StudentAssignedReview).filter(StudentAssignedReview.assigned_solution_id.in_(solution_ids)).all()
-                ]
+                assigned_review_ids = (
+                    await db.scalars(
+                        select(StudentAssignedReview.student_assigned_review_id)
+                        .where(StudentAssignedReview.assigned_solution_id.in_(solution_ids))
+                    )
+                ).all()
                 
                 if assigned_review_ids:
                     # Delete review votes
-                    db.query(StudentReviewVote).filter(
-                        StudentReviewVote.student_assigned_review_id.in_(assigned_review_ids)
-                    ).delete(synchronize_session=False)
+                    await db.execute(
+                        delete(StudentReviewVote)
+                        .where(StudentReviewVote.student_assigned_review_id.in_(assigned_review_ids))
+                        .execution_options(synchronize_session=False)
+                    )
                 
                 # Delete assigned reviews
-                db.query(StudentAssignedReview).filter(
-                    StudentAssignedReview.assigned_solution_id.in_(solution_ids)
-                ).delete(synchronize_session=False)
+                await db.execute(
+                    delete(StudentAssignedReview)
+                    .where(StudentAssignedReview.assigned_solution_id.in_(solution_ids))
+                    .execution_options(synchronize_session=False)
+                )
             
             # Delete student_solution_tests (references both solutions and student_tests)
             if solution_ids:
-                db.query(StudentSolutionTest).filter(
-                    StudentSolutionTest.solution_id.in_(solution_ids)
-                ).delete(synchronize_session=False)
+                await db.execute(
+                    delete(StudentSolutionTest)
+                    .where(StudentSolutionTest.solution_id.in_(solution_ids))
+                    .execution_options(synchronize_session=False)
+                )
             
             # Delete student solutions
-            db.query(StudentSolution).filter(
-                StudentSolution.match_for_game_id.in_(match_for_game_ids)
-            ).delete(synchronize_session=False)
+            await db.execute(
+                delete(StudentSolution)
+                .where(StudentSolution.match_for_game_id.in_(match_for_game_ids))
+                .execution_options(synchronize_session=False)
+            )
             
             # Delete student tests
-            db.query(StudentTest).filter(
-                StudentTest.match_for_game_id.in_(match_for_game_ids)
-            ).delete(synchronize_session=False)
+            await db.execute(
+                delete(StudentTest)
+                .where(StudentTest.match_for_game_id.in_(match_for_game_ids))
+                .execution_options(synchronize_session=False)
+            )
         
         # Delete student join records
-        db.query(StudentJoinGame).filter(StudentJoinGame.game_id == game_id).delete(synchronize_session=False)
+        await db.execute(
+            delete(StudentJoinGame)
+            .where(StudentJoinGame.game_id == game_id)
+            .execution_options(synchronize_session=False)
+        )
         
         # Delete matches_for_game records
-        db.query(MatchesForGame).filter(MatchesForGame.game_id == game_id).delete(synchronize_session=False)
+        await db.execute(
+            delete(MatchesForGame)
+            .where(MatchesForGame.game_id == game_id)
+            .execution_options(synchronize_session=False)
+        )
         
         # Delete student badges earned in this game session
-        db.query(StudentBadge).filter(StudentBadge.game_session_id == game_id).delete(synchronize_session=False)
+        await db.execute(
+            delete(StudentBadge)
+            .where(StudentBadge.game_session_id == game_id)
+            .execution_options(synchronize_session=False)
+        )
         
         # Delete the game session
-        db.delete(game_session)
-        db.commit()
+        await db.delete(game_session)
+        await db.commit()
+
+        # Executables kept for the deleted solutions
+        if match_for_game_ids and solution_ids:
+            solution_artifacts.remove_solutions(solution_ids)
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Server error while deleting game session: {str(e)}"
@@ -382,14 +413,14 @@ async def delete_game_session(
 )
 async def clone_game_session(
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> GameSessionResponse:
     """
     Clone an existing game session along with its associated matches.
     """
     
     # find original game session
-    original_game_session = db.query(GameSession).filter(GameSession.game_id == game_id).first()
+    original_game_session = await db.scalar(select(GameSession).where(GameSession.game_id == game_id))
     
     if not original_game_session:
         raise HTTPException(
@@ -398,13 +429,13 @@ async def clone_game_session(
         )
         
     # get all matches linked to the original game session
-    original_matches_links = db.query(MatchesForGame).filter(MatchesForGame.game_id == game_id).all()
+    original_matches_links = (await db.scalars(select(MatchesForGame).where(MatchesForGame.game_id == game_id))).all()
     
     # create cloned game session
-    cloned_name = _generate_clone_name(original_game_session.name, original_game_session.creator_id, db)
+    cloned_name = await _generate_clone_name(original_game_session.name, original_game_session.creator_id, db)
     new_game_session = GameSession(creator_id=original_game_session.creator_id, name=cloned_name, start_date=original_game_session.start_date, duration_phase1 = original_game_session.duration_phase1, duration_phase2=original_game_session.duration_phase2)
     db.add(new_game_session)
-    db.flush()
+    await db.flush()
     
     # clone all match links to the new game session
     for link in original_matches_links:
@@ -415,10 +446,10 @@ async def clone_game_session(
         db.add(new_link)
         
     try:
-        db.commit()
-        db.refresh(new_game_session)
+        await db.commit()
+        await db.refresh(new_game_session)
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Server error while cloning game session"
@@ -436,13 +467,13 @@ async def clone_game_session(
 async def update_game_session(
     game_id: int,
     game_session_data: GameSessionUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> GameSessionDetail:
     """
     Update the details of an existing game session.
     """
     # check that the game session exists
-    game_session = db.query(GameSession).filter(GameSession.game_id == game_id).first()
+    game_session = await db.scalar(select(GameSession).where(GameSession.game_id == game_id))
     if not game_session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -475,8 +506,8 @@ async def update_game_session(
             )
 
         # validate matches exist
-        matches = db.query(Match).filter(
-            Match.match_id.in_(game_session_data.match_id)
+        matches = (
+            await db.scalars(select(Match).where(Match.match_id.in_(game_session_data.match_id)))
         ).all()
 
         if len(matches) != len(game_session_data.match_id):
@@ -487,14 +518,14 @@ async def update_game_session(
 
         # replace match links
         try:
-            _replace_game_session_matches(
+            await _replace_game_session_matches(
                 game_id=game_id,
                 match_ids=[m.match_id for m in matches],
                 db=db,
             )
 
         except Exception:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Server error while updating game session matches"
@@ -503,20 +534,19 @@ async def update_game_session(
     game_session.duration_phase2 = game_session_data.duration_phase2
     # commit everything 
     try:
-        db.commit()
-        db.refresh(game_session)
+        await db.commit()
+        await db.refresh(game_session)
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Server error while updating game session"
         )
 
     # get current match ids for response
-    current_links = db.query(MatchesForGame).filter(
-        MatchesForGame.game_id == game_id
+    match_ids = (
+        await db.scalars(select(MatchesForGame.match_id).where(MatchesForGame.game_id == game_id))
     ).all()
-    match_ids = [link.match_id for link in current_links]
 
     return GameSessionDetail(
         game_id=game_session.game_id,
@@ -537,7 +567,7 @@ async def update_game_session(
 )
 async def get_game_session_from_id(
     game_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> GameSessionDetail:
 
     """
@@ -545,7 +575,7 @@ async def get_game_session_from_id(
     """
     
     # find the game session
-    game_session = db.query(GameSession).filter(GameSession.game_id == game_id).first()
+    game_session = await db.scalar(select(GameSession).where(GameSession.game_id == game_id))
     if not game_session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -553,8 +583,9 @@ async def get_game_session_from_id(
         )
         
     # get all match links for this game session
-    match_links = db.query(MatchesForGame).filter(MatchesForGame.game_id == game_id).all()
-    match_ids = [link.match_id for link in match_links]
+    match_ids = (
+        await db.scalars(select(MatchesForGame.match_id).where(MatchesForGame.game_id == game_id))
+    ).all()
     
     return GameSessionDetail(
         game_id=game_session.game_id,
@@ -1,10 +1,10 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, extract
-from database import get_db
+from sqlalchemy import func, extract, select
+from database import get_async_db
 from models import Student, StudentJoinGame, GameSession, MatchesForGame
 from datetime import datetime
 
@@ -55,7 +55,7 @@ router = APIRouter(prefix="/api", tags=["join_game_session"])
     description="Allows a student to join a game session",
 )
 async def student_join_game(
-    input_data: JoinGameSession, db: Session = Depends(get_db)
+    input_data: JoinGameSession, db: AsyncSession = Depends(get_async_db)
 ) -> JoinGameSessionResponse:
     """
     Allows a student to join a game session
@@ -66,7 +66,7 @@ async def student_join_game(
     On success, it returns a message indicating successful enrollment
     """
     # Get the specific game session by ID
-    game_session = db.query(GameSession).filter(GameSession.game_id == input_data.game_id).first()
+    game_session = await db.scalar(select(GameSession).where(GameSession.game_id == input_data.game_id))
 
     if game_session is None:
         raise HTTPException(
@@ -80,14 +80,14 @@ async def student_join_game(
             detail="The game session has already started, it's not possible to join",
         )
     
-    game_match_ids = db.query(MatchesForGame.match_id).filter(MatchesForGame.game_id == input_data.game_id)
+    game_match_ids = select(MatchesForGame.match_id).where(MatchesForGame.game_id == input_data.game_id)
     
-    played_match_ids =  db.query(StudentJoinGame.assigned_match_id.label("match_id")).filter(
+    played_match_ids =  select(StudentJoinGame.assigned_match_id.label("match_id")).where(
         StudentJoinGame.student_id == input_data.student_id,
         StudentJoinGame.game_id == input_data.game_id
     )
 
-    remaining_matches = game_match_ids.except_(played_match_ids).first()
+    remaining_matches = (await db.execute(game_match_ids.except_(played_match_ids).limit(1))).first()
 
     if not remaining_matches:
         raise HTTPException(
@@ -100,20 +100,20 @@ async def student_join_game(
             student_id=input_data.student_id, game_id=input_data.game_id
         )
         db.add(ins)
-        db.flush()
-        db.commit()
+        await db.flush()
+        await db.commit()
         return JoinGameSessionResponse(
             msg="Student has joined the session successfully"
         )
 
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="The student is already enrolled in this game session",
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error",
@@ -128,7 +128,7 @@ async def student_join_game(
     description="Allows a student to get next upcoming game session",
 )
 async def get_next_upcoming_game(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> GetNextUpcomingGameResponse:
     """
     Allows a student to get the next upcoming game session
@@ -142,12 +142,12 @@ async def get_next_upcoming_game(
     now = func.now()
     time_difference = func.abs(extract("epoch", GameSession.start_date - now))
     
-    result = (
-        db.query(GameSession)
-        .filter(GameSession.actual_start_date.is_(None))                    # not started yet 
-        .filter(func.date(GameSession.start_date) == func.current_date())  # same day (today)
+    result = await db.scalar(
+        select(GameSession)
+        .where(GameSession.actual_start_date.is_(None))                     # not started yet 
+        .where(func.date(GameSession.start_date) == func.current_date())   # same day (today)
         .order_by(time_difference.asc(), GameSession.start_date.asc())     # closest (can be past or future)
-        .first()
+        .limit(1)
     )
     
     if result is None:
@@ -174,26 +174,26 @@ async def get_next_upcoming_game(
 async def has_student_joined_game(
     student_id: int,
     game_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> StudentJoinedResponse:
     """
     Allows to check if a student has joined a specific game session
     On success, it returns True if the student has joined the game session, otherwise False
     """
     
-    if not db.query(Student).filter(Student.user_id == student_id).first():
+    if not await db.scalar(select(Student).where(Student.user_id == student_id).limit(1)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
 
-    if not db.query(GameSession).filter(GameSession.game_id == game_id).first():
+    if not await db.scalar(select(GameSession).where(GameSession.game_id == game_id)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game session not found")
 
-    enrollment = (
-        db.query(StudentJoinGame)
-        .filter(
+    enrollment = await db.scalar(
+        select(StudentJoinGame)
+        .where(
             StudentJoinGame.student_id == student_id,
             StudentJoinGame.game_id == game_id,
         )
-        .first()
+        .limit(1)
     )
 
     return StudentJoinedResponse(joined=enrollment is not None)
\ No newline at end of file
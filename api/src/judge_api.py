@@ -0,0 +1,181 @@
+"""
+Judge API Module
+
+Provides operational endpoints for the code judge (compilation and sandboxed runs),
+restricted to teachers and admins:
+- Compile cache counters and usage
+- Judge queue depth
+- Admission control counters (requests judging, waiting and rejected)
+- Database connection pool usage (sync and async engines, read replica)
+- Read replica lag and routing of the reads
+"""
+
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from database import get_db, get_pool_stats, get_read_routing_stats
+from compile_cache import compile_cache
+from judge_queue import queue_stats
+from admission import judge_admission
+from authentication.routes.auth_routes import get_current_user
+
+# ============================================================================
+# Pydantic Response Models
+# ============================================================================
+
+class CompileCacheStatsResponse(BaseModel):
+    """
+    Response model for compile cache statistics.
+    """
+    enabled: bool = Field(..., description="Whether the compile cache is enabled")
+    hits: int = Field(..., description="Compilations served from the cache")
+    misses: int = Field(..., description="Compilations not found in the cache")
+    stores: int = Field(..., description="Executables added to the cache")
+    evictions: int = Field(..., description="Executables evicted to respect the size cap")
+    entries: int = Field(..., description="Executables currently stored")
+    size_bytes: int = Field(..., description="Current size of the cache on disk")
+    max_bytes: int = Field(..., description="Configured size cap")
+
+
+class JudgeQueueStatsResponse(BaseModel):
+    """
+    Response model for judge queue statistics.
+    """
+    queued: int = Field(..., description="Jobs waiting for a worker")
+    running: int = Field(..., description="Jobs being judged")
+    done: int = Field(..., description="Finished jobs still retained")
+    failed: int = Field(..., description="Failed jobs still retained")
+    workers: int = Field(..., description="Queue workers running in this API process")
+
+
+class JudgeAdmissionStatsResponse(BaseModel):
+    """
+    Response model for admission control statistics.
+    """
+    enabled: bool = Field(..., description="Whether admission control is enabled")
+    max_concurrent: int = Field(..., description="Requests allowed to judge at the same time")
+    max_per_user: int = Field(..., description="Requests of one user allowed to judge or wait")
+    max_waiting: int = Field(..., description="Requests allowed to wait for a slot")
+    active: int = Field(..., description="Requests judging")
+    waiting: int = Field(..., description="Requests waiting for a slot")
+    admitted: int = Field(..., description="Requests admitted")
+    rejected_queue_full: int = Field(..., description="Requests rejected because too many were waiting")
+    rejected_user_limit: int = Field(..., description="Requests rejected because their user already had too many")
+    rejected_timeout: int = Field(..., description="Requests rejected after waiting too long for a slot")
+    waited: int = Field(..., description="Requests that had to wait for a slot")
+    wait_ms_avg: int = Field(..., description="Average wait of the requests that had to wait")
+    wait_ms_max: int = Field(..., description="Longest wait")
+    hold_ms_avg: int = Field(..., description="Recent average time a slot is held")
+    rate_limited: int = Field(..., description="Student requests rejected by their rate limit")
+
+
+class DatabasePoolWaitHistogramResponse(BaseModel):
+    """
+    Response model for the pool wait time histogram (checkouts per upper bound, in ms).
+    """
+    le_1: int
+    le_5: int
+    le_10: int
+    le_25: int
+    le_50: int
+    le_100: int
+    le_250: int
+    le_500: int
+    le_1000: int
+    le_5000: int
+    le_inf: int
+
+
+class DatabasePoolStatsResponse(BaseModel):
+    """
+    Response model for database connection pool statistics.
+    """
+    mode: str = Field(..., description="'pool', or 'pgbouncer' when PgBouncer pools the connections")
+    pool_size: int = Field(..., description="Connections kept open by the pool")
+    max_overflow: int = Field(..., description="Connections allowed beyond the pool size")
+    checked_out: int = Field(..., description="Connections in use")
+    checked_in: int = Field(..., description="Idle connections in the pool")
+    overflow: int = Field(..., description="Connections open beyond the pool size")
+    checkouts: int = Field(..., description="Connections handed out")
+    timeouts: int = Field(..., description="Requests that gave up waiting for a connection")
+    connects: int = Field(..., description="Database connections opened")
+    wait_ms_avg: float = Field(..., description="Average time to get a connection")
+    wait_ms_max: float = Field(..., description="Longest time to get a connection")
+    wait_ms_histogram: DatabasePoolWaitHistogramResponse
+
+
+class DatabaseReadRoutingResponse(BaseModel):
+    """
+    Response model for the routing of the reads between the read replica and the primary.
+    """
+    lag_seconds: Optional[float] = Field(None, description="Last measured replication lag (None: replica unreachable)")
+    max_lag_seconds: float = Field(..., description="Lag beyond which reads go to the primary")
+    reads_replica: int = Field(..., description="Reads served by the replica")
+    reads_primary_after_write: int = Field(..., description="Reads sent to the primary because their user wrote recently")
+    reads_primary_replica_behind: int = Field(..., description="Reads sent to the primary because the replica was behind or unreachable")
+
+
+class JudgeStatsResponse(BaseModel):
+    """
+    Response model for judge statistics.
+    """
+    compile_cache: CompileCacheStatsResponse
+    queue: JudgeQueueStatsResponse
+    admission: JudgeAdmissionStatsResponse
+    database: DatabasePoolStatsResponse
+    database_async: DatabasePoolStatsResponse
+    database_read: Optional[DatabasePoolStatsResponse] = Field(None, description="None: no read replica configured")
+    read_routing: Optional[DatabaseReadRoutingResponse] = Field(None, description="None: no read replica configured")
+
+
+# ============================================================================
+# API Router
+# ============================================================================
+
+router = APIRouter(
+    prefix="/api/judge",
+    tags=["Judge"]
+)
+
+
+async def require_staff(current_user: Annotated[dict, Depends(get_current_user)]) -> dict:
+    """
+    Dependency that ensures the current user is a teacher or an admin.
+    Raises 403 Forbidden otherwise.
+    """
+    role = current_user.get("role", "")
+    if role not in ("teacher", "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and admins can view judge statistics"
+        )
+    return current_user
+
+
+@router.get(
+    "/stats",
+    response_model=JudgeStatsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get judge statistics",
+    description=(
+        "Returns the counters of the compile cache, of admission control and of the "
+        "database connection pool (in-process, per API worker) and the judge queue depth. "
+        "Teachers and admins only."
+    ),
+)
+def get_judge_stats(
+    current_user: Annotated[dict, Depends(require_staff)],
+    db: Session = Depends(get_db),
+) -> JudgeStatsResponse:
+    return JudgeStatsResponse(
+        compile_cache=CompileCacheStatsResponse(**compile_cache.stats()),
+        queue=JudgeQueueStatsResponse(**queue_stats(db)),
+        admission=JudgeAdmissionStatsResponse(**judge_admission.stats()),
+        database=DatabasePoolStatsResponse(**get_pool_stats()),
+        database_async=DatabasePoolStatsResponse(**get_pool_stats(is_async=True)),
+        database_read=get_pool_stats(is_read=True),
+        read_routing=get_read_routing_stats()
+    )
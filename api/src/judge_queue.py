@@ -0,0 +1,465 @@
+"""
+Judge Queue
+
+Postgres-table-backed queue of judge jobs (compilation and test runs).
+
+Endpoints enqueue a job and return its id immediately; worker threads claim jobs
+with `SELECT ... FOR UPDATE SKIP LOCKED`, so any number of workers (in this process
+or in other processes sharing the database) can drain the same queue without
+handing the same job out twice.
+
+- Priorities: higher `priority` values are claimed first, then oldest first.
+- Backpressure: enqueueing fails when the queue is too deep (JudgeQueueFullError)
+  or when a student already has too many pending jobs (JudgeQueueStudentLimitError).
+- Coalescing: a job identical to a pending job of the same student (same kind and
+  payload) can be answered with that job instead (enqueue_job(coalesce=True)).
+- Leases: a job left in `running` for longer than JUDGE_JOB_LEASE_SECONDS (e.g. its
+  worker crashed) is claimed again, up to JUDGE_JOB_MAX_ATTEMPTS times.
+
+Job kinds are bound to handlers with register_job_handler(); a handler receives a
+database session and the job payload, and returns a JSON-serializable result.
+
+Workers run as threads of the API process (JUDGE_QUEUE_WORKERS, 0 to disable) and/or
+as standalone processes started with judge_worker.py.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import JudgeJob
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+JUDGE_QUEUE_WORKERS = int(os.getenv("JUDGE_QUEUE_WORKERS", "2"))
+JUDGE_QUEUE_MAX_DEPTH = int(os.getenv("JUDGE_QUEUE_MAX_DEPTH", "500"))
+JUDGE_QUEUE_MAX_PENDING_PER_STUDENT = int(os.getenv("JUDGE_QUEUE_MAX_PENDING_PER_STUDENT", "3"))
+JUDGE_QUEUE_POLL_SECONDS = float(os.getenv("JUDGE_QUEUE_POLL_SECONDS", "0.5"))
+JUDGE_QUEUE_RETRY_AFTER_SECONDS = int(os.getenv("JUDGE_QUEUE_RETRY_AFTER_SECONDS", "5"))
+JUDGE_JOB_LEASE_SECONDS = int(os.getenv("JUDGE_JOB_LEASE_SECONDS", "300"))
+JUDGE_JOB_MAX_ATTEMPTS = int(os.getenv("JUDGE_JOB_MAX_ATTEMPTS", "3"))
+JUDGE_JOB_RETENTION_HOURS = int(os.getenv("JUDGE_JOB_RETENTION_HOURS", "24"))
+
+# Job statuses
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Job priorities (higher runs first)
+PRIORITY_SOLUTION = 10
+PRIORITY_CUSTOM_TEST = 0
+
+_PURGE_INTERVAL_SECONDS = 600
+# First key of the advisory locks serializing the enqueues of a student
+_ENQUEUE_LOCK_NAMESPACE = 7101
+
+
+class JudgeQueueFullError(Exception):
+    """Raised when the queue already holds JUDGE_QUEUE_MAX_DEPTH pending jobs."""
+
+
+class JudgeQueueStudentLimitError(Exception):
+    """Raised when a student already has JUDGE_QUEUE_MAX_PENDING_PER_STUDENT pending jobs."""
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+
+_handlers: Dict[str, Callable[[Session, Dict], Dict]] = {}
+
+
+def register_job_handler(kind: str, handler: Callable[[Session, Dict], Dict]) -> None:
+    """
+    Bind a job kind to the function that executes it.
+
+    Args:
+        kind: Job kind, as passed to enqueue_job().
+        handler: Called with (db, payload); returns a JSON-serializable result.
+            An HTTPException raised by the handler marks the job as failed with its detail.
+    """
+    _handlers[kind] = handler
+
+
+# ============================================================================
+# QUEUE OPERATIONS
+# ============================================================================
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Dict,
+    student_id: Optional[int] = None,
+    priority: int = 0,
+    coalesce: bool = False
+) -> JudgeJob:
+    """
+    Add a job to the queue.
+
+    Args:
+        db: Database session (the job is committed).
+        kind: Job kind, bound to a handler with register_job_handler().
+        payload: JSON-serializable arguments of the handler.
+        student_id: Student the job belongs to, used for the per-student limit.
+        priority: Higher values are claimed first.
+        coalesce: Return the student's pending job of the same kind and payload,
+            if any, instead of adding another one.
+
+    Returns:
+        JudgeJob: The queued job (or the pending one it was coalesced with).
+
+    Raises:
+        JudgeQueueFullError: The queue is full.
+        JudgeQueueStudentLimitError: The student has too many pending jobs.
+    """
+    payload_json = json.dumps(payload, sort_keys=True)
+
+    if student_id is not None:
+        # Enqueues of a student run one at a time (across processes), so that two
+        # identical submissions cannot both miss each other, nor both pass the limit
+        db.execute(select(func.pg_advisory_xact_lock(_ENQUEUE_LOCK_NAMESPACE, student_id)))
+
+        if coalesce:
+            existing = (
+                db.query(JudgeJob)
+                .filter(
+                    JudgeJob.student_id == student_id,
+                    JudgeJob.kind == kind,
+                    JudgeJob.status.in_([JOB_QUEUED, JOB_RUNNING]),
+                    JudgeJob.payload == payload_json
+                )
+                .order_by(JudgeJob.job_id)
+                .first()
+            )
+            if existing is not None:
+                db.commit()
+                return existing
+
+    pending = (
+        db.query(func.count(JudgeJob.job_id))
+        .filter(JudgeJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+    )
+    if pending.scalar() >= JUDGE_QUEUE_MAX_DEPTH:
+        db.rollback()
+        raise JudgeQueueFullError()
+
+    if student_id is not None:
+        student_pending = pending.filter(JudgeJob.student_id == student_id).scalar()
+        if student_pending >= JUDGE_QUEUE_MAX_PENDING_PER_STUDENT:
+            db.rollback()
+            raise JudgeQueueStudentLimitError()
+
+    job = JudgeJob(
+        kind=kind,
+        status=JOB_QUEUED,
+        priority=priority,
+        payload=payload_json,
+        student_id=student_id,
+        created_at=_utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    _wakeup.set()
+    return job
+
+
+def enqueue_job_or_raise(
+    db: Session,
+    kind: str,
+    payload: Dict,
+    student_id: Optional[int] = None,
+    priority: int = 0,
+    coalesce: bool = False
+) -> JudgeJob:
+    """
+    enqueue_job() for API handlers: backpressure errors become HTTP errors
+    (503 when the queue is full, 429 when the student has too many pending jobs),
+    both with a Retry-After header.
+    """
+    retry_after = {"Retry-After": str(JUDGE_QUEUE_RETRY_AFTER_SECONDS)}
+    try:
+        return enqueue_job(db, kind, payload, student_id=student_id, priority=priority, coalesce=coalesce)
+    except JudgeQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="The judge is busy, please retry shortly",
+            headers=retry_after
+        )
+    except JudgeQueueStudentLimitError:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many submissions waiting to be judged, please wait for the previous ones",
+            headers=retry_after
+        )
+
+
+def wait_for_job(job_id: int, timeout: float) -> Optional[JudgeJob]:
+    """
+    Block until a job is finished.
+
+    Args:
+        job_id: Id of the job.
+        timeout: Maximum time to wait, in seconds.
+
+    Returns:
+        Optional[JudgeJob]: The finished job (detached from its session), or None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        db = SessionLocal()
+        try:
+            job = db.query(JudgeJob).filter(JudgeJob.job_id == job_id).first()
+            if job is None or job.status in (JOB_DONE, JOB_FAILED):
+                return job
+        finally:
+            db.close()
+
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(JUDGE_QUEUE_POLL_SECONDS)
+
+
+def get_queue_position(db: Session, job: JudgeJob) -> Optional[int]:
+    """
+    Number of queued jobs that will be claimed before this one (None if not queued).
+    """
+    if job.status != JOB_QUEUED:
+        return None
+    return (
+        db.query(func.count(JudgeJob.job_id))
+        .filter(
+            JudgeJob.status == JOB_QUEUED,
+            or_(
+                JudgeJob.priority > job.priority,
+                and_(JudgeJob.priority == job.priority, JudgeJob.job_id < job.job_id)
+            )
+        )
+        .scalar()
+    )
+
+
+def claim_next_job(db: Session, kinds: Optional[List[str]] = None) -> Optional[JudgeJob]:
+    """
+    Claim the next job to run and mark it as running.
+
+    Queued jobs and running jobs whose lease expired are eligible; rows locked by
+    other workers are skipped. Jobs that already used all their attempts are failed.
+
+    Args:
+        db: Database session (the claim is committed).
+        kinds: Restrict to these job kinds (default: every kind with a handler).
+
+    Returns:
+        Optional[JudgeJob]: The claimed job, or None if there is nothing to run.
+    """
+    kinds = kinds if kinds is not None else list(_handlers)
+    if not kinds:
+        return None
+
+    while True:
+        now = _utcnow()
+        job = (
+            db.query(JudgeJob)
+            .filter(
+                JudgeJob.kind.in_(kinds),
+                or_(
+                    JudgeJob.status == JOB_QUEUED,
+                    and_(
+                        JudgeJob.status == JOB_RUNNING,
+                        JudgeJob.started_at < now - timedelta(seconds=JUDGE_JOB_LEASE_SECONDS)
+                    )
+                )
+            )
+            .order_by(JudgeJob.priority.desc(), JudgeJob.job_id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.commit()
+            return None
+
+        if job.attempts >= JUDGE_JOB_MAX_ATTEMPTS:
+            job.status = JOB_FAILED
+            job.error = "Judge worker stopped responding"
+            job.finished_at = now
+            db.commit()
+            continue
+
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.started_at = now
+        db.commit()
+        return job
+
+
+def run_job(db: Session, job: JudgeJob) -> None:
+    """
+    Execute a claimed job with its handler and store the outcome.
+    """
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+        result = handler(db, json.loads(job.payload))
+        db.rollback()  # discard anything the handler left uncommitted
+        job.result = json.dumps(result)
+        job.status = JOB_DONE
+    except HTTPException as e:
+        db.rollback()
+        job.error = str(e.detail)
+        job.status = JOB_FAILED
+    except Exception as e:
+        logger.exception(f"Judge job {job.job_id} failed")
+        db.rollback()
+        job.error = f"Internal error: {str(e)}"
+        job.status = JOB_FAILED
+
+    job.finished_at = _utcnow()
+    db.commit()
+
+
+def purge_finished_jobs(db: Session) -> int:
+    """
+    Delete finished jobs older than JUDGE_JOB_RETENTION_HOURS.
+
+    Returns:
+        int: Number of deleted jobs.
+    """
+    cutoff = _utcnow() - timedelta(hours=JUDGE_JOB_RETENTION_HOURS)
+    deleted = (
+        db.query(JudgeJob)
+        .filter(
+            JudgeJob.status.in_([JOB_DONE, JOB_FAILED]),
+            JudgeJob.finished_at < cutoff
+        )
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def queue_stats(db: Session) -> Dict:
+    """
+    Report the number of jobs per status.
+
+    Returns:
+        Dict: queued, running, done, failed, workers (in this process).
+    """
+    counts = dict(
+        db.query(JudgeJob.status, func.count(JudgeJob.job_id))
+        .group_by(JudgeJob.status)
+        .all()
+    )
+    return {
+        "queued": counts.get(JOB_QUEUED, 0),
+        "running": counts.get(JOB_RUNNING, 0),
+        "done": counts.get(JOB_DONE, 0),
+        "failed": counts.get(JOB_FAILED, 0),
+        "workers": len(_workers),
+    }
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_workers: List[threading.Thread] = []
+_worker_state = threading.local()
+
+
+def in_worker() -> bool:
+    """True when called from a queue worker thread (i.e. while running a job)."""
+    return getattr(_worker_state, "active", False)
+
+
+def work_once(kinds: Optional[List[str]] = None) -> bool:
+    """
+    Claim and run one job.
+
+    Returns:
+        bool: True if a job was run, False if the queue was empty.
+    """
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db, kinds)
+        if job is None:
+            return False
+        run_job(db, job)
+        return True
+    finally:
+        db.close()
+
+
+def worker_loop(stop_event: threading.Event, kinds: Optional[List[str]] = None) -> None:
+    """
+    Run jobs until stop_event is set, sleeping JUDGE_QUEUE_POLL_SECONDS when idle
+    (or until a job is enqueued from this process).
+    """
+    _worker_state.active = True
+    last_purge = 0.0
+    while not stop_event.is_set():
+        try:
+            if work_once(kinds):
+                continue
+
+            now = _utcnow().timestamp()
+            if now - last_purge > _PURGE_INTERVAL_SECONDS:
+                last_purge = now
+                db = SessionLocal()
+                try:
+                    purge_finished_jobs(db)
+                finally:
+                    db.close()
+        except Exception as e:
+            logger.error(f"Judge worker error: {e}")
+
+        _wakeup.wait(JUDGE_QUEUE_POLL_SECONDS)
+        _wakeup.clear()
+
+
+def start_workers(count: int = JUDGE_QUEUE_WORKERS, kinds: Optional[List[str]] = None) -> None:
+    """Start `count` worker threads (no-op if already started or if count is 0)."""
+    if _workers or count <= 0:
+        return
+    _stop.clear()
+    for index in range(count):
+        thread = threading.Thread(
+            target=worker_loop,
+            args=(_stop, kinds),
+            name=f"judge-queue-{index}",
+            daemon=True
+        )
+        thread.start()
+        _workers.append(thread)
+    logger.info(f"Started {count} judge queue workers")
+
+
+def stop_workers(timeout: float = 10.0) -> None:
+    """Ask the worker threads to stop and wait for the running jobs to finish."""
+    _stop.set()
+    _wakeup.set()
+    for thread in _workers:
+        thread.join(timeout)
+    _workers.clear()
@@ -0,0 +1,416 @@
+"""
+Judge Tasks
+
+Entry point of the API modules for compiling and running code.
+
+judge_code() compiles a program and runs it on a list of inputs. By default the
+work happens in the calling process; with JUDGE_REMOTE_ENABLED it is queued as a
+'compile_and_run' job and executed by a judge worker (see judge_worker.py), so
+the compilers and the sandboxes run on the judge nodes instead of the API servers.
+Programs can be written in any language of code_runner.LANGUAGE_DRIVERS (C++ by
+default).
+
+iter_judge_code() does the same but yields every test result as soon as it is
+known, for the streaming endpoints.
+
+Remote judging needs the solution artifact store (SOLUTION_ARTIFACTS_DIR) on a
+volume shared by the API and the workers: the workers store and reuse the
+executables of saved solutions there, and hand the executable of a run back to
+the API through it (see iter_judge_code()).
+"""
+
+import os
+import json
+import logging
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from code_runner import (
+    get_build_key,
+    get_language_driver,
+    get_run_limits,
+    iter_tests,
+    COMPILE_PROFILE_SUBMISSION,
+    LANGUAGE_CPP,
+    LANGUAGE_DRIVERS,
+    RUN_LIMIT_KEYS,
+)
+import run_memo
+from run_memo import JUDGE_MEMO_ENABLED
+from solution_artifacts import solution_artifacts, SOLUTION_ARTIFACTS_ENABLED
+from database import SessionLocal
+from judge_queue import (
+    enqueue_job_or_raise,
+    in_worker,
+    register_job_handler,
+    wait_for_job,
+    JOB_DONE,
+    PRIORITY_SOLUTION,
+)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+JUDGE_REMOTE_ENABLED = os.getenv("JUDGE_REMOTE_ENABLED", "false").lower() == "true"
+JUDGE_REMOTE_TIMEOUT_SECONDS = float(os.getenv("JUDGE_REMOTE_TIMEOUT_SECONDS", "120"))
+
+# When to stop judging a solution before all its tests have run:
+#   run_all      - never
+#   fail_fast    - on the first runtime error or timeout (the solution is discarded anyway)
+#   max_failures - like fail_fast, and also after JUDGE_MAX_FAILURES failed tests
+FAILURE_POLICY_RUN_ALL = "run_all"
+FAILURE_POLICY_FAIL_FAST = "fail_fast"
+FAILURE_POLICY_MAX_FAILURES = "max_failures"
+
+JUDGE_FAILURE_POLICY = os.getenv("JUDGE_FAILURE_POLICY", FAILURE_POLICY_FAIL_FAST).lower()
+JUDGE_MAX_FAILURES = int(os.getenv("JUDGE_MAX_FAILURES", "3"))
+
+if JUDGE_FAILURE_POLICY not in (FAILURE_POLICY_RUN_ALL, FAILURE_POLICY_FAIL_FAST, FAILURE_POLICY_MAX_FAILURES):
+    logger.warning(f"Unknown JUDGE_FAILURE_POLICY '{JUDGE_FAILURE_POLICY}', running all tests")
+    JUDGE_FAILURE_POLICY = FAILURE_POLICY_RUN_ALL
+
+
+def should_stop_judging(error_count: int, failure_count: int, policy: str = JUDGE_FAILURE_POLICY) -> bool:
+    """
+    Tell whether the remaining tests of a solution can be skipped.
+
+    Args:
+        error_count (int): Tests that ended with a runtime error or a timeout so far.
+        failure_count (int): Tests that did not pass so far (errors included).
+        policy (str): One of the FAILURE_POLICY_* values.
+
+    Returns:
+        bool: True to stop: close the iter_judge_code() generator to cancel the
+            tests still running and free their sandboxes.
+    """
+    if policy == FAILURE_POLICY_FAIL_FAST:
+        return error_count > 0
+    if policy == FAILURE_POLICY_MAX_FAILURES:
+        return error_count > 0 or failure_count >= JUDGE_MAX_FAILURES
+    return False
+
+
+def compile_and_run(
+    code: str,
+    inputs: List[str],
+    profile: str = COMPILE_PROFILE_SUBMISSION,
+    harness: bool = False,
+    solution_id: Optional[int] = None,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP,
+    keep_executable: bool = False
+) -> Dict:
+    """
+    Compile code and run it on every input, in this process.
+
+    Args:
+        code (str): The source code.
+        inputs (List[str]): Inputs to provide via stdin, one per test.
+        profile (str): Compile profile, see code_runner.COMPILE_PROFILES.
+        harness (bool): Try to run the tests in harness mode (see code_runner.compile_cpp_harness());
+            ignored by languages without one.
+        solution_id (Optional[int]): Saved solution the code belongs to: its stored
+            executable is run instead of compiling (see solution_artifacts.py).
+        limits (Optional[Dict]): Run limits of every test, see code_runner.get_run_limits().
+        expected_outputs (Optional[List[Optional[str]]]): Expected stdout of each test
+            (None for unknown): a test whose output diverges from it is stopped early
+            with status 'wrong_answer', its stdout cut after the divergence.
+        language (str): Language of the code (key of code_runner.LANGUAGE_DRIVERS);
+            unsupported languages are reported as a compile error.
+        keep_executable (bool): Keep a link to the executable in the solution artifact
+            store (see SolutionArtifactStore.keep()) and return it as "kept_executable";
+            the caller owns it and must store or discard it.
+
+    Returns:
+        Dict: {"compile_error": Optional[str], "results": List[Dict]}, plus
+            "kept_executable": {"path": str, "harness": bool} when one was kept.
+            results holds one run_executable()-shaped dict per input, in order,
+            and is empty when the compilation failed.
+    """
+    kept_executable = {}
+
+    def keep(executable_path: str, run_harness: bool) -> None:
+        kept_path = solution_artifacts.keep(executable_path)
+        if kept_path is not None:
+            kept_executable.update(path=kept_path, harness=run_harness)
+
+    events = iter_compile_and_run(
+        code, inputs, profile, harness, solution_id,
+        on_compiled=keep if keep_executable and SOLUTION_ARTIFACTS_ENABLED else None,
+        limits=limits, expected_outputs=expected_outputs, language=language
+    )
+    _, compile_error = next(events)
+    if compile_error is not None:
+        return {"compile_error": compile_error, "results": []}
+
+    results = [None] * len(inputs)
+    for _, index, result in events:
+        results[index] = result
+    judged = {"compile_error": None, "results": results}
+    if kept_executable:
+        judged["kept_executable"] = kept_executable
+    return judged
+
+
+def iter_compile_and_run(
+    code: str,
+    inputs: List[str],
+    profile: str = COMPILE_PROFILE_SUBMISSION,
+    harness: bool = False,
+    solution_id: Optional[int] = None,
+    on_compiled: Optional[Callable[[str, bool], None]] = None,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> Iterator[Tuple]:
+    """
+    Compile code and run it on every input, in this process, reporting each
+    result as soon as it is known.
+
+    Yields ("compiled", Optional[str]) once, with the compile error if any, then
+    ("result", index, result) for every input in completion order (memoized results
+    first). Closing the generator cancels the tests that are still running.
+
+    on_compiled(executable_path, harness) is called once the executable is ready,
+    before the tests run; the executable is removed when the generator finishes.
+    """
+    if language not in LANGUAGE_DRIVERS:
+        yield "compiled", f"Unsupported language: {language}"
+        return
+    language_driver = get_language_driver(language)
+    limits = get_run_limits(limits)
+
+    # Reuse the memoized results of this build, run only the new inputs
+    memo_key = run_memo.make_key(get_build_key(code, profile, language), limits)
+    input_hashes = [run_memo.hash_input(input_str) for input_str in inputs]
+    known = run_memo.lookup(memo_key, input_hashes) if JUDGE_MEMO_ENABLED else {}
+
+    # Identical inputs are only run once, and only stopped early when they all
+    # expect the same output
+    to_run = {}
+    expected_by_hash = {}
+    for index, (input_hash, input_str) in enumerate(zip(input_hashes, inputs)):
+        if input_hash not in known:
+            to_run.setdefault(input_hash, input_str)
+            expected = expected_outputs[index] if expected_outputs else None
+            if expected_by_hash.setdefault(input_hash, expected) != expected:
+                expected_by_hash[input_hash] = None
+
+    exe_path = None
+    if to_run or not inputs:
+        artifact = None
+        if solution_id is not None and SOLUTION_ARTIFACTS_ENABLED:
+            artifact = solution_artifacts.checkout(solution_id, code, language)
+
+        if artifact is not None:
+            exe_path, harness = artifact
+        else:
+            exe_path = language_driver.compile_harness(code, profile) if harness and inputs else None
+            if exe_path is None:
+                harness = False
+                exe_path, compile_error = language_driver.compile(code, profile)
+                if exe_path is None:
+                    yield "compiled", compile_error
+                    return
+            if solution_id is not None and SOLUTION_ARTIFACTS_ENABLED:
+                solution_artifacts.put(solution_id, code, exe_path, harness, language)
+
+        if on_compiled is not None:
+            on_compiled(exe_path, harness)
+
+    new_results = []
+    try:
+        yield "compiled", None
+
+        for index, input_hash in enumerate(input_hashes):
+            if input_hash in known:
+                yield "result", index, known[input_hash]
+
+        # Every input sharing a hash gets the result of its single run
+        indexes_by_hash = {}
+        for index, input_hash in enumerate(input_hashes):
+            if input_hash not in known:
+                indexes_by_hash.setdefault(input_hash, []).append(index)
+
+        run_hashes = list(to_run)
+        runs = None
+        if to_run:
+            runs = iter_tests(
+                exe_path,
+                list(to_run.values()),
+                harness,
+                limits,
+                [expected_by_hash[input_hash] for input_hash in run_hashes],
+                language
+            )
+        try:
+            for run_index, result in runs or ():
+                input_hash = run_hashes[run_index]
+                new_results.append((input_hash, result))
+                for index in indexes_by_hash[input_hash]:
+                    yield "result", index, result
+        finally:
+            if runs is not None:
+                runs.close()
+    finally:
+        if JUDGE_MEMO_ENABLED and new_results:
+            run_memo.store(memo_key, new_results)
+        if exe_path and os.path.exists(exe_path):
+            try:
+                os.remove(exe_path)
+            except OSError:
+                pass
+
+
+def judge_code(
+    code: str,
+    inputs: List[str],
+    priority: int = PRIORITY_SOLUTION,
+    profile: str = COMPILE_PROFILE_SUBMISSION,
+    harness: bool = False,
+    solution_id: Optional[int] = None,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP,
+    keep_executable: bool = False
+) -> Dict:
+    """
+    Compile code and run it on every input, on a judge worker when
+    JUDGE_REMOTE_ENABLED is set.
+
+    Args:
+        code (str): The source code.
+        inputs (List[str]): Inputs to provide via stdin, one per test.
+        priority (int): Queue priority of the job (remote execution only).
+        profile (str): Compile profile, see code_runner.COMPILE_PROFILES.
+        harness (bool): Try to run the tests in harness mode.
+        solution_id (Optional[int]): Saved solution the code belongs to, see compile_and_run().
+        limits (Optional[Dict]): Run limits of every test, see code_runner.get_run_limits().
+        expected_outputs (Optional[List[Optional[str]]]): Expected stdout of each test,
+            see compile_and_run().
+        language (str): Language of the code, see compile_and_run().
+        keep_executable (bool): Return the executable, see compile_and_run().
+
+    Returns:
+        Dict: See compile_and_run().
+
+    Raises:
+        HTTPException: 503 if the queue is full or no worker answered in time.
+    """
+    # Jobs already running on a worker never wait for another worker
+    if not JUDGE_REMOTE_ENABLED or in_worker():
+        return compile_and_run(
+            code, inputs, profile, harness, solution_id, limits, expected_outputs, language, keep_executable
+        )
+
+    db = SessionLocal()
+    try:
+        job = enqueue_job_or_raise(
+            db,
+            "compile_and_run",
+            {
+                "code": code,
+                "inputs": inputs,
+                "profile": profile,
+                "harness": harness,
+                "solution_id": solution_id,
+                "limits": limits,
+                "expected_outputs": expected_outputs,
+                "language": language,
+                "keep_executable": keep_executable,
+            },
+            priority=priority
+        )
+        job_id = job.job_id
+    finally:
+        db.close()
+
+    job = wait_for_job(job_id, JUDGE_REMOTE_TIMEOUT_SECONDS)
+    if job is None:
+        raise HTTPException(status_code=503, detail="The judge did not answer in time, please retry")
+    if job.status != JOB_DONE:
+        logger.error(f"Judge job {job_id} failed: {job.error}")
+        raise HTTPException(status_code=503, detail="The judge could not run the code, please retry")
+
+    return json.loads(job.result)
+
+
+def iter_judge_code(
+    code: str,
+    inputs: List[str],
+    priority: int = PRIORITY_SOLUTION,
+    profile: str = COMPILE_PROFILE_SUBMISSION,
+    harness: bool = False,
+    on_compiled: Optional[Callable[[str, bool], None]] = None,
+    limits: Optional[Dict] = None,
+    expected_outputs: Optional[List[Optional[str]]] = None,
+    language: str = LANGUAGE_CPP
+) -> Iterator[Tuple]:
+    """
+    Like judge_code(), reporting each result as soon as it is known.
+
+    Yields the events of iter_compile_and_run(). In remote mode the worker only
+    reports the run once it is complete: the events are then replayed at once,
+    and on_compiled is called with the executable the worker kept in the shared
+    solution artifact store, before the first result.
+    """
+    if not JUDGE_REMOTE_ENABLED or in_worker():
+        yield from iter_compile_and_run(
+            code, inputs, profile, harness,
+            on_compiled=on_compiled, limits=limits, expected_outputs=expected_outputs, language=language
+        )
+        return
+
+    judged = judge_code(
+        code, inputs, priority, profile, harness,
+        limits=limits, expected_outputs=expected_outputs, language=language,
+        keep_executable=on_compiled is not None
+    )
+    kept_executable = judged.get("kept_executable")
+    if kept_executable:
+        try:
+            on_compiled(kept_executable["path"], kept_executable["harness"])
+        finally:
+            solution_artifacts.discard(kept_executable["path"])
+    yield "compiled", judged["compile_error"]
+    for index, result in enumerate(judged["results"]):
+        yield "result", index, result
+
+
+def get_match_limits(match_setting) -> Dict:
+    """
+    Run limits of a match setting (its limit columns; None for the defaults).
+
+    Returns:
+        Dict: RUN_LIMIT_KEYS entries set on the match setting, to pass as `limits`.
+    """
+    if match_setting is None:
+        return {}
+    return {key: getattr(match_setting, key) for key in RUN_LIMIT_KEYS if getattr(match_setting, key) is not None}
+
+
+def get_match_language(match_setting) -> str:
+    """Language of a match setting, to pass as `language` (C++ when unset)."""
+    return (match_setting.language if match_setting is not None else None) or LANGUAGE_CPP
+
+
+def _run_compile_and_run_job(db, payload: Dict) -> Dict:
+    return compile_and_run(
+        payload["code"],
+        payload["inputs"],
+        payload.get("profile", COMPILE_PROFILE_SUBMISSION),
+        payload.get("harness", False),
+        payload.get("solution_id"),
+        payload.get("limits"),
+        payload.get("expected_outputs"),
+        payload.get("language", LANGUAGE_CPP),
+        payload.get("keep_executable", False)
+    )
+
+
+register_job_handler("compile_and_run", _run_compile_and_run_job)
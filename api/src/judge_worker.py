@@ -0,0 +1,70 @@
+"""
+Judge Worker
+
+Standalone process draining the judge queue (see judge_queue.py), so compilation
+and sandboxed runs can be scaled across nodes separately from the API servers.
+
+Usage:
+    python judge_worker.py [--threads N] [--kinds solution,custom_test,compile_and_run]
+
+Every worker connects to the same database as the API (DATABASE_URL) and claims
+jobs with `SELECT ... FOR UPDATE SKIP LOCKED`; any number of them can run at once.
+Stop with SIGTERM or SIGINT: running jobs are finished before exiting.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+
+import judge_queue
+import judge_tasks  # noqa: F401 - registers the 'compile_and_run' handler
+import phase_one  # noqa: F401 - registers the 'solution' and 'custom_test' handlers
+
+logger = logging.getLogger("judge_worker")
+
+JUDGE_WORKER_THREADS = int(os.getenv("JUDGE_WORKER_THREADS", "2"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run judge queue workers.")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=JUDGE_WORKER_THREADS,
+        help="Number of jobs judged at the same time (default: JUDGE_WORKER_THREADS or 2)"
+    )
+    parser.add_argument(
+        "--kinds",
+        default=None,
+        help="Comma-separated job kinds to handle (default: all)"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    kinds = [kind.strip() for kind in args.kinds.split(",")] if args.kinds else None
+
+    stop_requested = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"Received signal {signum}, finishing running jobs")
+        stop_requested.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    judge_queue.start_workers(args.threads, kinds=kinds)
+    logger.info(f"Judge worker started with {args.threads} threads (kinds: {', '.join(kinds) if kinds else 'all'})")
+
+    stop_requested.wait()
+    judge_queue.stop_workers(timeout=judge_queue.JUDGE_JOB_LEASE_SECONDS)
+    logger.info("Judge worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,7 @@ from models import (
     Student
 )
 
-from database import get_db
+from database import get_read_db
 from student_results_api import _get_test_status
 
 # ============================================================================
@@ -188,7 +188,7 @@ def get_leaderboard(
     page: int = Query(1, ge=1, description="Page number (1-indexed)"),
     page_size: int = Query(10, ge=1, le=100, description="Number of entries per page"),
     student_id: Optional[int] = Query(None, description="Current user's student ID for personalized rank info"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> LeaderboardResponse:
     """
     Get the global leaderboard with pagination.
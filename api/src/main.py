@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 import os
@@ -15,7 +16,12 @@ from phase_two import router as phase_two_router
 from user_api import router as user_router
 from badges_api import router as badges_router
 from admin_api import router as admin_router
+from judge_api import router as judge_router
 from authentication.config import validate_required_env_vars
+from authentication.services.auth_service import AuthService
+from authentication.exceptions import InvalidTokenError, TokenExpiredError
+from judge_queue import start_workers, stop_workers
+from database import async_engine, recent_writers, replica_monitor
 
 app = FastAPI()
 
@@ -32,12 +38,48 @@ app.add_middleware(
 # In production, use a secure secret key from environment variables
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "your-secret-key"))
 
+def _token_user_key(request: Request) -> Optional[str]:
+    """User of the bearer token of a request (None: no valid token)."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(AuthService.validate_access_token(token)["sub"])
+    except (InvalidTokenError, TokenExpiredError, KeyError):
+        return None
+
+# Read-your-writes with a read replica: after a successful write, the reads of the
+# same user go to the primary for a while (see get_read_db in database.py)
+@app.middleware("http")
+async def route_reads_after_writes(request: Request, call_next):
+    if replica_monitor is None:
+        return await call_next(request)
+    user_key = _token_user_key(request)
+    request.state.read_from_primary = recent_writers.contains(user_key)
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        recent_writers.record(user_key)
+    return response
+
 # Validate required environment variables at startup
 @app.on_event("startup")
 def validate_config():
     """Validate that all required authentication environment variables are set."""
     validate_required_env_vars()
 
+@app.on_event("startup")
+def start_judge_workers():
+    """Start the in-process workers draining the judge queue."""
+    start_workers()
+
+@app.on_event("shutdown")
+def stop_judge_workers():
+    stop_workers()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
+
 app.include_router(match_settings_router)
 app.include_router(match_router)
 app.include_router(game_session_router)
@@ -51,6 +93,7 @@ app.include_router(phase_two_router)
 app.include_router(user_router)
 app.include_router(badges_router)
 app.include_router(admin_router)
+app.include_router(judge_router)
 
 @app.get("/")
 def read_root():
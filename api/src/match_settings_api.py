@@ -5,17 +5,23 @@ Provides comprehensive endpoints for creating, editing, publishing, and managing
 Includes ownership validation, test management, and code validation.
 """
 
-from typing import List, Optional, Annotated
+from typing import List, Optional, Annotated, Literal
 from fastapi import APIRouter, Query, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from database import get_db
+from database import get_async_db
 from models import MatchSetting, Test, TestScope, Teacher
 from authentication.routes.auth_routes import get_current_user
-from code_runner import compile_cpp, run_cpp_executable
-import os
+from judge_tasks import judge_code, get_match_limits
+from code_runner import RUN_LIMIT_KEYS, LANGUAGE_DRIVERS
+from checkers import check_outputs, get_match_checker, get_checker_mode, CHECKER_KEYS, CHECKER_CUSTOM
+from admission import admit_or_raise
+import reference_outputs
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,7 +47,24 @@ class TestCreateRequest(BaseModel):
     scope: str  # "public" or "private"
 
 
-class MatchSettingResponse(BaseModel):
+class RunLimitsModel(BaseModel):
+    """Per-test run limits of a match setting (None = judge default)"""
+    time_limit_ms: Optional[int] = Field(None, gt=0, le=60000, description="Wall-clock time limit per test (ms)")
+    cpu_time_limit_ms: Optional[int] = Field(None, gt=0, le=60000, description="CPU time limit per test (ms)")
+    memory_limit_mb: Optional[int] = Field(None, gt=0, le=4096, description="Memory limit per test (MB)")
+    output_limit_kb: Optional[int] = Field(None, gt=0, le=65536, description="Output size limit per test (KB)")
+
+
+class CheckerSettingsModel(BaseModel):
+    """Output checker of a match setting (None = exact comparison), see checkers.py"""
+    checker_mode: Optional[Literal["exact", "tokens", "float", "unordered_lines", "custom"]] = Field(
+        None, description="How outputs are compared with the expected ones"
+    )
+    checker_tolerance: Optional[float] = Field(None, gt=0, description="Absolute or relative error allowed by the 'float' checker")
+    checker_source: Optional[str] = Field(None, description="C++ source of the 'custom' checker program")
+
+
+class MatchSettingResponse(RunLimitsModel, CheckerSettingsModel):
     """
     Response model for a single match setting.
     """
@@ -54,7 +77,7 @@ class MatchSettingResponse(BaseModel):
     function_name: Optional[str] = Field(None, description="Function name")
     function_type: Optional[str] = Field(None, description="Function type (e.g., 'output')")
     function_inputs: Optional[str] = Field(None, description="JSON array of function inputs")
-    language: str = Field(..., description="Programming language (e.g., 'cpp')")
+    language: str = Field(..., description="Programming language: 'cpp', 'c', 'python' or 'java'")
     creator_id: int = Field(..., description="ID of the teacher who created this setting")
     tests: List[TestItemResponse] = Field(default=[], description="List of tests for this setting")
 
@@ -62,7 +85,7 @@ class MatchSettingResponse(BaseModel):
         from_attributes = True
 
 
-class MatchSettingCreateRequest(BaseModel):
+class MatchSettingCreateRequest(RunLimitsModel, CheckerSettingsModel):
     """Request model for creating a new match setting"""
     title: str
     description: str
@@ -76,7 +99,7 @@ class MatchSettingCreateRequest(BaseModel):
     publish: bool = False
 
 
-class MatchSettingUpdateRequest(BaseModel):
+class MatchSettingUpdateRequest(RunLimitsModel, CheckerSettingsModel):
     """Request model for updating an existing match setting"""
     title: Optional[str] = None
     description: Optional[str] = None
@@ -99,7 +122,7 @@ class TestResult(BaseModel):
     error: Optional[str] = None
 
 
-class TryMatchSettingRequest(BaseModel):
+class TryMatchSettingRequest(RunLimitsModel, CheckerSettingsModel):
     """Request model for trying/validating a match setting"""
     reference_solution: str
     language: str = "cpp"
@@ -126,7 +149,7 @@ router = APIRouter(prefix="/api", tags=["match-settings"])
 # ============================================================================
 
 
-def get_teacher_id(current_user: dict, db: Session) -> int:
+async def get_teacher_id(current_user: dict, db: AsyncSession) -> int:
     """Extract teacher_id from current user"""
     if current_user.get("role") != "teacher":
         raise HTTPException(
@@ -139,7 +162,7 @@ def get_teacher_id(current_user: dict, db: Session) -> int:
     if user_id is None:
         user_id = int(current_user["sub"])
     
-    teacher = db.query(Teacher).filter(Teacher.user_id == user_id).first()
+    teacher = await db.scalar(select(Teacher).where(Teacher.user_id == user_id).limit(1))
     if not teacher:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,6 +172,25 @@ def get_teacher_id(current_user: dict, db: Session) -> int:
     return teacher.teacher_id
 
 
+async def _load_match_setting(db: AsyncSession, match_set_id: int) -> Optional[MatchSetting]:
+    """Match setting with its tests loaded (reloaded if already in the session)."""
+    return await db.scalar(
+        select(MatchSetting)
+        .options(selectinload(MatchSetting.tests))
+        .where(MatchSetting.match_set_id == match_set_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def _updated_settings(current: dict, data: BaseModel, keys) -> dict:
+    """Limits or checker (keys) a match setting will have once `data` is applied."""
+    settings = dict(current)
+    for key in keys:
+        if key in data.model_fields_set:
+            settings[key] = getattr(data, key)
+    return {key: value for key, value in settings.items() if value is not None}
+
+
 def verify_ownership(match_setting: MatchSetting, teacher_id: int):
     """Verify that the current teacher owns the match setting"""
     if match_setting.creator_id != teacher_id:
@@ -158,19 +200,48 @@ def verify_ownership(match_setting: MatchSetting, teacher_id: int):
         )
 
 
-def run_tests(code: str, language: str, tests: List[TestCreateRequest]) -> TryMatchSettingResponse:
+def run_tests(
+    code: str,
+    language: str,
+    tests: List[TestCreateRequest],
+    limits: Optional[dict] = None,
+    checker: Optional[dict] = None
+) -> TryMatchSettingResponse:
     """
-    Compile and run code against test cases
+    Compile and run code against test cases, under the given run limits
+    (see judge_tasks.get_match_limits()), checking the outputs with the given
+    checker (see checkers.get_match_checker()).
     """
-    if language != "cpp":
+    if language not in LANGUAGE_DRIVERS:
         return TryMatchSettingResponse(
             success=False,
-            message="Only C++ is currently supported",
+            message=f"Supported languages: {', '.join(LANGUAGE_DRIVERS)}",
             compilation_error="Unsupported language"
         )
     
-    # Compile the code
-    executable_path, compile_error = compile_cpp(code)
+    if get_checker_mode(checker) == CHECKER_CUSTOM:
+        checker_source = (checker or {}).get("checker_source")
+        if not checker_source:
+            return TryMatchSettingResponse(
+                success=False,
+                message="The custom checker needs a checker program"
+            )
+        checker_compile_error = judge_code(checker_source, [])["compile_error"]
+        if checker_compile_error:
+            return TryMatchSettingResponse(
+                success=False,
+                message="Checker compilation failed",
+                compilation_error=checker_compile_error
+            )
+
+    # Compile the code and run tests
+    judged = judge_code(
+        code,
+        [test.test_in if test.test_in else "" for test in tests],
+        limits=limits,
+        language=language
+    )
+    compile_error = judged["compile_error"]
     
     if compile_error:
         return TryMatchSettingResponse(
@@ -179,34 +250,26 @@ def run_tests(code: str, language: str, tests: List[TestCreateRequest]) -> TryMa
             compilation_error=compile_error
         )
     
-    # Run tests
     test_results = []
     all_passed = True
     
-    try:
-        for test in tests:
-            test_input = test.test_in if test.test_in else ""
-            result = run_cpp_executable(executable_path, test_input)
-            
-            actual_output = result["stdout"].strip()
-            expected_output = test.test_out.strip()
-            passed = actual_output == expected_output
-            
-            if not passed:
-                all_passed = False
-            
-            test_results.append(TestResult(
-                test_in=test.test_in,
-                test_out=test.test_out,
-                actual_output=actual_output,
-                passed=passed,
-                error=result["stderr"] if result["stderr"] else None
-            ))
-    
-    finally:
-        # Clean up executable
-        if executable_path and os.path.exists(executable_path):
-            os.remove(executable_path)
+    verdicts = check_outputs(
+        checker,
+        [(test.test_in or "", test.test_out, result["stdout"]) for test, result in zip(tests, judged["results"])]
+    )
+    for test, result, (passed, _) in zip(tests, judged["results"], verdicts):
+        actual_output = result["stdout"].strip()
+        
+        if not passed:
+            all_passed = False
+        
+        test_results.append(TestResult(
+            test_in=test.test_in,
+            test_out=test.test_out,
+            actual_output=actual_output,
+            passed=passed,
+            error=result["stderr"] if result["stderr"] else None
+        ))
     
     return TryMatchSettingResponse(
         success=all_passed,
@@ -220,7 +283,9 @@ def validate_match_setting_logic(
     function_type: Optional[str],
     reference_solution: str,
     language: str,
-    tests: List[TestCreateRequest]
+    tests: List[TestCreateRequest],
+    limits: Optional[dict] = None,
+    checker: Optional[dict] = None
 ):
     """
     Validate match setting fields and run tests.
@@ -238,7 +303,9 @@ def validate_match_setting_logic(
     validation_result = run_tests(
         reference_solution,
         language,
-        tests
+        tests,
+        limits,
+        checker
     )
     
     if not validation_result.success:
@@ -263,17 +330,17 @@ async def get_match_settings(
         None,
         description="Filter by readiness status: true=ready, false=draft, omit=all",
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> List[MatchSettingResponse]:
     """
     Browse all available match settings with optional filtering.
     """
-    query = db.query(MatchSetting)
+    query = select(MatchSetting).options(selectinload(MatchSetting.tests))
 
     if is_ready is not None:
-        query = query.filter(MatchSetting.is_ready == is_ready)
+        query = query.where(MatchSetting.is_ready == is_ready)
 
-    results = query.all()
+    results = (await db.scalars(query)).all()
 
     response = []
     for ms in results:
@@ -289,6 +356,8 @@ async def get_match_settings(
             function_inputs=ms.function_inputs,
             language=ms.language,
             creator_id=ms.creator_id,
+            **get_match_limits(ms),
+            **get_match_checker(ms),
             tests=[
                 TestItemResponse(
                     test_id=t.test_id,
@@ -309,12 +378,12 @@ async def get_match_settings(
 )
 async def get_match_setting(
     match_set_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> MatchSettingResponse:
     """
     Retrieve a specific match setting by ID.
     """
-    ms = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    ms = await _load_match_setting(db, match_set_id)
     
     if not ms:
         raise HTTPException(
@@ -334,6 +403,8 @@ async def get_match_setting(
         function_inputs=ms.function_inputs,
         language=ms.language,
         creator_id=ms.creator_id,
+        **get_match_limits(ms),
+        **get_match_checker(ms),
         tests=[
             TestItemResponse(
                 test_id=t.test_id,
@@ -354,12 +425,12 @@ async def get_match_setting(
 async def create_match_setting(
     data: MatchSettingCreateRequest,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> MatchSettingResponse:
     """
     Create a new match setting (saved as draft by default).
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
     try:
         # Create match setting
@@ -373,21 +444,27 @@ async def create_match_setting(
             function_type=data.function_type,
             function_inputs=data.function_inputs,
             language=data.language,
-            creator_id=teacher_id
+            creator_id=teacher_id,
+            **get_match_limits(data),
+            **get_match_checker(data)
         )
         
         # Validate if publishing
         if data.publish:
-            validate_match_setting_logic(
-                data.function_name,
-                data.function_type,
-                data.reference_solution,
-                data.language,
-                data.tests
-            )
+            async with admit_or_raise(current_user["sub"]):
+                await run_in_threadpool(
+                    validate_match_setting_logic,
+                    data.function_name,
+                    data.function_type,
+                    data.reference_solution,
+                    data.language,
+                    data.tests,
+                    get_match_limits(data),
+                    get_match_checker(data)
+                )
         
         db.add(new_setting)
-        db.flush()  # Get the ID
+        await db.flush()  # Get the ID
         
         # Add tests
         for test_data in data.tests:
@@ -399,13 +476,12 @@ async def create_match_setting(
             )
             db.add(test)
         
-        db.commit()
-        db.refresh(new_setting)
+        await db.commit()
         
         return await get_match_setting(new_setting.match_set_id, db)
     
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         if "unique" in str(e).lower():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -426,14 +502,14 @@ async def update_match_setting(
     match_set_id: int,
     data: MatchSettingUpdateRequest,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> MatchSettingResponse:
     """
     Update an existing match setting (owner only).
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
-    match_setting = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    match_setting = await _load_match_setting(db, match_set_id)
     
     if not match_setting:
         raise HTTPException(
@@ -442,7 +518,15 @@ async def update_match_setting(
         )
     
     verify_ownership(match_setting, teacher_id)
-    validation_result = run_tests(data.reference_solution, data.language, data.tests)
+
+    # Limits and checker the setting will have once updated
+    limits = _updated_settings(get_match_limits(match_setting), data, RUN_LIMIT_KEYS)
+    checker = _updated_settings(get_match_checker(match_setting), data, CHECKER_KEYS)
+
+    async with admit_or_raise(current_user["sub"]):
+        validation_result = await run_in_threadpool(
+            run_tests, data.reference_solution, data.language, data.tests, limits, checker
+        )
     if not validation_result.success:
         error_detail = getattr(validation_result, "message", "Reference solution failed validation")
         raise HTTPException(
@@ -452,6 +536,14 @@ async def update_match_setting(
     update_data = data.dict(exclude_unset=True)
     
     tests_update = update_data.pop('tests', None)
+
+    # Stored outputs of the previous reference solution (language or limits) are now stale
+    if (
+        update_data.get('reference_solution', match_setting.reference_solution) != match_setting.reference_solution
+        or update_data.get('language', match_setting.language) != match_setting.language
+        or limits != get_match_limits(match_setting)
+    ):
+        await db.run_sync(reference_outputs.invalidate, match_setting.match_set_id)
     
     for field, value in update_data.items():
         if field != 'publish':  # Ignore publish field for setting attributes
@@ -489,21 +581,24 @@ async def update_match_setting(
                 ) for t in match_setting.tests
             ]
 
-        validate_match_setting_logic(
-            match_setting.function_name,
-            match_setting.function_type,
-            match_setting.reference_solution,
-            match_setting.language,
-            tests_to_run
-        )
+        async with admit_or_raise(current_user["sub"]):
+            await run_in_threadpool(
+                validate_match_setting_logic,
+                match_setting.function_name,
+                match_setting.function_type,
+                match_setting.reference_solution,
+                match_setting.language,
+                tests_to_run,
+                get_match_limits(match_setting),
+                get_match_checker(match_setting)
+            )
         match_setting.is_ready = True
     
     try:
-        db.commit()
-        db.refresh(match_setting)
+        await db.commit()
         return await get_match_setting(match_set_id, db)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="A match setting with this title already exists"
@@ -518,15 +613,15 @@ async def update_match_setting(
 async def publish_match_setting(
     match_set_id: int,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> MatchSettingResponse:
     """
     Validate and publish a match setting (owner only).
     Runs all tests to ensure the reference solution is correct.
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
-    match_setting = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    match_setting = await _load_match_setting(db, match_set_id)
     
     if not match_setting:
         raise HTTPException(
@@ -545,18 +640,21 @@ async def publish_match_setting(
         ) for t in match_setting.tests
     ]
     
-    validate_match_setting_logic(
-        match_setting.function_name,
-        match_setting.function_type,
-        match_setting.reference_solution,
-        match_setting.language,
-        tests_requests
-    )
+    async with admit_or_raise(current_user["sub"]):
+        await run_in_threadpool(
+            validate_match_setting_logic,
+            match_setting.function_name,
+            match_setting.function_type,
+            match_setting.reference_solution,
+            match_setting.language,
+            tests_requests,
+            get_match_limits(match_setting),
+            get_match_checker(match_setting)
+        )
     
     # Publish
     match_setting.is_ready = True
-    db.commit()
-    db.refresh(match_setting)
+    await db.commit()
     
     return await get_match_setting(match_set_id, db)
 
@@ -569,14 +667,22 @@ async def publish_match_setting(
 async def try_match_setting(
     data: TryMatchSettingRequest,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> TryMatchSettingResponse:
     """
     Compile and run code against test cases without saving.
     """
-    _ = get_teacher_id(current_user, db)  # Verify teacher role
-    
-    return run_tests(data.reference_solution, data.language, data.tests)
+    _ = await get_teacher_id(current_user, db)  # Verify teacher role
+    
+    async with admit_or_raise(current_user["sub"]):
+        return await run_in_threadpool(
+            run_tests,
+            data.reference_solution,
+            data.language,
+            data.tests,
+            get_match_limits(data),
+            get_match_checker(data)
+        )
 
 
 @router.post(
@@ -588,14 +694,14 @@ async def try_match_setting(
 async def clone_match_setting(
     match_set_id: int,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> MatchSettingResponse:
     """
     Clone an existing match setting. The new owner is the current teacher.
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
-    original = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    original = await _load_match_setting(db, match_set_id)
     
     if not original:
         raise HTTPException(
@@ -606,7 +712,7 @@ async def clone_match_setting(
     # Create clone with new title
     clone_title = f"{original.title} (Clone)"
     counter = 1
-    while db.query(MatchSetting).filter(MatchSetting.title == clone_title).first():
+    while await db.scalar(select(MatchSetting.match_set_id).where(MatchSetting.title == clone_title).limit(1)):
         clone_title = f"{original.title} (Clone {counter})"
         counter += 1
     
@@ -620,11 +726,13 @@ async def clone_match_setting(
         function_type=original.function_type,
         function_inputs=original.function_inputs,
         language=original.language,
-        creator_id=teacher_id
+        creator_id=teacher_id,
+        **get_match_limits(original),
+        **get_match_checker(original)
     )
     
     db.add(cloned_setting)
-    db.flush()
+    await db.flush()
     
     # Clone tests
     for test in original.tests:
@@ -636,8 +744,7 @@ async def clone_match_setting(
         )
         db.add(cloned_test)
     
-    db.commit()
-    db.refresh(cloned_setting)
+    await db.commit()
     
     return await get_match_setting(cloned_setting.match_set_id, db)
 
@@ -651,14 +758,14 @@ async def delete_test(
     match_set_id: int,
     test_id: int,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a test case from a match setting (owner only).
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
-    match_setting = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    match_setting = await _load_match_setting(db, match_set_id)
     
     if not match_setting:
         raise HTTPException(
@@ -668,10 +775,10 @@ async def delete_test(
     
     verify_ownership(match_setting, teacher_id)
     
-    test = db.query(Test).filter(
+    test = await db.scalar(select(Test).where(
         Test.test_id == test_id,
         Test.match_set_id == match_set_id
-    ).first()
+    ))
     
     if not test:
         raise HTTPException(
@@ -679,8 +786,8 @@ async def delete_test(
             detail="Test not found"
         )
     
-    db.delete(test)
-    db.commit()
+    await db.delete(test)
+    await db.commit()
     
     return None
 
@@ -693,14 +800,14 @@ async def delete_test(
 async def delete_match_setting(
     match_set_id: int,
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a match setting (owner only).
     """
-    teacher_id = get_teacher_id(current_user, db)
+    teacher_id = await get_teacher_id(current_user, db)
     
-    match_setting = db.query(MatchSetting).filter(MatchSetting.match_set_id == match_set_id).first()
+    match_setting = await _load_match_setting(db, match_set_id)
     
     if not match_setting:
         raise HTTPException(
@@ -710,7 +817,7 @@ async def delete_match_setting(
     
     verify_ownership(match_setting, teacher_id)
     
-    db.delete(match_setting)
-    db.commit()
+    await db.delete(match_setting)
+    await db.commit()
     
     return None
@@ -0,0 +1,29 @@
+"""
+Schema migrations entry point
+
+Runs Alembic with the configuration of this directory (alembic.ini, migrations/):
+
+    python migrate.py                  # upgrade to the latest revision
+    python migrate.py current          # any alembic command and options
+    python migrate.py revision -m "Add column x"
+
+The API container runs `python migrate.py` before starting (docker-compose.yml).
+See migration_ops.py for the lock-aware operations revisions should use on
+tables in use.
+"""
+
+import os
+import sys
+
+from alembic.config import main as alembic_main
+
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def main(argv) -> int:
+    alembic_main(argv=["-c", ALEMBIC_INI_PATH] + (argv or ["upgrade", "head"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,171 @@
+"""
+Lock-aware Migration Operations
+
+Helpers for the Alembic revisions of migrations/versions that change tables in
+use without blocking the API:
+- create_index_concurrently / drop_index_concurrently: index builds that do not
+  lock the table against writes (CONCURRENTLY, outside the migration transaction)
+- backfill_in_batches: fills a column in short transactions of a bounded number
+  of rows, instead of one UPDATE locking the whole table until it ends
+- set_not_null: makes a (backfilled) column NOT NULL without holding the table
+  lock for a full scan
+
+Every migration transaction runs with a lock_timeout (see migrations/env.py): a
+DDL statement that cannot get its lock quickly fails instead of queueing every
+query of the API behind it; rerun the migration later.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from alembic import op
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "5000"))
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+# Pause between two backfill batches, to leave room for the API's queries
+MIGRATION_BATCH_PAUSE_SECONDS = float(os.getenv("MIGRATION_BATCH_PAUSE_SECONDS", "0.05"))
+
+SCHEMA_NAME = "capstone_app"
+
+
+def _index_is_valid(name: str, schema: str) -> Optional[bool]:
+    """Whether the index exists and is valid (None: it does not exist)."""
+    return op.get_bind().execute(
+        text(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = :schema"
+        ),
+        {"name": name, "schema": schema},
+    ).scalar()
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: str,
+    where: Optional[str] = None,
+    unique: bool = False,
+    schema: str = SCHEMA_NAME,
+) -> None:
+    """
+    Build an index without locking the table against writes.
+
+    Runs outside the migration transaction (CREATE INDEX CONCURRENTLY cannot run
+    inside one). Does nothing if the index already exists; an invalid index left
+    by a failed concurrent build is dropped and built again.
+
+    Args:
+        name: Index name.
+        table: Table name.
+        columns: Indexed columns or expressions, as SQL (e.g. "student_id, game_id").
+        where: Predicate of a partial index, as SQL.
+        unique: Build a unique index.
+        schema: Schema of the table.
+    """
+    with op.get_context().autocommit_block():
+        if _index_is_valid(name, schema) is False:
+            logger.warning("Dropping invalid index %s.%s left by a failed build", schema, name)
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{name}")
+        op.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON {schema}.{table} ({columns})"
+            + (f" WHERE {where}" if where else "")
+        )
+
+
+def drop_index_concurrently(name: str, schema: str = SCHEMA_NAME) -> None:
+    """Drop an index without locking its table against reads and writes."""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema}.{name}")
+
+
+def backfill_in_batches(
+    table: str,
+    key: str,
+    set_sql: str,
+    where_sql: str,
+    batch_size: Optional[int] = None,
+    schema: str = SCHEMA_NAME,
+) -> int:
+    """
+    Update the rows of a table matching a predicate, one short transaction per batch.
+
+    Each batch locks at most batch_size rows (skipping rows locked by the API,
+    which are picked up by a later batch) and commits. where_sql must stop
+    matching a row once it is updated, or the backfill never ends.
+
+    Args:
+        table: Table name.
+        key: Primary key column.
+        set_sql: SET clause, as SQL (e.g. "tests_run = 0").
+        where_sql: Rows still to update, as SQL (e.g. "tests_run IS NULL").
+        batch_size: Rows per batch (default MIGRATION_BATCH_SIZE).
+        schema: Schema of the table.
+
+    Returns:
+        int: Number of rows updated.
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    statement = text(
+        f"UPDATE {schema}.{table} SET {set_sql} "
+        f"WHERE {key} IN ("
+        f"SELECT {key} FROM {schema}.{table} WHERE {where_sql} "
+        f"ORDER BY {key} LIMIT :batch_size FOR UPDATE SKIP LOCKED)"
+    )
+    remaining = text(f"SELECT EXISTS (SELECT 1 FROM {schema}.{table} WHERE {where_sql})")
+
+    total = 0
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            updated = bind.execute(statement, {"batch_size": batch_size}).rowcount
+            total += updated
+            if updated == 0 and not bind.execute(remaining).scalar():
+                break
+            logger.info("Backfilled %d rows of %s.%s", total, schema, table)
+            time.sleep(MIGRATION_BATCH_PAUSE_SECONDS)
+    return total
+
+
+
+def set_not_null(table: str, column: str, schema: str = SCHEMA_NAME) -> None:
+    """
+    Make a column NOT NULL without scanning the table under an exclusive lock.
+
+    The rows are checked by validating a CHECK constraint, which lets writes go on;
+    SET NOT NULL then trusts the constraint instead of scanning again. Each step is
+    its own short transaction. Does nothing if the column is already NOT NULL.
+
+    Args:
+        table: Table name.
+        column: Column name (backfilled first, e.g. with backfill_in_batches()).
+        schema: Schema of the table.
+    """
+    constraint = f"chk_{table}_{column}_not_null"
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        nullable = bind.execute(
+            text(
+                "SELECT is_nullable = 'YES' FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :table AND column_name = :column"
+            ),
+            {"schema": schema, "table": table, "column": column},
+        ).scalar()
+        if not nullable:
+            return
+        op.execute(f"ALTER TABLE {schema}.{table} DROP CONSTRAINT IF EXISTS {constraint}")
+        op.execute(f"ALTER TABLE {schema}.{table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID")
+        op.execute(f"ALTER TABLE {schema}.{table} VALIDATE CONSTRAINT {constraint}")
+        op.execute(f"ALTER TABLE {schema}.{table} ALTER COLUMN {column} SET NOT NULL")
+        op.execute(f"ALTER TABLE {schema}.{table} DROP CONSTRAINT {constraint}")
@@ -0,0 +1,84 @@
+"""
+Alembic environment: runs the revisions of migrations/versions on DATABASE_URL.
+
+The schema itself is created by postgres/configs/init.sql on a fresh database;
+revisions change it from there. Each revision runs in its own transaction with a
+lock_timeout (see migration_ops.py), and an advisory lock keeps two processes
+(e.g. API replicas starting together) from migrating at the same time.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from database import DATABASE_URL, Base
+from migration_ops import MIGRATION_LOCK_TIMEOUT_MS, SCHEMA_NAME
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+# Key of the advisory lock held while migrating
+MIGRATION_LOCK_ID = 7102
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Only compare the objects of the application schema (autogenerate)."""
+    if type_ == "table":
+        return obj.schema == SCHEMA_NAME
+    return True
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        version_table_schema=SCHEMA_NAME,
+        include_schemas=True,
+        include_object=include_object,
+        transaction_per_migration=True,
+        compare_type=True,
+        **kwargs
+    )
+
+
+def run_migrations_offline() -> None:
+    """Print the SQL of the migrations instead of running them (alembic upgrade --sql)."""
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    with engine.connect() as connection:
+        schema_exists = connection.execute(
+            text("SELECT 1 FROM pg_namespace WHERE nspname = :schema"), {"schema": SCHEMA_NAME}
+        ).scalar()
+        if not schema_exists:
+            raise RuntimeError(
+                f"Schema {SCHEMA_NAME} not found: create the database with postgres/configs/init.sql first"
+            )
+
+        # Wait for another migrating process first: lock_timeout would apply to this wait too
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+        connection.execute(text(f"SET lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}"))
+        connection.commit()
+        try:
+            _configure(connection=connection)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+            connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,30 @@
+"""Baseline: the schema created by postgres/configs/init.sql before the judge changes
+
+Databases created from that init.sql have no judge queue, run memo or reference
+outputs, and none of the limit, checker, usage or counter columns: revisions 0002
+to 0009 add them. init.sql now creates all of them too, so on fresh databases
+those revisions find everything in place and change nothing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Nothing to do: init.sql creates the schema (migrations/env.py checks it exists)."""
+    pass
+
+
+def downgrade() -> None:
+    """The baseline cannot be undone."""
+    pass
@@ -0,0 +1,54 @@
+"""Judge job queue
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS capstone_app.judge_jobs (
+            job_id SERIAL PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            priority INTEGER NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            result TEXT DEFAULT NULL,
+            error TEXT DEFAULT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            student_id INTEGER REFERENCES capstone_app.student(student_id) ON DELETE CASCADE,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            started_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+            finished_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+        )
+        """
+    )
+    # New and empty: no need to build these concurrently
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_judge_jobs_pending ON capstone_app.judge_jobs "
+        "(priority DESC, job_id) WHERE status IN ('queued', 'running')"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_judge_jobs_student_status ON capstone_app.judge_jobs (student_id, status)"
+    )
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.judge_jobs TO api_user")
+    op.execute("GRANT USAGE, SELECT ON SEQUENCE capstone_app.judge_jobs_job_id_seq TO api_user")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS capstone_app.judge_jobs")
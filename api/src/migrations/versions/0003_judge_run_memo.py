@@ -0,0 +1,47 @@
+"""Memo of test runs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS capstone_app.judge_run_memo (
+            memo_id SERIAL PRIMARY KEY,
+            build_key VARCHAR(64) NOT NULL,
+            input_hash VARCHAR(64) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            exit_code INTEGER NOT NULL,
+            stdout TEXT NOT NULL,
+            stderr TEXT NOT NULL,
+            wall_time_ms INTEGER DEFAULT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT uq_judge_run_memo_build_input UNIQUE (build_key, input_hash)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_judge_run_memo_created_at ON capstone_app.judge_run_memo (created_at)"
+    )
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.judge_run_memo TO api_user")
+    op.execute("GRANT USAGE, SELECT ON SEQUENCE capstone_app.judge_run_memo_memo_id_seq TO api_user")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS capstone_app.judge_run_memo")
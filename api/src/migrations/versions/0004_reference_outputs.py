@@ -0,0 +1,46 @@
+"""Stored outputs of the reference solutions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS capstone_app.reference_outputs (
+            reference_output_id SERIAL PRIMARY KEY,
+            match_set_id INTEGER NOT NULL REFERENCES capstone_app.match_setting(match_set_id) ON DELETE CASCADE,
+            reference_hash VARCHAR(64) NOT NULL,
+            input_hash VARCHAR(64) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            exit_code INTEGER NOT NULL,
+            stdout TEXT NOT NULL,
+            stderr TEXT NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            CONSTRAINT uq_reference_outputs_setting_reference_input UNIQUE (match_set_id, reference_hash, input_hash)
+        )
+        """
+    )
+    op.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.reference_outputs TO api_user")
+    op.execute(
+        "GRANT USAGE, SELECT ON SEQUENCE capstone_app.reference_outputs_reference_output_id_seq TO api_user"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS capstone_app.reference_outputs")
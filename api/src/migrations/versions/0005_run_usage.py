@@ -0,0 +1,38 @@
+"""Resource usage of test runs
+
+Nullable columns without a default: adding them does not rewrite the tables.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SOLUTION_TEST_COLUMNS = ("wall_time_ms", "cpu_time_ms", "peak_memory_kb", "output_bytes")
+MEMO_COLUMNS = ("cpu_time_ms", "peak_memory_kb", "output_bytes")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in SOLUTION_TEST_COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.student_solution_tests ADD COLUMN IF NOT EXISTS {column} INTEGER")
+    for column in MEMO_COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.judge_run_memo ADD COLUMN IF NOT EXISTS {column} INTEGER")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in MEMO_COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.judge_run_memo DROP COLUMN IF EXISTS {column}")
+    for column in SOLUTION_TEST_COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.student_solution_tests DROP COLUMN IF EXISTS {column}")
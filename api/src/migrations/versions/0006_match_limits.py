@@ -0,0 +1,33 @@
+"""Per-match run limits
+
+NULL keeps the judge default (SANDBOX_* settings).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("time_limit_ms", "cpu_time_limit_ms", "memory_limit_mb", "output_limit_kb")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.match_setting ADD COLUMN IF NOT EXISTS {column} INTEGER")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(COLUMNS):
+        op.execute(f"ALTER TABLE capstone_app.match_setting DROP COLUMN IF EXISTS {column}")
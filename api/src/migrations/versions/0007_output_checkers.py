@@ -0,0 +1,40 @@
+"""Per-match output checkers and stored verdicts
+
+NULL checker columns keep the exact checker; NULL verdicts are rows stored before
+(or without) an expected output.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MATCH_SETTING_COLUMNS = (
+    ("checker_mode", "VARCHAR(20)"),
+    ("checker_tolerance", "DOUBLE PRECISION"),
+    ("checker_source", "TEXT"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column, column_type in MATCH_SETTING_COLUMNS:
+        op.execute(f"ALTER TABLE capstone_app.match_setting ADD COLUMN IF NOT EXISTS {column} {column_type}")
+    op.execute("ALTER TABLE capstone_app.student_solution_tests ADD COLUMN IF NOT EXISTS passed BOOLEAN")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE capstone_app.student_solution_tests DROP COLUMN IF EXISTS passed")
+    for column, _ in reversed(MATCH_SETTING_COLUMNS):
+        op.execute(f"ALTER TABLE capstone_app.match_setting DROP COLUMN IF EXISTS {column}")
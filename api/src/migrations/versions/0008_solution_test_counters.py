@@ -0,0 +1,69 @@
+"""Test counters of the solutions, and the checker of each stored verdict
+
+tests_run and tests_passed are added nullable, filled in batches from the stored
+results, and only then made NOT NULL DEFAULT 0 (see migration_ops.py). The
+backfill counts a teacher test as passed like the profile did before the
+counters: by its stored verdict, or for rows stored without one, by comparing
+its output with the expected output (surrounding whitespace ignored).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migration_ops import backfill_in_batches, set_not_null
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ("tests_run", "tests_passed")
+
+# Whitespace removed by str.strip(), which the profile compared outputs with
+_WHITESPACE = r"E' \t\n\r\x0b\x0c'"
+
+BACKFILL_SET_SQL = f"""
+    tests_run = (
+        SELECT COUNT(*) FROM capstone_app.student_solution_tests sst
+        WHERE sst.solution_id = student_solutions.solution_id AND sst.teacher_test_id IS NOT NULL
+    ),
+    tests_passed = (
+        SELECT COUNT(*) FROM capstone_app.student_solution_tests sst
+        JOIN capstone_app.tests t ON t.test_id = sst.teacher_test_id
+        WHERE sst.solution_id = student_solutions.solution_id
+        AND COALESCE(sst.passed, btrim(sst.test_output, {_WHITESPACE}) = btrim(t.test_out, {_WHITESPACE}))
+    )
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE capstone_app.student_solution_tests ADD COLUMN IF NOT EXISTS checker_mode VARCHAR(20)")
+
+    for column in COUNTERS:
+        op.execute(f"ALTER TABLE capstone_app.student_solutions ADD COLUMN IF NOT EXISTS {column} INTEGER")
+        # Rows inserted from now on get 0 (and phase one counts them when it saves)
+        op.execute(f"ALTER TABLE capstone_app.student_solutions ALTER COLUMN {column} SET DEFAULT 0")
+
+    backfill_in_batches(
+        "student_solutions",
+        "solution_id",
+        BACKFILL_SET_SQL,
+        "tests_run IS NULL OR tests_passed IS NULL",
+    )
+    for column in COUNTERS:
+        set_not_null("student_solutions", column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(COUNTERS):
+        op.execute(f"ALTER TABLE capstone_app.student_solutions DROP COLUMN IF EXISTS {column}")
+    op.execute("ALTER TABLE capstone_app.student_solution_tests DROP COLUMN IF EXISTS checker_mode")
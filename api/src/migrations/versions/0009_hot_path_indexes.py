@@ -0,0 +1,42 @@
+"""Indexes of the hot lookup paths
+
+Already in init.sql for databases created after them; built concurrently (no
+write lock) on older databases.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from migration_ops import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("idx_teacher_user_id", "teacher", "user_id"),
+    ("idx_student_user_id", "student", "user_id"),
+    ("idx_tests_match_set_scope", "tests", "match_set_id, scope"),
+    ("idx_student_tests_match_student", "student_tests", "match_for_game_id, student_id"),
+    ("idx_student_solutions_student_match", "student_solutions", "student_id, match_for_game_id"),
+    ("idx_student_solution_tests_solution", "student_solution_tests", "solution_id"),
+    ("idx_student_assigned_review_solution", "student_assigned_review", "assigned_solution_id"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        create_index_concurrently(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _, _ in reversed(INDEXES):
+        drop_index_concurrently(name)
@@ -8,11 +8,11 @@ from datetime import datetime as dt
 from typing import List
 
 from pydantic import BaseModel, Field
-from sqlalchemy import Boolean, Column, Integer, String, Text, ForeignKey, Enum, DateTime, Numeric
+from sqlalchemy import Boolean, Column, Integer, String, Text, ForeignKey, Enum, DateTime, Numeric, Float
 from sqlalchemy.dialects.postgresql import ENUM as PG_ENUM
 from sqlalchemy.orm import relationship
 from typing import Optional
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 
 
 
@@ -31,7 +31,10 @@ class Teacher(Base):
     
     """
     __tablename__ = "teacher"
-    __table_args__ = {'schema': SCHEMA_NAME}
+    __table_args__ = (
+        Index("idx_teacher_user_id", "user_id"),
+        {'schema': SCHEMA_NAME}
+    )
 
     teacher_id = Column(Integer, primary_key=True)
     
@@ -65,6 +68,15 @@ class MatchSetting(Base):
     function_inputs = Column(Text, nullable=True)  # JSON array
     language = Column(String(20), nullable=False, default="cpp")
     total_points = Column(Integer, nullable=False, default=100)
+    # Per-test run limits (NULL = judge default, see code_runner.get_run_limits())
+    time_limit_ms = Column(Integer, nullable=True)
+    cpu_time_limit_ms = Column(Integer, nullable=True)
+    memory_limit_mb = Column(Integer, nullable=True)
+    output_limit_kb = Column(Integer, nullable=True)
+    # Output checker (NULL mode = exact, see checkers.py)
+    checker_mode = Column(String(20), nullable=True)
+    checker_tolerance = Column(Float, nullable=True)
+    checker_source = Column(Text, nullable=True)
     creator_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.teacher.teacher_id"))
     
     # Relationship: This setting belongs to one teacher
@@ -79,7 +91,10 @@ class Test(Base):
     SQLAlchemy model for the 'tests' table.
     """
     __tablename__ = "tests"
-    __table_args__ = {'schema': SCHEMA_NAME}
+    __table_args__ = (
+        Index("idx_tests_match_set_scope", "match_set_id", "scope"),
+        {'schema': SCHEMA_NAME}
+    )
 
     test_id = Column(Integer, primary_key=True)
     test_in = Column(String(500), nullable=True)
@@ -95,7 +110,10 @@ class StudentTest(Base):
     SQLAlchemy model for the 'student_tests' table (student-created tests).
     """
     __tablename__ = "student_tests"
-    __table_args__ = {'schema': SCHEMA_NAME}
+    __table_args__ = (
+        Index("idx_student_tests_match_student", "match_for_game_id", "student_id"),
+        {'schema': SCHEMA_NAME}
+    )
 
     test_id = Column(Integer, primary_key=True)
     test_in = Column(String(500), nullable=True)
@@ -110,12 +128,18 @@ class StudentSolution(Base):
     SQLAlchemy model for the 'student_solutions' table.
     """
     __tablename__ = "student_solutions"
-    __table_args__ = {'schema': SCHEMA_NAME}
+    __table_args__ = (
+        Index("idx_student_solutions_student_match", "student_id", "match_for_game_id"),
+        {'schema': SCHEMA_NAME}
+    )
 
     solution_id = Column(Integer, primary_key=True)
     code = Column(Text, nullable=False)
     has_passed = Column(Boolean, nullable=False, default=False)
     passed_test = Column(Integer, default=0)
+    # Teacher tests with a stored result, and how many passed (kept by phase one)
+    tests_run = Column(Integer, nullable=False, default=0)
+    tests_passed = Column(Integer, nullable=False, default=0)
     match_for_game_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.matches_for_game.match_for_game_id"), nullable=False)
     student_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.student.student_id"), nullable=False)
     
@@ -127,6 +151,7 @@ class StudentSolutionTest(Base):
     """
     __tablename__ = "student_solution_tests"
     __table_args__ = (
+        Index("idx_student_solution_tests_solution", "solution_id"),
         {'schema': SCHEMA_NAME}
     )
 
@@ -135,6 +160,14 @@ class StudentSolutionTest(Base):
     teacher_test_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.tests.test_id"), nullable=True)
     student_test_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.student_tests.test_id"), nullable=True)
     test_output = Column(Text, nullable=False)
+    # Resource usage of the run (NULL when not measured)
+    wall_time_ms = Column(Integer, nullable=True)
+    cpu_time_ms = Column(Integer, nullable=True)
+    peak_memory_kb = Column(Integer, nullable=True)
+    output_bytes = Column(Integer, nullable=True)
+    # Verdict of the checker, decided when judged (NULL when there is no expected output)
+    passed = Column(Boolean, nullable=True)
+    checker_mode = Column(String(20), nullable=True)
 
 
 class Match(Base):
@@ -172,7 +205,10 @@ class MatchesForGame(Base):
 
 class Student(Base):
     __tablename__ = "student"
-    __table_args__ = {'schema': SCHEMA_NAME}
+    __table_args__ = (
+        Index("idx_student_user_id", "user_id"),
+        {'schema': SCHEMA_NAME}
+    )
 
     student_id      = Column(Integer    , primary_key=True)
     email           = Column(String(150), nullable=False)
@@ -200,17 +236,6 @@ class StudentJoinGame(Base):
     assigned_match_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.match.match_id"), nullable=True)
     session_score = Column(Numeric(10, 2), nullable=True)  # Score for this game session (calculated after Phase 2)
 
-class MatchJoinGame(Base):
-    __tablename__ = "match_for_game"
-    __table_args__ = {'schema': SCHEMA_NAME}
-
-
-    match_for_game_id = Column(Integer, primary_key=True)
-    match_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.match.match_id"))
-    game_id  = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.game_session.game_id"))
-
-
-
 class GameSession(Base):
     __tablename__ = "game_session"
     __table_args__ = {'schema': SCHEMA_NAME}
@@ -239,6 +264,7 @@ class StudentAssignedReview(Base):
     __tablename__ = "student_assigned_review"
     __table_args__ = (
         UniqueConstraint("student_id", "assigned_solution_id", name="uq_student_assigned_review_pair"),
+        Index("idx_student_assigned_review_solution", "assigned_solution_id"),
         {'schema': SCHEMA_NAME}
     )
 
@@ -306,6 +332,82 @@ class StudentBadge(Base):
     student = relationship("Student")
 
 
+class JudgeJob(Base):
+    """
+    SQLAlchemy model for the 'judge_jobs' table.
+    Queue of compilation and test-run jobs, see judge_queue.py.
+    """
+    __tablename__ = "judge_jobs"
+    __table_args__ = {'schema': SCHEMA_NAME}
+
+    job_id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    priority = Column(Integer, nullable=False, default=0)
+    payload = Column(Text, nullable=False)  # JSON arguments of the job
+    result = Column(Text, nullable=True)  # JSON result, when done
+    error = Column(Text, nullable=True)  # Error message, when failed
+    attempts = Column(Integer, nullable=False, default=0)
+    student_id = Column(Integer, ForeignKey(f"{SCHEMA_NAME}.student.student_id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=dt.now)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class JudgeRunMemo(Base):
+    """
+    SQLAlchemy model for the 'judge_run_memo' table.
+    Results of running a build on an input, see run_memo.py.
+    """
+    __tablename__ = "judge_run_memo"
+    __table_args__ = (
+        UniqueConstraint("build_key", "input_hash", name="uq_judge_run_memo_build_input"),
+        {'schema': SCHEMA_NAME}
+    )
+
+    memo_id = Column(Integer, primary_key=True)
+    build_key = Column(String(64), nullable=False)  # run_memo.make_key(): build and run limits
+    input_hash = Column(String(64), nullable=False)  # sha256 of the test input
+    status = Column(String(20), nullable=False)
+    exit_code = Column(Integer, nullable=False)
+    stdout = Column(Text, nullable=False)
+    stderr = Column(Text, nullable=False)
+    wall_time_ms = Column(Integer, nullable=True)
+    cpu_time_ms = Column(Integer, nullable=True)
+    peak_memory_kb = Column(Integer, nullable=True)
+    output_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=dt.now)
+
+
+class ReferenceOutput(Base):
+    """
+    SQLAlchemy model for the 'reference_outputs' table.
+    Results of the reference solution of a match setting on an input, see reference_outputs.py.
+    """
+    __tablename__ = "reference_outputs"
+    __table_args__ = (
+        UniqueConstraint(
+            "match_set_id", "reference_hash", "input_hash",
+            name="uq_reference_outputs_setting_reference_input"
+        ),
+        {'schema': SCHEMA_NAME}
+    )
+
+    reference_output_id = Column(Integer, primary_key=True)
+    match_set_id = Column(
+        Integer,
+        ForeignKey(f"{SCHEMA_NAME}.match_setting.match_set_id", ondelete="CASCADE"),
+        nullable=False
+    )
+    reference_hash = Column(String(64), nullable=False)  # sha256 of the reference solution
+    input_hash = Column(String(64), nullable=False)  # sha256 of the test input
+    status = Column(String(20), nullable=False)
+    exit_code = Column(Integer, nullable=False)
+    stdout = Column(Text, nullable=False)
+    stderr = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=dt.now)
+
+
 # ============================================================================
 # Pydantic Models for Game Session Management API (User Story 3)
 # ============================================================================
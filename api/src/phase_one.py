@@ -1,10 +1,14 @@
-import os
-from typing import List, Optional, Annotated
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import json
+import asyncio
+import threading
+from typing import List, Optional, Annotated, Literal, Dict, Any, Iterator, Tuple, Callable, Awaitable
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
-from database import get_db
+from database import get_db, SessionLocal
 from datetime import datetime, timezone
 from models import (
     StudentJoinGame,
@@ -17,9 +21,31 @@ from models import (
     StudentSolution,
     StudentSolutionTest,
     GameSession,
+    JudgeJob,
 )
 from authentication.routes.auth_routes import get_current_user
-from code_runner import compile_cpp, run_cpp_executable
+from judge_tasks import iter_judge_code, get_match_language, get_match_limits, should_stop_judging
+from code_runner import COMPILE_PROFILE_CUSTOM_TEST, ANSWER_STATUSES
+from checkers import (
+    check_outputs,
+    get_match_checker,
+    get_checker_mode,
+    runs_in_sandbox,
+    supports_streaming,
+    MISMATCH_MESSAGE,
+)
+from solution_artifacts import solution_artifacts, hash_code, SOLUTION_ARTIFACTS_ENABLED
+from admission import acquire_or_raise, admit_or_raise, rate_limit_or_raise
+from judge_queue import (
+    enqueue_job_or_raise,
+    get_queue_position,
+    register_job_handler,
+    JOB_DONE,
+    JOB_FAILED,
+    PRIORITY_SOLUTION,
+    PRIORITY_CUSTOM_TEST,
+    JUDGE_QUEUE_POLL_SECONDS,
+)
 
 router = APIRouter(prefix="/api/phase-one", tags=["phase-one"])
 
@@ -82,6 +108,11 @@ class SubmitSolutionResponse(BaseModel):
     message: str
     compiled: bool
     test_results: List[TestResultDetail] = []
+    stopped_early: bool = False  # True when judging stopped before every test ran (see JUDGE_FAILURE_POLICY)
+
+class JudgeCompiledEvent(BaseModel):
+    compiled: bool
+    message: str
 
 class CustomTestRequest(BaseModel):
     student_id: int
@@ -93,6 +124,31 @@ class CustomTestResponse(BaseModel):
     compiled: bool
     test_results: List[TestResultDetail] = []
 
+class SubmissionRequest(BaseModel):
+    student_id: int
+    game_id: int
+    code: str = Field(..., description="The source code to judge")
+    kind: Literal["solution", "custom_test"] = Field(
+        "solution",
+        description="'solution' to submit the solution, 'custom_test' to run the student's own tests"
+    )
+
+class SubmissionQueuedResponse(BaseModel):
+    submission_id: int
+    status: str  # "queued"
+    queue_position: Optional[int] = None
+
+class SubmissionStatusResponse(BaseModel):
+    submission_id: int
+    kind: str
+    status: str  # "queued", "running", "done", "failed"
+    queue_position: Optional[int] = None
+    result: Optional[Dict[str, Any]] = Field(
+        None,
+        description="SubmitSolutionResponse or CustomTestResponse (depending on kind), when done"
+    )
+    error: Optional[str] = None
+
 class StudentGameStatusResponse(BaseModel):
     game_id: Optional[int] = None
     game_name: Optional[str] = None
@@ -267,23 +323,83 @@ def get_student_tests(
 
 
 @router.post("/solution", response_model=SubmitSolutionResponse)
-def submit_solution(
+async def submit_solution(
     current_user: Annotated[dict, Depends(get_current_user)],
     request: SubmitSolutionRequest,
     db: Session = Depends(get_db),
 ):
     """
     Submit the solution of the student.
+    The solution is judged synchronously; submitting code that is already being
+    judged returns the same verdict. See POST /submissions for the queued variant.
     """
 
     if request.student_id != int(current_user["sub"]):
         raise HTTPException(status_code=403, detail="Not authorized to submit code for another student")
 
+    rate_limit_or_raise(current_user["sub"])
+
+    async def judge() -> SubmitSolutionResponse:
+        async with admit_or_raise(current_user["sub"]):
+            return await run_in_threadpool(_judge_solution, db, request.student_id, request.game_id, request.code)
+
+    return await _coalesce_solution(request.student_id, request.game_id, request.code, judge)
+
+
+# Solutions being judged by this process, by (student, game, code hash);
+# only touched from the event loop
+_inflight_solutions: Dict[Tuple[int, int, str], asyncio.Future] = {}
+
+
+async def _coalesce_solution(
+    student_id: int,
+    game_id: int,
+    code: str,
+    judge: Callable[[], Awaitable[SubmitSolutionResponse]]
+) -> SubmitSolutionResponse:
+    """
+    Run judge() unless the same code of the student is already being judged for
+    this game (a double click, a client retry): the duplicate then waits for that
+    verdict and returns it, or raises the same error, without judging again.
+    """
+    key = (student_id, game_id, hash_code(code))
+    future = _inflight_solutions.get(key)
+    if future is not None:
+        # Shielded: a duplicate going away must not cancel the judging
+        return await asyncio.shield(future)
+
+    future = _inflight_solutions[key] = asyncio.get_running_loop().create_future()
+    try:
+        response = await judge()
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Retrieved, so that no duplicate waiting is not logged as an error
+        future.exception()
+        raise
+    finally:
+        del _inflight_solutions[key]
+
+
+def _get_solution_context(db: Session, student_id: int, game_id: int):
+    """
+    Resolve the match a student is solving in a game session.
+
+    Returns:
+        Tuple[MatchesForGame, Match]: The match-for-game link and the match.
+
+    Raises:
+        HTTPException: 404 if the student has no valid assignment.
+    """
     join_entry = (
         db.query(StudentJoinGame)
         .filter(
-            StudentJoinGame.student_id == request.student_id,
-            StudentJoinGame.game_id == request.game_id,
+            StudentJoinGame.student_id == student_id,
+            StudentJoinGame.game_id == game_id,
         )
         .first()
     )
@@ -295,7 +411,7 @@ def submit_solution(
         db.query(MatchesForGame)
         .filter(
             MatchesForGame.match_id == join_entry.assigned_match_id,
-            MatchesForGame.game_id == request.game_id
+            MatchesForGame.game_id == game_id
         )
         .first()
     )
@@ -313,15 +429,89 @@ def submit_solution(
     if not match_entry or not match_entry.match_set_id:
          raise HTTPException(status_code=404, detail="Match configuration error")
 
-    # Compile the code
-    exe_path, compile_error = compile_cpp(request.code)
-    
-    if exe_path is None:
-        return SubmitSolutionResponse(
-            message=f"Compilation failed: {compile_error}",
-            compiled=False,
-            solution_id=None
-        )
+    return match_for_game, match_entry
+
+
+def _uses_function_harness(match_setting: Optional[MatchSetting]) -> bool:
+    """
+    Function-based problems (generated main() calling the student's function) are
+    judged in harness mode: the program is linked once and every test runs in a fork.
+    """
+    return bool(match_setting and match_setting.function_name)
+
+
+def _iter_checked_results(
+    judge_events: Iterator[Tuple],
+    checker: Dict,
+    cases: List[Tuple[str, Optional[str]]]
+) -> Iterator[Tuple[int, Dict, Optional[Tuple[bool, str]]]]:
+    """
+    Pair the results of judge_tasks.iter_judge_code() with the verdict of the checker.
+
+    Yields (index, result, verdict) for every ("result", index, result) event, with
+    verdict the (passed, message) of check_outputs() for successful runs of a test
+    with an expected output, None otherwise. Outputs are checked as they arrive,
+    except by custom checkers, which run in the sandbox: their outputs are held
+    back and checked with one check_outputs() call (one compilation, one sandbox)
+    once every test has run.
+
+    Args:
+        judge_events: The events of iter_judge_code(), past the "compiled" one.
+        checker: Checker of the match setting, see checkers.get_match_checker().
+        cases: (test input, expected output or None) of every input, by index.
+    """
+    held_back = []
+    for _, index, result in judge_events:
+        input_str, expected = cases[index]
+        if result["status"] != "success" or expected is None:
+            yield index, result, None
+            continue
+        case = (input_str, expected, result["stdout"] or "")
+        if runs_in_sandbox(checker):
+            held_back.append((index, result, case))
+        else:
+            yield index, result, check_outputs(checker, [case])[0]
+
+    if held_back:
+        verdicts = check_outputs(checker, [case for _, _, case in held_back])
+        for (index, result, _), verdict in zip(held_back, verdicts):
+            yield index, result, verdict
+
+
+def _judge_solution(db: Session, student_id: int, game_id: int, code: str) -> SubmitSolutionResponse:
+    """
+    Compile and run a solution against all the tests of the match, and save it
+    if it scores at least as well as the best previous one.
+    """
+    return _final_response(_iter_judge_solution(db, student_id, game_id, code))
+
+
+def _final_response(events: Iterator[Tuple[str, BaseModel]]) -> BaseModel:
+    """Run a judge event stream to completion and return its summary."""
+    summary = None
+    for event, payload in events:
+        if event == "summary":
+            summary = payload
+    return summary
+
+
+def _iter_judge_solution(
+    db: Session,
+    student_id: int,
+    game_id: int,
+    code: str
+) -> Iterator[Tuple[str, BaseModel]]:
+    """
+    Judge a solution (see _judge_solution()), reporting progress as it goes.
+
+    Yields ("compiled", JudgeCompiledEvent), then ("test_result", TestResultDetail)
+    for every public test as soon as it completes, then ("summary", SubmitSolutionResponse).
+    Closing the generator cancels the tests still running; nothing is saved.
+
+    Judging stops as soon as judge_tasks.should_stop_judging() says the outcome is
+    known: the tests still running are cancelled and the solution is not saved.
+    """
+    match_for_game, match_entry = _get_solution_context(db, student_id, game_id)
 
     # Fetch Teacher Tests
     tests = (
@@ -335,99 +525,174 @@ def submit_solution(
         db.query(StudentTest)
         .filter(
             StudentTest.match_for_game_id == match_for_game.match_for_game_id,
-            StudentTest.student_id == request.student_id
+            StudentTest.student_id == student_id
         )
         .all()
     )
 
-    test_results_response = []
+    # Results arrive in completion order: keep them by test position
+    test_results_response = {}
     
     passed_test_count = 0
+    failed_test_count = 0
+    error_test_count = 0
     encountered_error = False
+    stopped_early = False
     
     passed_public_tests = 0
-    total_public_tests = 0
+    total_public_tests = sum(1 for test in tests if test.scope == TestScope.public)
     
     # Buffers to hold results for saving
-    teacher_results_buffer = []
-    student_results_buffer = []
+    teacher_results_buffer = {}
+    student_results_buffer = {}
+
+    # Compile and run all the tests (teacher tests first, then student tests)
+    # Executable of the code, stored as the solution's artifact if it is saved
+    kept_executable = {}
+
+    def keep_executable(executable_path: str, harness: bool) -> None:
+        if SOLUTION_ARTIFACTS_ENABLED:
+            kept_executable["path"] = solution_artifacts.keep(executable_path)
+            kept_executable["harness"] = harness
+
+    checker = get_match_checker(match_entry.match_setting)
+    expected_outputs = None
+    if supports_streaming(checker):
+        # Teacher tests stop as soon as their output is wrong
+        expected_outputs = [test.test_out or "" for test in tests] + [None] * len(student_tests)
+
+    language = get_match_language(match_entry.match_setting)
+    judge_events = iter_judge_code(
+        code,
+        [test.test_in or "" for test in tests] + [test.test_in or "" for test in student_tests],
+        harness=_uses_function_harness(match_entry.match_setting),
+        on_compiled=keep_executable,
+        limits=get_match_limits(match_entry.match_setting),
+        expected_outputs=expected_outputs,
+        language=language
+    )
 
     try:
-        # Run Teacher Tests
-        for test in tests:
-            result = run_cpp_executable(exe_path, test.test_in or "")
-            
+        _, compile_error = next(judge_events)
+        if compile_error is not None:
+            summary = SubmitSolutionResponse(
+                message=f"Compilation failed: {compile_error}",
+                compiled=False,
+                solution_id=None
+            )
+            yield "compiled", JudgeCompiledEvent(compiled=False, message=summary.message)
+            yield "summary", summary
+            return
+
+        yield "compiled", JudgeCompiledEvent(compiled=True, message="Compilation successful.")
+
+        cases = [(test.test_in or "", test.test_out or "") for test in tests]
+        cases += [(test.test_in or "", test.test_out) for test in student_tests]
+        for index, result, verdict in _iter_checked_results(judge_events, checker, cases):
+            if index >= len(tests):
+                # Student Tests (Custom Tests)
+                test = student_tests[index - len(tests)]
+                actual_out = ""
+                passed = None
+                if result["status"] == "success":
+                    actual_out = (result["stdout"] or "").strip()
+                    if verdict is not None:
+                        passed, _ = verdict
+                else:
+                    actual_out = (result["stderr"] or "Error")
+                    passed = False if test.test_out is not None else None
+                
+                # Save to buffer
+                student_results_buffer[index] = {
+                    "test_id": test.test_id,
+                    "actual_output": actual_out,
+                    "passed": passed,
+                    "checker_mode": get_checker_mode(checker) if passed is not None else None,
+                    **_resource_usage(result)
+                }
+                continue
+
+            # Teacher Tests
+            test = tests[index]
             is_public = (test.scope == TestScope.public)
-            if is_public:
-                total_public_tests += 1
             
             status = "fail"
             message = ""
             actual_out = ""
             expected_out = (test.test_out or "").strip()  # Define before if block
             
-            if result["status"] == "success":
+            if result["status"] in ANSWER_STATUSES:
                 actual_out = (result["stdout"] or "").strip()
-                if actual_out == expected_out:
+                passed, check_message = verdict if verdict is not None else (False, MISMATCH_MESSAGE)
+                if passed:
                     status = "pass"
                     passed_test_count += 1
                     if is_public:
                         passed_public_tests += 1
                 else:
-                    message = f"Output mismatch"
+                    message = check_message
+                    failed_test_count += 1
             else:
                 status = result["status"]
                 message = result["stderr"] or "Execution failed"
                 actual_out = message  # Set actual_out to error message for debugging
                 encountered_error = True
+                failed_test_count += 1
+                error_test_count += 1
 
             # Save to buffer
-            teacher_results_buffer.append({
+            teacher_results_buffer[index] = {
                 "test_id": test.test_id,
-                "actual_output": actual_out if result["status"] == "success" else (result["stderr"] or "Error")
-            })
+                "actual_output": actual_out if result["status"] in ANSWER_STATUSES else (result["stderr"] or "Error"),
+                "passed": status == "pass",
+                "checker_mode": get_checker_mode(checker),
+                **_resource_usage(result)
+            }
 
             if is_public:
-                test_results_response.append(TestResultDetail(
+                test_results_response[index] = TestResultDetail(
                     test_id=test.test_id,
                     status=status,
                     message=message,
                     actual_output=actual_out,
                     expected_output=expected_out
-                ))
-
-        # Run Student Tests (Custom Tests)
-        for test in student_tests:
-            result = run_cpp_executable(exe_path, test.test_in or "")
-            
-            actual_out = ""
-            if result["status"] == "success":
-                actual_out = (result["stdout"] or "").strip()
-            else:
-                actual_out = (result["stderr"] or "Error")
-            
-            # Save to buffer
-            student_results_buffer.append({
-                "test_id": test.test_id,
-                "actual_output": actual_out
-            })
-
+                )
+                yield "test_result", test_results_response[index]
+
+            if should_stop_judging(error_test_count, failed_test_count):
+                # Closing the generator cancels the remaining tests
+                stopped_early = len(teacher_results_buffer) + len(student_results_buffer) < len(tests) + len(student_tests)
+                break
+    except BaseException:
+        solution_artifacts.discard(kept_executable.get("path"))
+        raise
     finally:
-        if os.path.exists(exe_path):
-            try:
-                os.remove(exe_path)
-            except:
-                pass
+        judge_events.close()
 
     solution_id = None
+    should_save = False
     final_message = "Solution ran successfully."
 
-    if not encountered_error:
+    if stopped_early and not encountered_error:
+        final_message = f"Solution not saved: judging stopped after {failed_test_count} failed tests."
+    elif not encountered_error:
+        # Concurrent submissions of the student save one after the other: the
+        # comparison with the best score and the upsert below must not interleave
+        (
+            db.query(StudentJoinGame)
+            .filter(
+                StudentJoinGame.student_id == student_id,
+                StudentJoinGame.game_id == game_id
+            )
+            .with_for_update()
+            .first()
+        )
+
         # Check if a solution already exists
         existing_solution = (
             db.query(StudentSolution)
             .filter(
-                StudentSolution.student_id == request.student_id,
+                StudentSolution.student_id == student_id,
                 StudentSolution.match_for_game_id == match_for_game.match_for_game_id
             )
             .first()
@@ -446,7 +711,7 @@ def submit_solution(
             current_best = existing_solution.passed_test or 0
             if passed_test_count >= current_best:
                 should_save = True
-                existing_solution.code = request.code
+                existing_solution.code = code
                 existing_solution.has_passed = solution_has_passed
                 existing_solution.passed_test = passed_test_count
                 db.flush() # Flush to get ID if needed, though it exists
@@ -458,11 +723,11 @@ def submit_solution(
         else:
             should_save = True
             new_solution = StudentSolution(
-                code=request.code,
+                code=code,
                 has_passed=solution_has_passed,
                 passed_test=passed_test_count,
                 match_for_game_id=match_for_game.match_for_game_id,
-                student_id=request.student_id
+                student_id=student_id
             )
             db.add(new_solution)
             db.flush() # Flush to get new_solution.solution_id
@@ -471,43 +736,106 @@ def submit_solution(
             
         if should_save and solution_id:
             # Persist detailed test results
-            
-            # Delete old results
-            db.query(StudentSolutionTest).filter(StudentSolutionTest.solution_id == solution_id).delete()
-            
-            # Insert teacher test results
-            for item in teacher_results_buffer:
-                db.add(StudentSolutionTest(
-                    solution_id=solution_id,
-                    teacher_test_id=item["test_id"],
-                    student_test_id=None,
-                    test_output=item["actual_output"]
-                ))
-            
-            # Insert student test results
-            for item in student_results_buffer:
-                db.add(StudentSolutionTest(
-                    solution_id=solution_id,
-                    teacher_test_id=None,
-                    student_test_id=item["test_id"],
-                    test_output=item["actual_output"]
-                ))
+            _sync_solution_tests(
+                db,
+                solution_id,
+                [teacher_results_buffer[index] for index in sorted(teacher_results_buffer)],
+                [student_results_buffer[index] for index in sorted(student_results_buffer)]
+            )
             
         db.commit()
             
     else:
         final_message = "Solution not saved due to runtime errors."
+
+    # Keep the executable for phase two (see solution_artifacts.py)
+    if kept_executable.get("path"):
+        if should_save and solution_id:
+            solution_artifacts.put(solution_id, code, kept_executable["path"], kept_executable["harness"], language)
+        else:
+            solution_artifacts.discard(kept_executable["path"])
     
-    return SubmitSolutionResponse(
+    yield "summary", SubmitSolutionResponse(
         solution_id=solution_id,
         message=final_message,
         compiled=True,
-        test_results=test_results_response
+        test_results=[test_results_response[index] for index in sorted(test_results_response)],
+        stopped_early=stopped_early
+    )
+
+
+RESOURCE_USAGE_FIELDS = ("wall_time_ms", "cpu_time_ms", "peak_memory_kb", "output_bytes")
+
+
+def _resource_usage(result: Dict) -> Dict:
+    """Resource usage measured for a run (None for what was not measured)."""
+    return {field: result.get(field) for field in RESOURCE_USAGE_FIELDS}
+
+
+def _sync_solution_tests(
+    db: Session,
+    solution_id: int,
+    teacher_results: List[dict],
+    student_results: List[dict]
+) -> None:
+    """
+    Update the stored test results of a solution in place: only the rows whose
+    output, verdict or resource usage changed are updated, new tests are inserted
+    and removed tests deleted. The tests_run / tests_passed counters of the
+    solution are updated to match, so readers never aggregate the rows.
+    """
+    existing_rows = (
+        db.query(StudentSolutionTest)
+        .filter(StudentSolutionTest.solution_id == solution_id)
+        .all()
     )
+    existing = {}
+    for row in existing_rows:
+        key = (row.teacher_test_id, row.student_test_id)
+        if key in existing:
+            # Duplicate row left by an older version: drop it
+            db.delete(row)
+        else:
+            existing[key] = row
+
+    desired = {}
+    for item in teacher_results:
+        desired[(item["test_id"], None)] = item
+    for item in student_results:
+        desired[(None, item["test_id"])] = item
+
+    for (teacher_test_id, student_test_id), item in desired.items():
+        values = {
+            "test_output": item["actual_output"],
+            "passed": item.get("passed"),
+            "checker_mode": item.get("checker_mode"),
+        }
+        values.update({field: item.get(field) for field in RESOURCE_USAGE_FIELDS})
+
+        row = existing.pop((teacher_test_id, student_test_id), None)
+        if row is None:
+            db.add(StudentSolutionTest(
+                solution_id=solution_id,
+                teacher_test_id=teacher_test_id,
+                student_test_id=student_test_id,
+                **values
+            ))
+            continue
+        for field, value in values.items():
+            if getattr(row, field) != value:
+                setattr(row, field, value)
+
+    # Tests that no longer exist
+    for row in existing.values():
+        db.delete(row)
+
+    solution = db.get(StudentSolution, solution_id)
+    solution.tests_run = len(teacher_results)
+    solution.tests_passed = sum(1 for item in teacher_results if item.get("passed"))
 
 
 @router.post("/custom_test", response_model=CustomTestResponse)
-def run_custom_tests(
+async def run_custom_tests(
     current_user: Annotated[dict, Depends(get_current_user)],
     request: CustomTestRequest,
     db: Session = Depends(get_db),
@@ -519,37 +847,89 @@ def run_custom_tests(
     if request.student_id != int(current_user["sub"]):
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    rate_limit_or_raise(current_user["sub"])
+    async with admit_or_raise(current_user["sub"]):
+        return await run_in_threadpool(_judge_custom_tests, db, request.student_id, request.game_id, request.code)
+
+
+def _judge_custom_tests(db: Session, student_id: int, game_id: int, code: str) -> CustomTestResponse:
+    """
+    Compile and run code against the custom tests of the student.
+    """
+    return _final_response(_iter_judge_custom_tests(db, student_id, game_id, code))
+
+
+def _iter_judge_custom_tests(
+    db: Session,
+    student_id: int,
+    game_id: int,
+    code: str
+) -> Iterator[Tuple[str, BaseModel]]:
+    """
+    Run the custom tests of the student (see _judge_custom_tests()), reporting progress as it goes.
+
+    Yields ("compiled", JudgeCompiledEvent), then ("test_result", TestResultDetail)
+    for every test as soon as it completes, then ("summary", CustomTestResponse).
+    """
     # Fetch Student Tests
     student_tests = (
         db.query(StudentTest)
         .join(MatchesForGame, StudentTest.match_for_game_id == MatchesForGame.match_for_game_id)
         .filter(
-            StudentTest.student_id == request.student_id,
-            MatchesForGame.game_id == request.game_id
+            StudentTest.student_id == student_id,
+            MatchesForGame.game_id == game_id
         )
         .all()
     )
 
     if not student_tests:
-        return CustomTestResponse(
+        yield "summary", CustomTestResponse(
             message="No custom tests found. Create a test case first.",
             compiled=False
         )
+        return
 
-    exe_path, compile_error = compile_cpp(request.code)
-    
-    if exe_path is None:
-        return CustomTestResponse(
-            message=f"Compilation failed: {compile_error}",
-            compiled=False
+    match_setting = (
+        db.query(MatchSetting)
+        .join(Match, Match.match_set_id == MatchSetting.match_set_id)
+        .join(StudentJoinGame, StudentJoinGame.assigned_match_id == Match.match_id)
+        .filter(
+            StudentJoinGame.student_id == student_id,
+            StudentJoinGame.game_id == game_id
         )
+        .first()
+    )
+    checker = get_match_checker(match_setting)
+
+    judge_events = iter_judge_code(
+        code,
+        [test.test_in or "" for test in student_tests],
+        priority=PRIORITY_CUSTOM_TEST,
+        profile=COMPILE_PROFILE_CUSTOM_TEST,
+        harness=_uses_function_harness(match_setting),
+        limits=get_match_limits(match_setting),
+        language=get_match_language(match_setting)
+    )
+
+    # Results arrive in completion order: keep them by test position
+    test_results = {}
 
-    test_results = []
-    
     try:
-        for test in student_tests:
-            result = run_cpp_executable(exe_path, test.test_in or "")
-            
+        _, compile_error = next(judge_events)
+        if compile_error is not None:
+            summary = CustomTestResponse(
+                message=f"Compilation failed: {compile_error}",
+                compiled=False
+            )
+            yield "compiled", JudgeCompiledEvent(compiled=False, message=summary.message)
+            yield "summary", summary
+            return
+
+        yield "compiled", JudgeCompiledEvent(compiled=True, message="Compilation successful.")
+
+        cases = [(test.test_in or "", test.test_out or "") for test in student_tests]
+        for index, result, verdict in _iter_checked_results(judge_events, checker, cases):
+            test = student_tests[index]
             status = "fail"
             message = ""
             actual_out = ""
@@ -557,37 +937,282 @@ def run_custom_tests(
 
             if result["status"] == "success":
                 actual_out = (result["stdout"] or "").strip()
+                passed, check_message = verdict
                 
-                if actual_out == expected_out:
+                if passed:
                     status = "pass"
                 else:
-                    message = "Output mismatch"
+                    message = check_message
             else:
                 status = result["status"]
                 message = result["stderr"] or "Execution failed"
                 actual_out = message  # Set actual_out to error message for debugging
 
-            test_results.append(TestResultDetail(
+            test_results[index] = TestResultDetail(
                 test_id=test.test_id,
                 status=status,
                 message=message,
                 actual_output=actual_out,
                 expected_output=expected_out
-            ))
-            
+            )
+            yield "test_result", test_results[index]
     finally:
-        if os.path.exists(exe_path):
-            try:
-                os.remove(exe_path)
-            except:
-                pass
+        judge_events.close()
 
-    return CustomTestResponse(
+    yield "summary", CustomTestResponse(
         message="Custom tests executed.",
         compiled=True,
-        test_results=test_results
+        test_results=[test_results[index] for index in sorted(test_results)]
+    )
+
+
+def _run_solution_job(db: Session, payload: Dict) -> Dict:
+    return _judge_solution(db, payload["student_id"], payload["game_id"], payload["code"]).model_dump()
+
+
+def _run_custom_test_job(db: Session, payload: Dict) -> Dict:
+    return _judge_custom_tests(db, payload["student_id"], payload["game_id"], payload["code"]).model_dump()
+
+
+register_job_handler("solution", _run_solution_job)
+register_job_handler("custom_test", _run_custom_test_job)
+
+
+def _submission_status(db: Session, job: JudgeJob) -> SubmissionStatusResponse:
+    return SubmissionStatusResponse(
+        submission_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        queue_position=get_queue_position(db, job),
+        result=json.loads(job.result) if job.result else None,
+        error=job.error
+    )
+
+
+def _get_own_submission(db: Session, submission_id: int, current_user: dict) -> JudgeJob:
+    job = db.query(JudgeJob).filter(JudgeJob.job_id == submission_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    if job.student_id != int(current_user["sub"]):
+        raise HTTPException(status_code=403, detail="Not authorized to view this submission")
+
+    return job
+
+
+@router.post(
+    "/submissions",
+    response_model=SubmissionQueuedResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def enqueue_submission(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    request: SubmissionRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Queue code to be judged and return its submission id immediately.
+    Solutions are judged before custom test runs. Code that is already queued or
+    running for the student returns that submission.
+    Poll GET /submissions/{id} or stream GET /submissions/{id}/events for the verdict.
+    """
+    if request.student_id != int(current_user["sub"]):
+        raise HTTPException(status_code=403, detail="Not authorized to submit code for another student")
+
+    if request.kind == "solution":
+        # Reject invalid assignments now rather than in the worker
+        _get_solution_context(db, request.student_id, request.game_id)
+        priority = PRIORITY_SOLUTION
+    else:
+        priority = PRIORITY_CUSTOM_TEST
+
+    rate_limit_or_raise(current_user["sub"])
+
+    # Resubmitting code that is still queued or running returns the same submission
+    job = enqueue_job_or_raise(
+        db,
+        request.kind,
+        {"student_id": request.student_id, "game_id": request.game_id, "code": request.code},
+        student_id=request.student_id,
+        priority=priority,
+        coalesce=True
     )
 
+    return SubmissionQueuedResponse(
+        submission_id=job.job_id,
+        status=job.status,
+        queue_position=get_queue_position(db, job)
+    )
+
+
+@router.get("/submissions/{submission_id}", response_model=SubmissionStatusResponse)
+def get_submission(
+    submission_id: int,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+):
+    """
+    Get the status of a queued submission, and its result once judged.
+    """
+    job = _get_own_submission(db, submission_id, current_user)
+    return _submission_status(db, job)
+
+
+def _sse_event(event: str, payload: BaseModel) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {payload.model_dump_json()}\n\n"
+
+
+def _load_submission_status(submission_id: int) -> Optional[SubmissionStatusResponse]:
+    db = SessionLocal()
+    try:
+        job = db.query(JudgeJob).filter(JudgeJob.job_id == submission_id).first()
+        return _submission_status(db, job) if job else None
+    finally:
+        db.close()
+
+
+@router.get("/submissions/{submission_id}/events")
+def stream_submission(
+    submission_id: int,
+    http_request: Request,
+    current_user: Annotated[dict, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+):
+    """
+    Stream the status of a queued submission as Server-Sent Events.
+    A 'status' event is sent on every change (status or queue position); the stream
+    ends with a 'result' event holding the final SubmissionStatusResponse.
+    """
+    _get_own_submission(db, submission_id, current_user)
+
+    async def events():
+        last_event = None
+        while not await http_request.is_disconnected():
+            submission = await run_in_threadpool(_load_submission_status, submission_id)
+            if submission is None:
+                return
+            if submission.status in (JOB_DONE, JOB_FAILED):
+                yield _sse_event("result", submission)
+                return
+
+            event = _sse_event("status", submission)
+            if event != last_event:
+                last_event = event
+                yield event
+            await asyncio.sleep(JUDGE_QUEUE_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+async def _stream_judge_events(
+    http_request: Request,
+    iter_judge: Callable[..., Iterator[Tuple[str, BaseModel]]],
+    student_id: int,
+    game_id: int,
+    code: str
+) -> StreamingResponse:
+    """
+    Stream the events of a judge generator (_iter_judge_solution() or
+    _iter_judge_custom_tests()) as Server-Sent Events.
+
+    The judging runs in the threadpool with its own session. When the client
+    disconnects, the generator is closed, which cancels the tests still running;
+    if it is running a step at that time, it stops at the end of that step.
+    The judging slot (see admission.py) is taken before the stream starts, so a
+    saturated judge answers 429, and is released when the judging ends.
+    """
+    rate_limit_or_raise(str(student_id))
+    ticket = await acquire_or_raise(str(student_id))
+
+    cancelled = threading.Event()
+
+    def judge_events():
+        db = SessionLocal()
+        judge = iter_judge(db, student_id, game_id, code)
+        try:
+            for item in judge:
+                if cancelled.is_set():
+                    return
+                yield item
+        finally:
+            judge.close()
+            db.close()
+            ticket.release()
+
+    async def events():
+        judge_iter = judge_events()
+        try:
+            while True:
+                item = await run_in_threadpool(next, judge_iter, None)
+                if item is None:
+                    return
+                yield _sse_event(*item)
+                if await http_request.is_disconnected():
+                    return
+        finally:
+            cancelled.set()
+            try:
+                judge_iter.close()
+            except ValueError:
+                # Running a step in the threadpool: the generator returns at the
+                # end of that step and closes itself there
+                pass
+            finally:
+                # Also releases the slot of a stream closed before its generator
+                # started, or whose last step is still running
+                ticket.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.post("/solution/stream")
+async def stream_solution(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    request: SubmitSolutionRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+):
+    """
+    Submit the solution of the student and stream the verdict as Server-Sent Events:
+    a 'compiled' event (JudgeCompiledEvent), a 'test_result' event (TestResultDetail)
+    for every public test as soon as it completes, then a 'summary' event holding the
+    SubmitSolutionResponse. Disconnecting cancels the run; the solution is then not saved.
+    """
+    if request.student_id != int(current_user["sub"]):
+        raise HTTPException(status_code=403, detail="Not authorized to submit code for another student")
+
+    # Reject invalid assignments before the stream starts
+    await run_in_threadpool(_get_solution_context, db, request.student_id, request.game_id)
+
+    return await _stream_judge_events(http_request, _iter_judge_solution, request.student_id, request.game_id, request.code)
+
+
+@router.post("/custom_test/stream")
+async def stream_custom_tests(
+    current_user: Annotated[dict, Depends(get_current_user)],
+    request: CustomTestRequest,
+    http_request: Request,
+):
+    """
+    Run the student's code against their own custom tests and stream the results as
+    Server-Sent Events: 'compiled', one 'test_result' per test, then a 'summary'
+    event holding the CustomTestResponse. Disconnecting cancels the run.
+    """
+    if request.student_id != int(current_user["sub"]):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return await _stream_judge_events(http_request, _iter_judge_custom_tests, request.student_id, request.game_id, request.code)
+
 
 @router.get("/student-game-status", response_model=StudentGameStatusResponse)
 def get_student_game_status(
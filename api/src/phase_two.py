@@ -1,9 +1,9 @@
 from typing import List, Optional, Annotated
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-import os
 from sqlalchemy.exc import IntegrityError
 
 from database import get_db
@@ -21,7 +21,11 @@ from models import (
     GameSession,
 )
 from authentication.routes.auth_routes import get_current_user
-from code_runner import compile_cpp, run_cpp_executable
+from judge_tasks import judge_code, get_match_language, get_match_limits
+from code_runner import ANSWER_STATUSES, LANGUAGE_CPP
+from checkers import check_output, get_match_checker, get_checker_mode, supports_streaming
+from reference_outputs import get_reference_result
+from admission import admit_or_raise, rate_limit_or_raise
 
 router = APIRouter(prefix="/api/phase-two", tags=["phase-two"])
 
@@ -276,13 +280,27 @@ def get_assigned_solutions(
 
 
 @router.post("/vote", response_model=VoteResponse)
-def submit_vote(
+async def submit_vote(
     current_user: Annotated[dict, Depends(get_current_user)],
     request: VoteRequest,
     db: Session = Depends(get_db),
 ):
     """
     Submit a vote for an assigned solution review.
+    An 'incorrect' vote runs the codes on the proof test: it is rate limited and
+    holds a judging slot (see admission.py) while it is validated.
+    """
+    if request.vote.lower() != "incorrect":
+        return await run_in_threadpool(_submit_vote, current_user, request, db)
+
+    rate_limit_or_raise(current_user["sub"])
+    async with admit_or_raise(current_user["sub"]):
+        return await run_in_threadpool(_submit_vote, current_user, request, db)
+
+
+def _submit_vote(current_user: dict, request: VoteRequest, db: Session) -> VoteResponse:
+    """
+    Validate and store a vote, see submit_vote().
     """
     student_id = int(current_user["sub"])
 
@@ -350,7 +368,12 @@ def submit_vote(
     if vote_type_str == "incorrect":
         valid, student_actual_output = _validate_incorrect_vote(
             student_code=solution.code,
+            solution_id=solution.solution_id,
+            match_set_id=match_setting.match_set_id,
             reference_code=match_setting.reference_solution,
+            limits=get_match_limits(match_setting),
+            checker=get_match_checker(match_setting),
+            language=get_match_language(match_setting),
             test_in=request.proof_test_in,
             test_out=request.proof_test_out
         )
@@ -383,6 +406,7 @@ def submit_vote(
                  test_in=request.proof_test_in,
                  test_out=request.proof_test_out,
                  actual_output=student_actual_output,
+                 checker_mode=get_checker_mode(get_match_checker(match_setting)),
                  note=request.note
              )
 
@@ -414,6 +438,7 @@ def submit_vote(
                  test_in=request.proof_test_in,
                  test_out=request.proof_test_out,
                  actual_output=student_actual_output,
+                 checker_mode=get_checker_mode(get_match_checker(match_setting)),
                  note=request.note
              )
 
@@ -431,6 +456,7 @@ def _persist_proof_test(
     test_in: str, 
     test_out: str, 
     actual_output: str,
+    checker_mode: Optional[str] = None,
     note: Optional[str] = None
 ):
     """
@@ -444,6 +470,7 @@ def _persist_proof_test(
         test_in: Input for the proof test
         test_out: Expected output for the proof test
         actual_output: Actual output generated by the solution
+        checker_mode: Checker that rejected the output (see checkers.py)
         note: Optional comment from the reviewer explaining the issue
     """
     #  Create StudentTest (linked to the reviewer)
@@ -461,7 +488,10 @@ def _persist_proof_test(
         solution_id=solution.solution_id,
         teacher_test_id=None,
         student_test_id=new_test.test_id,
-        test_output=actual_output
+        test_output=actual_output,
+        # Only valid 'incorrect' votes are persisted: the solution fails the test
+        passed=False,
+        checker_mode=checker_mode
     )
     db.add(sol_test)
     db.commit()
@@ -469,9 +499,14 @@ def _persist_proof_test(
 
 def _validate_incorrect_vote(
     student_code: str,
+    solution_id: int,
+    match_set_id: int,
     reference_code: str,
     test_in: str,
-    test_out: str
+    test_out: str,
+    limits: Optional[dict] = None,
+    checker: Optional[dict] = None,
+    language: str = LANGUAGE_CPP
 ) -> tuple[bool, str]:
     """
     Validate an 'incorrect' vote by running the proof test on both solutions.
@@ -481,51 +516,48 @@ def _validate_incorrect_vote(
     - The test PASSES on the reference solution
     
     This proves the student's code has a bug that the reference solution doesn't have.
+    Outputs are compared with the checker of the match setting (see checkers.py).
+    The reference output is looked up in the reference_outputs store, so the
+    reference solution only runs on inputs it has never seen.
     """
-    # Compile and run test on student solution
-    student_exe, student_compile_error = compile_cpp(student_code)
+    # Compile and run test on student solution (reusing the executable kept by phase one)
+    student_judged = judge_code(
+        student_code,
+        [test_in],
+        solution_id=solution_id,
+        limits=limits,
+        expected_outputs=[test_out] if supports_streaming(checker) else None,
+        language=language
+    )
     student_actual_output = ""
     
-    if student_exe is None:
+    if student_judged["compile_error"] is not None:
         # Student code doesn't compile - test fails on student code
         student_test_passes = False
-        student_actual_output = f"Compilation Error: {student_compile_error}"
+        student_actual_output = f"Compilation Error: {student_judged['compile_error']}"
     else:
-        try:
-            student_result = run_cpp_executable(student_exe, test_in)
-            student_output = (student_result.get("stdout") or "").strip()
-            student_actual_output = student_output
-            expected_output = test_out.strip()
-            
-            if student_result["status"] != "success":
-                student_test_passes = False
-                student_actual_output = student_result.get("stderr") or "Runtime Error"
-            else:
-                student_test_passes = (student_output == expected_output)
-        finally:
-            if os.path.exists(student_exe):
-                try:
-                    os.remove(student_exe)
-                except:
-                    pass
-
-    # Compile and run test on reference solution
-    ref_exe, ref_compile_error = compile_cpp(reference_code)
-    if ref_exe is None:
+        student_result = student_judged["results"][0]
+        student_output = (student_result.get("stdout") or "").strip()
+        student_actual_output = student_output
+        
+        if student_result["status"] not in ANSWER_STATUSES:
+            student_test_passes = False
+            student_actual_output = student_result.get("stderr") or "Runtime Error"
+        elif student_result["status"] == "wrong_answer":
+            student_test_passes = False
+        else:
+            student_test_passes, _ = check_output(checker, test_in, test_out, student_result.get("stdout") or "")
+
+    # Result of the reference solution on the test (stored or run once)
+    ref_result = get_reference_result(match_set_id, reference_code, test_in, limits, language)
+    if ref_result is None:
         # Reference code doesn't compile - something is wrong with reference
         return False, ""
     
-    try:
-        ref_result = run_cpp_executable(ref_exe, test_in)
-        ref_output = (ref_result.get("stdout") or "").strip()
-        expected_output = test_out.strip()
-        ref_test_passes = (ref_result["status"] == "success" and ref_output == expected_output)
-    finally:
-        if os.path.exists(ref_exe):
-            try:
-                os.remove(ref_exe)
-            except:
-                pass
+    ref_test_passes = (
+        ref_result["status"] == "success"
+        and check_output(checker, test_in, test_out, ref_result.get("stdout") or "")[0]
+    )
 
     is_valid = (not student_test_passes) and ref_test_passes
     return is_valid, student_actual_output
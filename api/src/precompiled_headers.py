@@ -0,0 +1,201 @@
+"""
+Precompiled Headers
+
+On-demand cache of precompiled standard headers (GCC .gch files).
+
+Most submissions start with the same few `#include <...>` lines. When the leading
+includes of a source file are all in COMPILE_PCH_HEADERS, the compilation can use
+a precompiled header ("bundle") holding exactly those includes, in the same order,
+passed with `-include`: since they come before any other code, the result is the
+same as parsing them from the source, without the parsing cost.
+
+Bundles are keyed on the header list, the compiler flags and the compiler version.
+The first compilation needing a bundle schedules its build in the background and
+compiles normally; later compilations use it. At most COMPILE_PCH_MAX_BUNDLES
+bundles are kept (least recently used ones are removed first). If GCC ever finds
+a bundle unusable it silently falls back to the plain header.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from compile_cache import COMPILE_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+COMPILE_PCH_ENABLED = os.getenv("COMPILE_PCH_ENABLED", "true").lower() == "true"
+COMPILE_PCH_HEADERS = [
+    header.strip() for header in os.getenv(
+        "COMPILE_PCH_HEADERS",
+        "bits/stdc++.h,iostream,vector,string,algorithm,cmath,map,set,"
+        "unordered_map,unordered_set,queue,stack,deque,utility,numeric,climits,iomanip,sstream"
+    ).split(",")
+    if header.strip()
+]
+COMPILE_PCH_MAX_BUNDLES = int(os.getenv("COMPILE_PCH_MAX_BUNDLES", "8"))
+COMPILE_PCH_DIR = os.path.join(COMPILE_CACHE_DIR, "pch")
+
+PCH_HEADER_NAME = "judge_pch.h"
+
+_INCLUDE_RE = re.compile(r"^\s*#\s*include\s*<([^>]+)>\s*(//.*)?$")
+
+
+def leading_includes(code: str) -> List[str]:
+    """
+    Return the standard headers included at the very top of a source file.
+
+    Only `#include <...>` lines found before any other code (blank lines and
+    comments are skipped) are returned, stopping at the first header that is not
+    in COMPILE_PCH_HEADERS.
+    """
+    headers = []
+    in_block_comment = False
+    for line in code.splitlines():
+        stripped = line.strip()
+        if in_block_comment:
+            if "*/" in stripped:
+                in_block_comment = False
+                if stripped.split("*/", 1)[1].strip():
+                    break
+            continue
+        if not stripped or stripped.startswith("//"):
+            continue
+        if stripped.startswith("/*"):
+            if "*/" not in stripped:
+                in_block_comment = True
+                continue
+            if stripped.split("*/", 1)[1].strip():
+                break
+            continue
+
+        match = _INCLUDE_RE.match(stripped)
+        if not match or match.group(1).strip() not in COMPILE_PCH_HEADERS:
+            break
+        header = match.group(1).strip()
+        if header not in headers:
+            headers.append(header)
+    return headers
+
+
+class PrecompiledHeaderCache:
+    """
+    Builds and hands out precompiled header bundles.
+
+    Attributes:
+        root: Directory holding one sub-directory per bundle.
+        max_bundles: Maximum number of bundles kept on disk.
+    """
+
+    def __init__(self, root: str, max_bundles: int):
+        self.root = root
+        self.max_bundles = max_bundles
+        self._lock = threading.Lock()
+        self._building = set()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pch")
+
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(headers: List[str], flags: List[str], compiler_version: str) -> str:
+        digest = hashlib.sha256()
+        for part in (compiler_version, "\0".join(flags), "\0".join(headers)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0\0")
+        return digest.hexdigest()
+
+    def get_header(self, headers: List[str], compiler: str, flags: List[str], compiler_version: str) -> Optional[str]:
+        """
+        Look up the bundle for a header list, scheduling its build if missing.
+
+        Args:
+            headers: Headers of the bundle, in include order.
+            compiler: Compiler executable.
+            flags: Compiler flags of the compilation (the bundle must use the same).
+            compiler_version: Version string of the compiler.
+
+        Returns:
+            Optional[str]: Path to pass with `-include`, or None if the bundle is not ready.
+        """
+        if not headers:
+            return None
+
+        key = self.make_key(headers, flags, compiler_version)
+        bundle_dir = os.path.join(self.root, key)
+        header_path = os.path.join(bundle_dir, PCH_HEADER_NAME)
+
+        if os.path.exists(header_path + ".gch"):
+            # Refresh recency for LRU eviction
+            try:
+                os.utime(bundle_dir)
+            except FileNotFoundError:
+                return None
+            return header_path
+
+        with self._lock:
+            if key not in self._building:
+                self._building.add(key)
+                self._builder.submit(self._build, key, headers, compiler, flags)
+        return None
+
+    def _build(self, key: str, headers: List[str], compiler: str, flags: List[str]) -> None:
+        """Build a bundle in a scratch directory, then move it into place."""
+        bundle_dir = os.path.join(self.root, key)
+        build_dir = tempfile.mkdtemp(prefix=f".{key[:16]}-{uuid.uuid4().hex}-", dir=self.root)
+        try:
+            header_path = os.path.join(build_dir, PCH_HEADER_NAME)
+            with open(header_path, "w") as header_file:
+                header_file.write("".join(f"#include <{header}>\n" for header in headers))
+
+            result = subprocess.run(
+                [compiler, *flags, "-x", "c++-header", header_path, "-o", header_path + ".gch"],
+                capture_output=True,
+                text=True,
+                timeout=120
+            )
+            if result.returncode != 0:
+                logger.warning(f"Could not build precompiled header for {headers}: {result.stderr}")
+                return
+
+            try:
+                os.rename(build_dir, bundle_dir)
+            except OSError:
+                # Already built by another process
+                return
+            logger.info(f"Built precompiled header for {headers}")
+            self._evict()
+        except Exception as e:
+            logger.warning(f"Could not build precompiled header for {headers}: {e}")
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            with self._lock:
+                self._building.discard(key)
+
+    def _evict(self) -> None:
+        """Remove least recently used bundles beyond max_bundles."""
+        bundles = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and not entry.name.startswith("."):
+                try:
+                    bundles.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+
+        bundles.sort(reverse=True)
+        for _, path in bundles[self.max_bundles:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+precompiled_headers = PrecompiledHeaderCache(COMPILE_PCH_DIR, COMPILE_PCH_MAX_BUNDLES)
@@ -0,0 +1,135 @@
+"""
+Reference Outputs
+
+Persistent store of what the reference solution of a match setting prints for a
+given input, keyed on (match_set_id, reference source hash, input hash).
+
+Phase two validates every 'incorrect' vote by running the proof test on the
+reference solution; reviewers often submit the same proof inputs, so the reference
+is run once per distinct input and later votes are validated by lookup (only the
+reviewed student's code is run).
+
+Entries of a match setting are removed when its reference solution, its language
+or its run limits are edited (see match_settings_api.update_match_setting), and with the
+match setting itself (ON DELETE CASCADE). Only deterministic outcomes of the batch
+driver are stored (see run_memo.is_memoizable()).
+"""
+
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from code_runner import LANGUAGE_CPP
+from judge_tasks import judge_code
+from models import ReferenceOutput
+from run_memo import hash_input, is_memoizable
+
+logger = logging.getLogger(__name__)
+
+
+def hash_reference(reference_code: str) -> str:
+    """sha256 of a reference solution."""
+    return hashlib.sha256(reference_code.encode("utf-8")).hexdigest()
+
+
+def get_reference_result(
+    match_set_id: int,
+    reference_code: str,
+    input_str: str,
+    limits: Optional[Dict] = None,
+    language: str = LANGUAGE_CPP
+) -> Optional[Dict]:
+    """
+    Result of the reference solution of a match setting on an input, running it
+    only if it is not stored yet.
+
+    Args:
+        match_set_id: ID of the match setting.
+        reference_code: Current reference solution of the match setting.
+        input_str: Input to provide via stdin.
+        limits: Run limits of the match setting (judge_tasks.get_match_limits()).
+        language: Language of the match setting (judge_tasks.get_match_language()).
+
+    Returns:
+        Optional[Dict]: run_executable()-shaped result, or None if the
+            reference solution does not compile.
+    """
+    reference_hash = hash_reference(reference_code)
+    input_hash = hash_input(input_str)
+
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(ReferenceOutput)
+            .filter(
+                ReferenceOutput.match_set_id == match_set_id,
+                ReferenceOutput.reference_hash == reference_hash,
+                ReferenceOutput.input_hash == input_hash
+            )
+            .first()
+        )
+        if row:
+            return {
+                "stdout": row.stdout,
+                "stderr": row.stderr,
+                "exit_code": row.exit_code,
+                "status": row.status,
+            }
+    except Exception as e:
+        logger.warning(f"Could not read reference outputs: {e}")
+    finally:
+        db.close()
+
+    judged = judge_code(reference_code, [input_str], limits=limits, language=language)
+    if judged["compile_error"] is not None:
+        return None
+
+    result = judged["results"][0]
+    if is_memoizable(result):
+        _store(match_set_id, reference_hash, input_hash, result)
+    return result
+
+
+def _store(match_set_id: int, reference_hash: str, input_hash: str, result: Dict) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            insert(ReferenceOutput)
+            .values(
+                match_set_id=match_set_id,
+                reference_hash=reference_hash,
+                input_hash=input_hash,
+                status=result["status"],
+                exit_code=result["exit_code"],
+                stdout=result["stdout"],
+                stderr=result["stderr"],
+                created_at=datetime.now(timezone.utc)
+            )
+            .on_conflict_do_nothing(constraint="uq_reference_outputs_setting_reference_input")
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not store reference output: {e}")
+    finally:
+        db.close()
+
+
+def invalidate(db: Session, match_set_id: int) -> None:
+    """
+    Remove the stored outputs of a match setting, in the caller's transaction.
+
+    Args:
+        db: Database session (committed by the caller).
+        match_set_id: ID of the match setting.
+    """
+    (
+        db.query(ReferenceOutput)
+        .filter(ReferenceOutput.match_set_id == match_set_id)
+        .delete(synchronize_session=False)
+    )
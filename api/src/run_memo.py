@@ -0,0 +1,173 @@
+"""
+Run Memo
+
+Database-backed memo of test runs, keyed on (memo key, input hash).
+
+A build key (code_runner.get_build_key()) identifies an executable: same code,
+compile flags and compiler. The memo key (make_key()) adds the run limits. Running
+the executable again under the same limits on the same input gives the same
+result, so judge_tasks.compile_and_run() only runs the (build, input) pairs it has
+never seen: resubmitting identical code, or adding one student test, runs only the
+new pairs, and nothing is compiled when every pair is known.
+
+Only deterministic outcomes are stored (success, runtime_error, memory_limit and
+output_limit): timeouts and sandbox errors depend on the load of the machine and
+are always re-run. So are the results of code_runner.run_executable() (no batch
+driver, or its per-test fallback): their exit status is nsjail's, which cannot be
+told apart from a sandbox setup failure; only the batch driver reports the exit
+status of the program itself, with its measured CPU time (see is_memoizable()).
+"""
+
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from database import SessionLocal
+from models import JudgeRunMemo
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+JUDGE_MEMO_ENABLED = os.getenv("JUDGE_MEMO_ENABLED", "true").lower() == "true"
+JUDGE_MEMO_RETENTION_HOURS = int(os.getenv("JUDGE_MEMO_RETENTION_HOURS", "168"))
+JUDGE_MEMO_MAX_OUTPUT_BYTES = int(os.getenv("JUDGE_MEMO_MAX_OUTPUT_BYTES", "65536"))
+
+MEMOIZED_STATUSES = ("success", "runtime_error", "memory_limit", "output_limit")
+
+_PURGE_INTERVAL_SECONDS = 3600
+_last_purge = float("-inf")
+
+
+def hash_input(input_str: str) -> str:
+    """sha256 of a test input."""
+    return hashlib.sha256(input_str.encode("utf-8")).hexdigest()
+
+
+def is_memoizable(result: Dict) -> bool:
+    """
+    Tell whether a run result is deterministic and comes from the batch driver.
+
+    Only the driver measures the CPU time of a test (code_runner.run_executable()
+    leaves cpu_time_ms unset), from the rusage of the program it waited for.
+    """
+    return result["status"] in MEMOIZED_STATUSES and result.get("cpu_time_ms") is not None
+
+
+def make_key(build_key: str, limits: Dict) -> str:
+    """Memo key of a build run under the given limits (code_runner.get_run_limits())."""
+    digest = hashlib.sha256(build_key.encode("utf-8"))
+    for name in sorted(limits):
+        digest.update(f"\0{name}={limits[name]}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def lookup(memo_key: str, input_hashes: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Fetch the memoized results of a build.
+
+    Args:
+        memo_key: Key of the build and limits, from make_key().
+        input_hashes: Hashes of the inputs to look up.
+
+    Returns:
+        Dict[str, Dict]: run_executable()-shaped results, by input hash.
+    """
+    input_hashes = list(set(input_hashes))
+    if not input_hashes:
+        return {}
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(JudgeRunMemo)
+            .filter(
+                JudgeRunMemo.build_key == memo_key,
+                JudgeRunMemo.input_hash.in_(input_hashes)
+            )
+            .all()
+        )
+        return {
+            row.input_hash: {
+                "stdout": row.stdout,
+                "stderr": row.stderr,
+                "exit_code": row.exit_code,
+                "status": row.status,
+                "wall_time_ms": row.wall_time_ms,
+                "cpu_time_ms": row.cpu_time_ms,
+                "peak_memory_kb": row.peak_memory_kb,
+                "output_bytes": row.output_bytes,
+            }
+            for row in rows
+        }
+    except Exception as e:
+        logger.warning(f"Could not read run memo: {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def store(memo_key: str, results: List[Tuple[str, Dict]]) -> None:
+    """
+    Memoize the deterministic results of a build (see is_memoizable()).
+
+    Args:
+        memo_key: Key of the build and limits, from make_key().
+        results: (input hash, result) pairs.
+    """
+    rows = {}
+    for input_hash, result in results:
+        if not is_memoizable(result):
+            continue
+        if len(result["stdout"]) + len(result["stderr"]) > JUDGE_MEMO_MAX_OUTPUT_BYTES:
+            continue
+        rows[input_hash] = {
+            "build_key": memo_key,
+            "input_hash": input_hash,
+            "status": result["status"],
+            "exit_code": result["exit_code"],
+            "stdout": result["stdout"],
+            "stderr": result["stderr"],
+            "wall_time_ms": result.get("wall_time_ms"),
+            "cpu_time_ms": result.get("cpu_time_ms"),
+            "peak_memory_kb": result.get("peak_memory_kb"),
+            "output_bytes": result.get("output_bytes"),
+            "created_at": datetime.now(timezone.utc),
+        }
+    if not rows:
+        return
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            insert(JudgeRunMemo)
+            .values(list(rows.values()))
+            .on_conflict_do_nothing(constraint="uq_judge_run_memo_build_input")
+        )
+        db.commit()
+        _purge_if_due(db)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not store run memo: {e}")
+    finally:
+        db.close()
+
+
+def _purge_if_due(db) -> None:
+    """Delete entries older than JUDGE_MEMO_RETENTION_HOURS, at most once an hour per process."""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < _PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=JUDGE_MEMO_RETENTION_HOURS)
+    db.query(JudgeRunMemo).filter(JudgeRunMemo.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
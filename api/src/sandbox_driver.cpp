@@ -0,0 +1,478 @@
+// Sandbox batch driver
+//
+// Runs a program once per test case inside a single nsjail sandbox, so the cost
+// of setting up namespaces and mounts is paid once per submission instead of
+// once per test. Built and used by code_runner.run_batch() and code_runner.iter_tests().
+//
+// Usage: sandbox_driver [limits] -- <program> [args...]
+//
+// Limits, per case (0 = no limit):
+//   --wall-ms <ms>         wall-clock time (default 2000)
+//   --cpu-ms <ms>          CPU time, user + system (RLIMIT_CPU, then checked to the ms)
+//   --memory-kb <kb>       address space (RLIMIT_AS and RLIMIT_STACK)
+//   --output-bytes <n>     stdout + stderr; the case is killed as soon as it writes more
+//
+// Harness mode (built with -DJUDGE_HARNESS and linked with the student program,
+// whose main() is renamed and exposed as judge_harness_entry()):
+//   program --harness [limits]  runs the test cases, forking without exec
+//   program [args...]           behaves exactly as the student program
+//
+// The driver only ever holds the input of the case it runs: the caller sends the
+// next case once the previous one has ended, and expected outputs never enter the
+// sandbox (the caller compares the output as it is streamed, and stops the case
+// when it can no longer match). In harness mode the student code runs in a fork
+// of the driver, so whatever the driver holds, the student code can read.
+//
+// Input (stdin), one command at a time:
+//   case <input_len>\n<input bytes>   run a case; sent once the previous case has ended
+//   stop\n                            kill the running case (status 'stopped');
+//                                     ignored when no case is running
+//   end of input                      exit
+//
+// Output (stdout), for every case:
+//   out <len>\n<bytes> and err <len>\n<bytes>, as the case writes its stdout and stderr
+//   end <status> <exit_code> <wall_ms> <cpu_ms> <peak_rss_kb>\n once it has ended
+//   status is one of: success, runtime_error, timeout (wall or CPU time),
+//   memory_limit, output_limit, stopped (by a stop command), or system_error
+//   when the driver could not start the case (pipe, fork or exec failure)
+//   cpu_ms (user + system) and peak_rss_kb come from the rusage of the case process
+//
+// Every case runs in its own process group with fresh pipes and is killed when it
+// exceeds its wall-clock limit. As PID 1 of the sandbox, the driver then kills every
+// process the case left behind (e.g. detached with setsid), reaps them and empties
+// /tmp and /sandbox (except the mounted program), so that a case cannot keep
+// running into the next ones or leave files for them. Other state shared by the
+// sandbox (System V IPC objects, /dev) is not reset.
+
+#include <algorithm>
+#include <cerrno>
+#include <csignal>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <ctime>
+#include <string>
+#include <vector>
+
+#include <dirent.h>
+#include <fcntl.h>
+#include <ftw.h>
+#include <poll.h>
+#include <sys/resource.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#ifdef JUDGE_HARNESS
+extern "C" int judge_harness_entry(int argc, char** argv);
+#endif
+
+namespace {
+
+struct CaseResult {
+    std::string status;
+    int exit_code = 0;
+    long long wall_ms = 0;
+    long long cpu_ms = 0;
+    long long peak_rss_kb = 0;
+    std::string err;
+};
+
+long long now_ms() {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return static_cast<long long>(ts.tv_sec) * 1000 + ts.tv_nsec / 1000000;
+}
+
+bool write_all(int fd, const char* data, size_t len) {
+    while (len > 0) {
+        ssize_t n = write(fd, data, len);
+        if (n < 0) {
+            if (errno == EINTR) continue;
+            return false;
+        }
+        data += n;
+        len -= static_cast<size_t>(n);
+    }
+    return true;
+}
+
+// Reads exactly len bytes: nothing beyond the current command is read from stdin
+bool read_exact(int fd, char* data, size_t len) {
+    while (len > 0) {
+        ssize_t n = read(fd, data, len);
+        if (n < 0) {
+            if (errno == EINTR) continue;
+            return false;
+        }
+        if (n == 0) return false;
+        data += n;
+        len -= static_cast<size_t>(n);
+    }
+    return true;
+}
+
+// Reads a command line, one byte at a time for the same reason; false at end of input
+bool read_line(int fd, std::string& line) {
+    line.clear();
+    char c;
+    while (line.size() < 64) {
+        if (!read_exact(fd, &c, 1)) return false;
+        if (c == '\n') return true;
+        line.push_back(c);
+    }
+    return false;
+}
+
+bool write_frame(const char* kind, const char* data, size_t len) {
+    std::string header = std::string(kind) + " " + std::to_string(len) + "\n";
+    return write_all(STDOUT_FILENO, header.data(), header.size()) && write_all(STDOUT_FILENO, data, len);
+}
+
+void set_nonblocking(int fd) {
+    fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | O_NONBLOCK);
+}
+
+struct Limits {
+    long long wall_ms = 2000;
+    long long cpu_ms = 0;
+    long long memory_kb = 0;
+    long long output_bytes = 0;
+};
+
+void apply_rlimits(const Limits& limits) {
+    if (limits.cpu_ms > 0) {
+        // Whole seconds: the exact limit is checked from the rusage once the case ends
+        rlim_t seconds = static_cast<rlim_t>((limits.cpu_ms + 999) / 1000);
+        struct rlimit cpu = {seconds, seconds + 1};
+        setrlimit(RLIMIT_CPU, &cpu);
+    }
+    if (limits.memory_kb > 0) {
+        rlim_t bytes = static_cast<rlim_t>(limits.memory_kb) * 1024;
+        struct rlimit memory = {bytes, bytes};
+        setrlimit(RLIMIT_AS, &memory);
+        setrlimit(RLIMIT_STACK, &memory);
+    }
+}
+
+// A failed allocation usually ends in std::bad_alloc, or in a crash close to the limit
+bool looks_out_of_memory(const CaseResult& result, const Limits& limits) {
+    if (limits.memory_kb <= 0) return false;
+    if (result.err.find("bad_alloc") != std::string::npos) return true;
+    return result.peak_rss_kb * 10 >= limits.memory_kb * 9;
+}
+
+int remove_entry(const char* path, const struct stat*, int, struct FTW* ftw) {
+    // Mount points (the program and driver mounted into /sandbox) fail with EBUSY and stay
+    if (ftw->level > 0) remove(path);
+    return 0;
+}
+
+// Leaves the sandbox as the next case expects it. Only as PID 1 of the sandbox:
+// run anywhere else, kill(-1) and emptying /tmp would hit the host.
+void reset_sandbox() {
+    if (getpid() != 1) {
+        while (waitpid(-1, nullptr, WNOHANG) > 0) {
+        }
+        return;
+    }
+    kill(-1, SIGKILL);
+    while (waitpid(-1, nullptr, 0) > 0 || errno == EINTR) {
+    }
+    for (const char* dir : {"/tmp", "/sandbox"}) {
+        nftw(dir, remove_entry, 16, FTW_DEPTH | FTW_PHYS | FTW_MOUNT);
+    }
+}
+
+// Runs one case, streaming its output to stdout as out/err frames. parent_gone is
+// set when stdin or stdout of the driver closed: the caller is not listening any more.
+CaseResult system_error(const char* message) {
+    CaseResult result;
+    result.status = "system_error";
+    result.exit_code = -1;
+    result.err = message;
+    write_frame("err", result.err.data(), result.err.size());
+    return result;
+}
+
+CaseResult run_case(char** argv, std::string& input, const Limits& limits, bool& parent_gone) {
+    CaseResult result;
+    // exec_pipe carries the errno of a failed execv; it closes on a successful one
+    int in_pipe[2], out_pipe[2], err_pipe[2], exec_pipe[2];
+    if (pipe(in_pipe) != 0 || pipe(out_pipe) != 0 || pipe(err_pipe) != 0 ||
+        pipe2(exec_pipe, O_CLOEXEC) != 0) {
+        return system_error("Sandbox driver: cannot create pipes");
+    }
+
+    pid_t pid = fork();
+    if (pid < 0) {
+        close(in_pipe[0]); close(in_pipe[1]);
+        close(out_pipe[0]); close(out_pipe[1]);
+        close(err_pipe[0]); close(err_pipe[1]);
+        close(exec_pipe[0]); close(exec_pipe[1]);
+        return system_error("Sandbox driver: cannot fork");
+    }
+
+    if (pid == 0) {
+        setpgid(0, 0);
+        signal(SIGPIPE, SIG_DFL);
+        dup2(in_pipe[0], STDIN_FILENO);
+        dup2(out_pipe[1], STDOUT_FILENO);
+        dup2(err_pipe[1], STDERR_FILENO);
+        close(in_pipe[0]); close(in_pipe[1]);
+        close(out_pipe[0]); close(out_pipe[1]);
+        close(err_pipe[0]); close(err_pipe[1]);
+        close(exec_pipe[0]);
+        apply_rlimits(limits);
+#ifdef JUDGE_HARNESS
+        close(exec_pipe[1]);
+        // The program reads its input from stdin: leave no copy of it in this process
+        explicit_bzero(&input[0], input.size());
+        // The program is linked in: run it in this fresh process, exit() flushes its streams
+        std::exit(judge_harness_entry(1, argv));
+#else
+        execv(argv[0], argv);
+        int exec_errno = errno;
+        ssize_t ignored = write(exec_pipe[1], &exec_errno, sizeof(exec_errno));
+        (void)ignored;
+        _exit(127);
+#endif
+    }
+
+    setpgid(pid, pid);
+    close(in_pipe[0]);
+    close(out_pipe[1]);
+    close(err_pipe[1]);
+    close(exec_pipe[1]);
+
+    // Blocks until execv has succeeded (EOF) or failed: a failed one is not the
+    // program's doing, and must not be reported as its exit status
+    int exec_errno = 0;
+    ssize_t exec_read;
+    do {
+        exec_read = read(exec_pipe[0], &exec_errno, sizeof(exec_errno));
+    } while (exec_read < 0 && errno == EINTR);
+    close(exec_pipe[0]);
+    if (exec_read > 0) {
+        waitpid(pid, nullptr, 0);
+        close(in_pipe[1]);
+        close(out_pipe[0]);
+        close(err_pipe[0]);
+        return system_error("Sandbox driver: cannot start the program");
+    }
+
+    int in_fd = in_pipe[1], out_fd = out_pipe[0], err_fd = err_pipe[0];
+    set_nonblocking(in_fd);
+    set_nonblocking(out_fd);
+    set_nonblocking(err_fd);
+
+    size_t written = 0;
+    if (input.empty()) {
+        close(in_fd);
+        in_fd = -1;
+    }
+
+    const long long started = now_ms();
+    const long long deadline = started + limits.wall_ms;
+    bool timed_out = false;
+    bool output_exceeded = false;
+    bool stopped = false;
+    long long output_bytes = 0;
+    char buf[65536];
+    std::string command;
+
+    while ((out_fd >= 0 || err_fd >= 0) && !output_exceeded && !stopped && !parent_gone) {
+        long long remaining = deadline - now_ms();
+        if (remaining <= 0) {
+            timed_out = true;
+            break;
+        }
+
+        struct pollfd fds[4];
+        int nfds = 0;
+        fds[nfds++] = {STDIN_FILENO, POLLIN, 0};
+        if (in_fd >= 0) fds[nfds++] = {in_fd, POLLOUT, 0};
+        if (out_fd >= 0) fds[nfds++] = {out_fd, POLLIN, 0};
+        if (err_fd >= 0) fds[nfds++] = {err_fd, POLLIN, 0};
+
+        int ready = poll(fds, nfds, static_cast<int>(remaining));
+        if (ready < 0) {
+            if (errno == EINTR) continue;
+            break;
+        }
+
+        for (int i = 0; i < nfds; ++i) {
+            if (!fds[i].revents) continue;
+            int fd = fds[i].fd;
+            if (fd == STDIN_FILENO) {
+                // Only a stop command can come while a case runs
+                if (read_line(STDIN_FILENO, command) && command == "stop") stopped = true;
+                else parent_gone = true;
+            } else if (fd == in_fd) {
+                ssize_t n = write(in_fd, input.data() + written, input.size() - written);
+                if (n > 0) written += static_cast<size_t>(n);
+                if (n < 0 && errno != EAGAIN && errno != EINTR) written = input.size();
+                if (written >= input.size()) {
+                    close(in_fd);
+                    in_fd = -1;
+                }
+            } else {
+                ssize_t n = read(fd, buf, sizeof(buf));
+                if (n > 0) {
+                    size_t len = static_cast<size_t>(n);
+                    if (limits.output_bytes > 0 && output_bytes + n > limits.output_bytes) {
+                        // Forward what fits in the limit
+                        len = static_cast<size_t>(limits.output_bytes - output_bytes);
+                        output_exceeded = true;
+                    }
+                    output_bytes += static_cast<long long>(len);
+                    if (fd == err_fd) result.err.append(buf, len);
+                    if (len > 0 && !write_frame(fd == out_fd ? "out" : "err", buf, len)) parent_gone = true;
+                } else if (n == 0 || (errno != EAGAIN && errno != EINTR)) {
+                    close(fd);
+                    if (fd == out_fd) out_fd = -1; else err_fd = -1;
+                }
+            }
+        }
+    }
+
+    int status = 0;
+    struct rusage usage;
+    std::memset(&usage, 0, sizeof(usage));
+    if (!timed_out && (output_exceeded || stopped || parent_gone)) {
+        kill(-pid, SIGKILL);
+        kill(pid, SIGKILL);
+        wait4(pid, &status, 0, &usage);
+    } else if (!timed_out) {
+        // Output is closed; give the process the rest of its time to exit
+        for (;;) {
+            pid_t done = wait4(pid, &status, WNOHANG, &usage);
+            if (done == pid) break;
+            if (now_ms() >= deadline) {
+                timed_out = true;
+                break;
+            }
+            usleep(1000);
+        }
+    }
+    if (timed_out) {
+        kill(-pid, SIGKILL);
+        kill(pid, SIGKILL);
+        wait4(pid, &status, 0, &usage);
+    }
+
+    if (in_fd >= 0) close(in_fd);
+    if (out_fd >= 0) close(out_fd);
+    if (err_fd >= 0) close(err_fd);
+
+    result.wall_ms = now_ms() - started;
+    result.cpu_ms = (static_cast<long long>(usage.ru_utime.tv_sec) + usage.ru_stime.tv_sec) * 1000 +
+                    (usage.ru_utime.tv_usec + usage.ru_stime.tv_usec) / 1000;
+    result.peak_rss_kb = usage.ru_maxrss;
+
+    if (WIFEXITED(status)) {
+        result.exit_code = WEXITSTATUS(status);
+    } else if (WIFSIGNALED(status)) {
+        result.exit_code = 128 + WTERMSIG(status);
+    }
+
+    const bool cpu_exceeded = (limits.cpu_ms > 0 && result.cpu_ms > limits.cpu_ms) ||
+                              (WIFSIGNALED(status) && WTERMSIG(status) == SIGXCPU);
+
+    if (output_exceeded) {
+        result.status = "output_limit";
+    } else if (stopped) {
+        result.status = "stopped";
+    } else if (timed_out) {
+        result.status = "timeout";
+        if (result.err.empty()) {
+            result.err = "Execution timed out";
+            write_frame("err", result.err.data(), result.err.size());
+        }
+    } else if (cpu_exceeded) {
+        result.status = "timeout";
+        if (result.err.empty()) {
+            result.err = "CPU time limit exceeded";
+            write_frame("err", result.err.data(), result.err.size());
+        }
+    } else if (WIFEXITED(status) && result.exit_code == 0) {
+        result.status = "success";
+    } else if (looks_out_of_memory(result, limits)) {
+        result.status = "memory_limit";
+    } else {
+        result.status = "runtime_error";
+    }
+    return result;
+}
+
+}  // namespace
+
+int main(int argc, char** argv) {
+#ifdef JUDGE_HARNESS
+    if (argc < 2 || std::strcmp(argv[1], "--harness") != 0) {
+        return judge_harness_entry(argc, argv);
+    }
+#endif
+
+    Limits limits;
+    int program_index = -1;
+    for (int i = 1; i < argc; ++i) {
+        if (std::strcmp(argv[i], "--wall-ms") == 0 && i + 1 < argc) {
+            limits.wall_ms = std::atoll(argv[++i]);
+        } else if (std::strcmp(argv[i], "--cpu-ms") == 0 && i + 1 < argc) {
+            limits.cpu_ms = std::atoll(argv[++i]);
+        } else if (std::strcmp(argv[i], "--memory-kb") == 0 && i + 1 < argc) {
+            limits.memory_kb = std::atoll(argv[++i]);
+        } else if (std::strcmp(argv[i], "--output-bytes") == 0 && i + 1 < argc) {
+            limits.output_bytes = std::atoll(argv[++i]);
+        } else if (std::strcmp(argv[i], "--") == 0) {
+            program_index = i + 1;
+            break;
+        }
+    }
+#ifdef JUDGE_HARNESS
+    // The forked cases see the harness itself as argv[0]
+    (void)program_index;
+    char* program_argv[] = {argv[0], nullptr};
+    char** case_argv = program_argv;
+#else
+    if (program_index < 0 || program_index >= argc) {
+        std::fprintf(stderr, "usage: sandbox_driver [limits] -- <program> [args...]\n");
+        return 2;
+    }
+    char** case_argv = argv + program_index;
+#endif
+
+    signal(SIGPIPE, SIG_IGN);
+
+    std::string command;
+    while (read_line(STDIN_FILENO, command)) {
+        // A stop command that came after its case had already ended
+        if (command == "stop") continue;
+        if (command.compare(0, 5, "case ") != 0) {
+            std::fprintf(stderr, "sandbox_driver: malformed input\n");
+            return 2;
+        }
+        long long input_len = std::atoll(command.c_str() + 5);
+        // Sized once and read in place: no stray copy of the input is left in the heap
+        std::string input(static_cast<size_t>(std::max(0LL, input_len)), '\0');
+        if (input_len < 0 || !read_exact(STDIN_FILENO, &input[0], input.size())) {
+            std::fprintf(stderr, "sandbox_driver: malformed input\n");
+            return 2;
+        }
+
+        bool parent_gone = false;
+        CaseResult result = run_case(case_argv, input, limits, parent_gone);
+        reset_sandbox();
+        // Cases forked later must not find this input in the driver's memory
+        explicit_bzero(&input[0], input.size());
+        if (parent_gone) return 1;
+
+        std::string end = "end " + result.status + " " + std::to_string(result.exit_code) + " " +
+                          std::to_string(result.wall_ms) + " " +
+                          std::to_string(result.cpu_ms) + " " +
+                          std::to_string(result.peak_rss_kb) + "\n";
+        if (!write_all(STDOUT_FILENO, end.data(), end.size())) return 1;
+    }
+    return 0;
+}
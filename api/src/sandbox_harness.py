@@ -0,0 +1,395 @@
+"""
+Python sandbox harness
+
+Runs a Python program once per test case inside a single nsjail sandbox, with
+the interpreter started only once: the program is compiled once and every case
+runs in a forked copy of the interpreter, so no case pays for interpreter startup
+or for importing the common standard modules. Used by code_runner for Python
+batches (see PythonDriver); it speaks the protocol of sandbox_driver.cpp:
+
+Usage: python3 sandbox_harness.py [limits] -- <program.py>
+
+Runs inside the sandbox with only the standard library: it must not import any
+module of the API. The student code runs in a fork of this process and can read
+everything it holds (frames, heap): the harness gets one test input at a time and
+never an expected output (see code_runner._stream_batch()), and zeroes each input
+once its case has ended.
+"""
+
+import builtins
+import os
+import resource
+import select
+import shutil
+import signal
+import sys
+import time
+import traceback
+
+# Warm start: modules imported here are already loaded in every case
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import math  # noqa: F401
+import re  # noqa: F401
+import string  # noqa: F401
+
+_READ_CHUNK_BYTES = 65536
+
+
+def read_exact(fd, length):
+    """
+    Reads exactly length bytes into a new bytearray: nothing beyond the current
+    command is read from stdin, and no other copy of the data is made.
+    """
+    data = bytearray(length)
+    view = memoryview(data)
+    while view:
+        count = os.readv(fd, [view])
+        if not count:
+            raise EOFError
+        view = view[count:]
+    return data
+
+
+def read_line(fd):
+    """Reads a command line, one byte at a time for the same reason; None at end of input."""
+    line = bytearray()
+    while len(line) < 64:
+        byte = os.read(fd, 1)
+        if not byte:
+            return None
+        if byte == b"\n":
+            return bytes(line)
+        line += byte
+    return None
+
+
+def write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def write_frame(kind, data):
+    write_all(1, f"{kind} {len(data)}\n".encode() + data)
+
+
+def apply_rlimits(limits):
+    if limits["cpu_ms"] > 0:
+        seconds = (limits["cpu_ms"] + 999) // 1000
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+    if limits["memory_kb"] > 0:
+        memory = limits["memory_kb"] * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_STACK, (memory, memory))
+
+
+def run_program(program):
+    """Body of a case process: runs the program like `python3 program.py` would."""
+    sys.stdin = open(0, "r", encoding="utf-8", errors="replace", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", closefd=False)
+    sys.argv = ["main.py"]
+
+    status = 0
+    try:
+        exec(program, {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            status = status or 1
+    return status
+
+
+def looks_out_of_memory(err, peak_rss_kb, limits):
+    if limits["memory_kb"] <= 0:
+        return False
+    return b"MemoryError" in err or peak_rss_kb * 10 >= limits["memory_kb"] * 9
+
+
+def run_case(program, input_data, limits):
+    """
+    Runs one case, streaming its output to stdout as out/err frames.
+
+    Returns:
+        tuple: (status, exit_code, wall_ms, cpu_ms, peak_rss_kb), or None when
+            stdin or stdout of the harness closed (the caller is not listening any more).
+    """
+    in_r, in_w = os.pipe()
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+            os.dup2(in_r, 0)
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            for fd in (in_r, in_w, out_r, out_w, err_r, err_w):
+                os.close(fd)
+            apply_rlimits(limits)
+            status = run_program(program)
+        finally:
+            os._exit(status & 0xFF)
+
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    os.close(in_r)
+    os.close(out_w)
+    os.close(err_w)
+    for fd in (in_w, out_r, err_r):
+        os.set_blocking(fd, False)
+
+    err = bytearray()
+    output_bytes = 0
+    input_view = memoryview(input_data)
+
+    written = 0
+    open_fds = {out_r, err_r}
+    if input_data:
+        open_fds.add(in_w)
+    else:
+        os.close(in_w)
+
+    started = time.monotonic()
+    deadline = started + limits["wall_ms"] / 1000
+    timed_out = output_exceeded = stopped = parent_gone = False
+
+    poller = select.poll()
+    poller.register(0, select.POLLIN)
+    for fd in open_fds:
+        poller.register(fd, select.POLLOUT if fd == in_w else select.POLLIN)
+
+    while (out_r in open_fds or err_r in open_fds) and not (output_exceeded or stopped or parent_gone):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        for fd, _ in poller.poll(remaining * 1000):
+            if fd == 0:
+                # Only a stop command can come while a case runs
+                if read_line(0) == b"stop":
+                    stopped = True
+                else:
+                    parent_gone = True
+                continue
+            if fd == in_w:
+                try:
+                    written += os.write(in_w, input_view[written:written + _READ_CHUNK_BYTES])
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    written = len(input_data)
+                if written >= len(input_data):
+                    poller.unregister(in_w)
+                    os.close(in_w)
+                    open_fds.discard(in_w)
+                continue
+
+            try:
+                data = os.read(fd, _READ_CHUNK_BYTES)
+            except BlockingIOError:
+                continue
+            if not data:
+                poller.unregister(fd)
+                os.close(fd)
+                open_fds.discard(fd)
+                continue
+            if limits["output_bytes"] > 0 and output_bytes + len(data) > limits["output_bytes"]:
+                # Forward what fits in the limit
+                data = data[:limits["output_bytes"] - output_bytes]
+                output_exceeded = True
+            output_bytes += len(data)
+            if fd == err_r:
+                err.extend(data)
+            if data:
+                try:
+                    write_frame("out" if fd == out_r else "err", data)
+                except OSError:
+                    parent_gone = True
+
+    status = 0
+    usage = None
+    if not timed_out and (output_exceeded or stopped or parent_gone):
+        _kill(pid)
+        _, status, usage = os.wait4(pid, 0)
+    elif not timed_out:
+        # Output is closed; give the process the rest of its time to exit
+        while True:
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done == pid:
+                break
+            if time.monotonic() >= deadline:
+                timed_out = True
+                break
+            time.sleep(0.001)
+    if timed_out:
+        _kill(pid)
+        _, status, usage = os.wait4(pid, 0)
+
+    for fd in open_fds:
+        os.close(fd)
+    input_view.release()
+
+    if parent_gone:
+        return None
+
+    wall_ms = int((time.monotonic() - started) * 1000)
+    cpu_ms = int((usage.ru_utime + usage.ru_stime) * 1000)
+    peak_rss_kb = usage.ru_maxrss
+
+    exit_code = 0
+    if os.WIFEXITED(status):
+        exit_code = os.WEXITSTATUS(status)
+    elif os.WIFSIGNALED(status):
+        exit_code = 128 + os.WTERMSIG(status)
+
+    cpu_exceeded = (limits["cpu_ms"] > 0 and cpu_ms > limits["cpu_ms"]) or (
+        os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU
+    )
+
+    if output_exceeded:
+        verdict = "output_limit"
+    elif stopped:
+        verdict = "stopped"
+    elif timed_out:
+        verdict = "timeout"
+        if not err:
+            write_frame("err", b"Execution timed out")
+    elif cpu_exceeded:
+        verdict = "timeout"
+        if not err:
+            write_frame("err", b"CPU time limit exceeded")
+    elif os.WIFEXITED(status) and exit_code == 0:
+        verdict = "success"
+    elif looks_out_of_memory(err, peak_rss_kb, limits):
+        verdict = "memory_limit"
+    else:
+        verdict = "runtime_error"
+
+    return verdict, exit_code, wall_ms, cpu_ms, peak_rss_kb
+
+
+def reset_sandbox():
+    """
+    Leaves the sandbox as the next case expects it (see sandbox_driver.cpp): kills
+    every process the case left behind, reaps them, and empties /tmp and /sandbox
+    (except the mounted program and harness). Only as PID 1 of the sandbox: run
+    anywhere else, kill(-1) and emptying /tmp would hit the host.
+    """
+    if os.getpid() != 1:
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0] > 0:
+                pass
+        except ChildProcessError:
+            pass
+        return
+    try:
+        os.kill(-1, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        while True:
+            os.waitpid(-1, 0)
+    except ChildProcessError:
+        pass
+    for directory in ("/tmp", "/sandbox"):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            # Mount points fail with EBUSY and stay
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def _kill(pid):
+    for target in (-pid, pid):
+        try:
+            os.kill(target, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def main(argv):
+    limits = {"wall_ms": 2000, "cpu_ms": 0, "memory_kb": 0, "output_bytes": 0}
+    options = {"--wall-ms": "wall_ms", "--cpu-ms": "cpu_ms", "--memory-kb": "memory_kb", "--output-bytes": "output_bytes"}
+    program_path = None
+
+    i = 0
+    while i < len(argv):
+        if argv[i] in options and i + 1 < len(argv):
+            limits[options[argv[i]]] = int(argv[i + 1])
+            i += 2
+            continue
+        if argv[i] == "--" and i + 1 < len(argv):
+            program_path = argv[i + 1]
+            break
+        i += 1
+
+    if program_path is None:
+        sys.stderr.write("usage: sandbox_harness.py [limits] -- <program.py>\n")
+        return 2
+
+    signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+
+    with open(program_path, "rb") as f:
+        program = compile(f.read(), "main.py", "exec")
+
+    while True:
+        command = read_line(0)
+        if command is None:
+            return 0
+        if command == b"stop":
+            # A stop command that came after its case had already ended
+            continue
+        try:
+            if not command.startswith(b"case "):
+                raise ValueError
+            input_data = read_exact(0, int(command[5:]))
+        except (ValueError, EOFError):
+            sys.stderr.write("sandbox_harness: malformed input\n")
+            return 2
+
+        result = run_case(program, input_data, limits)
+        reset_sandbox()
+        # Cases forked later must not find this input in the harness's memory
+        input_data[:] = bytes(len(input_data))
+        del input_data
+        if result is None:
+            return 1
+        try:
+            write_all(1, ("end %s %d %d %d %d\n" % result).encode())
+        except OSError:
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,207 @@
+"""
+Solution Artifacts
+
+On-disk store of the executables built for saved solutions, keyed on the
+solution id, its language and a hash of its code.
+
+Phase one keeps the executable of every solution it saves; phase-two vote
+validation (and any re-judge) passes the solution id to judge_tasks.judge_code()
+and runs that executable instead of compiling the code again. Unlike the compile
+cache, entries are not shared between solutions and are removed explicitly when
+their game session is deleted (game_session_api.delete_game_session); the store
+is still bounded by size and evicts the least recently used entries first.
+
+Harness executables (code_runner.compile_cpp_harness()) are stored as such and
+run in harness mode.
+
+Entries are plain files replaced atomically, so the store can live on a volume
+shared by the API and the judge workers; with JUDGE_REMOTE_ENABLED it must, as
+the workers build the executables (see judge_tasks.iter_judge_code()).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from compile_cache import COMPILE_CACHE_DIR, _link_or_copy
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SOLUTION_ARTIFACTS_ENABLED = os.getenv("SOLUTION_ARTIFACTS_ENABLED", "true").lower() == "true"
+SOLUTION_ARTIFACTS_DIR = os.getenv("SOLUTION_ARTIFACTS_DIR", os.path.join(COMPILE_CACHE_DIR, "solutions"))
+SOLUTION_ARTIFACTS_MAX_MB = int(os.getenv("SOLUTION_ARTIFACTS_MAX_MB", "1024"))
+
+_HARNESS_SUFFIX = ".harness.out"
+_PLAIN_SUFFIX = ".out"
+
+
+def hash_code(code: str) -> str:
+    """sha256 of a solution's code."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class SolutionArtifactStore:
+    """
+    Size-bounded store of solution executables.
+
+    Attributes:
+        root: Directory holding the store.
+        max_bytes: Maximum total size of the stored executables.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.checkout_dir = os.path.join(root, "checkout")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.checkout_dir, exist_ok=True)
+
+    def _object_path(self, solution_id: int, code: str, harness: bool, language: str) -> str:
+        suffix = _HARNESS_SUFFIX if harness else _PLAIN_SUFFIX
+        return os.path.join(self.objects_dir, f"{solution_id}-{language}-{hash_code(code)}{suffix}")
+
+    def keep(self, executable_path: str) -> Optional[str]:
+        """
+        Take a private link to a freshly built executable, to be stored with put()
+        once the solution is saved (or released with discard()).
+
+        Returns:
+            Optional[str]: Path of the link, or None if it could not be made.
+        """
+        kept_path = os.path.join(self.checkout_dir, f"kept-{uuid.uuid4().hex}.out")
+        try:
+            _link_or_copy(executable_path, kept_path)
+            return kept_path
+        except Exception as e:
+            logger.warning(f"Could not keep solution executable: {e}")
+            return None
+
+    def put(self, solution_id: int, code: str, executable_path: str, harness: bool, language: str = "cpp") -> None:
+        """
+        Store the executable of a solution, replacing the ones of its previous code.
+
+        The executable is moved into the store when it comes from keep(), linked otherwise.
+
+        Args:
+            solution_id: ID of the saved solution.
+            code: Code the executable was built from.
+            executable_path: Path to the executable.
+            harness: True for executables built by compile_cpp_harness().
+            language: Language of the code (key of code_runner.LANGUAGE_DRIVERS).
+        """
+        object_path = self._object_path(solution_id, code, harness, language)
+        tmp_path = os.path.join(self.objects_dir, f".{solution_id}-{uuid.uuid4().hex}.tmp")
+
+        try:
+            if os.path.dirname(executable_path) == self.checkout_dir:
+                os.replace(executable_path, tmp_path)
+            else:
+                _link_or_copy(executable_path, tmp_path)
+            os.replace(tmp_path, object_path)
+        except Exception as e:
+            logger.warning(f"Could not store executable of solution {solution_id}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            # Executables of the previous code of the solution are no longer needed
+            for entry in self._scan(prefix=f"{solution_id}-"):
+                if entry.path != object_path:
+                    self._remove(entry.path)
+            self._evict()
+
+    def checkout(self, solution_id: int, code: str, language: str = "cpp") -> Optional[Tuple[str, bool]]:
+        """
+        Look up the executable of a solution and hand out a private link to it.
+
+        Args:
+            solution_id: ID of the solution.
+            code: Current code of the solution.
+            language: Language the code is judged in.
+
+        Returns:
+            Optional[Tuple[str, bool]]: (caller-owned executable path, harness), or None on a miss.
+        """
+        for harness in (True, False):
+            object_path = self._object_path(solution_id, code, harness, language)
+            checkout_path = os.path.join(self.checkout_dir, f"{solution_id}-{uuid.uuid4().hex}.out")
+            try:
+                _link_or_copy(object_path, checkout_path)
+                # Refresh recency for LRU eviction
+                os.utime(object_path)
+                return checkout_path, harness
+            except FileNotFoundError:
+                continue
+        return None
+
+    def discard(self, executable_path: Optional[str]) -> None:
+        """Release a link taken with keep() that was not stored."""
+        if executable_path:
+            self._remove(executable_path)
+
+    def remove_solutions(self, solution_ids: Iterable[int]) -> int:
+        """
+        Remove the executables of the given solutions.
+
+        Returns:
+            int: Number of executables removed.
+        """
+        prefixes = tuple(f"{solution_id}-" for solution_id in solution_ids)
+        if not prefixes:
+            return 0
+
+        removed = 0
+        with self._lock:
+            for entry in self._scan(prefix=prefixes):
+                if self._remove(entry.path):
+                    removed += 1
+        return removed
+
+    def _scan(self, prefix=None) -> List[os.DirEntry]:
+        return [
+            entry for entry in os.scandir(self.objects_dir)
+            if entry.is_file()
+            and entry.name.endswith(_PLAIN_SUFFIX)
+            and (prefix is None or entry.name.startswith(prefix))
+        ]
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the store fits in max_bytes."""
+        entries = []
+        total_size = 0
+        for entry in self._scan():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            self._remove(path)
+            total_size -= size
+
+
+solution_artifacts = SolutionArtifactStore(SOLUTION_ARTIFACTS_DIR, SOLUTION_ARTIFACTS_MAX_MB * 1024 * 1024)
@@ -34,7 +34,7 @@ from models import (
     VoteType
 )
 
-from database import get_db
+from database import get_db, get_read_db
 
 # ============================================================================
 # Pydantic Response Models
@@ -53,6 +53,10 @@ class TestResultResponse(BaseModel):
     actual_output: str = Field(..., description="Actual output generated by the student's code")
     status: str = Field(..., description="Test status: 'Passed' or 'Failed'")
     comment: Optional[str] = Field(None, description="Reviewer comment (for proof tests from peer reviews)")
+    checker_mode: Optional[str] = Field(None, description="Checker that gave the verdict (null for older results)")
+    wall_time_ms: Optional[int] = Field(None, description="Wall-clock time of the run (ms)")
+    cpu_time_ms: Optional[int] = Field(None, description="CPU time of the run (ms)")
+    peak_memory_kb: Optional[int] = Field(None, description="Peak memory of the run (KB)")
 
 
 class SolutionTestResultsResponse(BaseModel):
@@ -106,17 +110,22 @@ class SolutionPeerReviewsResponse(BaseModel):
 
 
 
-def _get_test_status(actual_output: str, expected_output: Optional[str]) -> str:
+def _get_test_status(actual_output: str, expected_output: Optional[str], passed: Optional[bool] = None) -> str:
     """
     Determine test status.
     
     Args:
         actual_output: Output generated by student's code
         expected_output: Expected output from the test
+        passed: Verdict stored when the solution was judged (StudentSolutionTest.passed);
+            outputs are only compared for rows stored without one
     
     Returns:
         Status string: 'Passed', 'Failed', or 'Unknown'
     """
+    if passed is not None:
+        return "Passed" if passed else "Failed"
+
     if expected_output is None:
         # If no expected output is defined, we cannot determine pass/fail
         return "Unknown"
@@ -388,7 +397,7 @@ router = APIRouter(
 def get_solution_test_results(
     current_user: Annotated[dict, Depends(get_current_user)],
     solution_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> SolutionTestResultsResponse:
     """
     Get all test results for a specific student solution.
@@ -501,7 +510,8 @@ def get_solution_test_results(
             # Compare actual output with expected
             status_str = _get_test_status(
                 test_result.test_output,
-                teacher_test.test_out
+                teacher_test.test_out,
+                test_result.passed
             )
             
             if status_str == "Passed":
@@ -516,7 +526,11 @@ def get_solution_test_results(
                 expected_output=teacher_test.test_out,
                 actual_output=test_result.test_output,
                 status=status_str,
-                comment=None  # Teacher tests don't have comments
+                comment=None,  # Teacher tests don't have comments
+                checker_mode=test_result.checker_mode,
+                wall_time_ms=test_result.wall_time_ms,
+                cpu_time_ms=test_result.cpu_time_ms,
+                peak_memory_kb=test_result.peak_memory_kb
             ))
             
         elif test_result.student_test_id is not None:
@@ -529,7 +543,8 @@ def get_solution_test_results(
             # Compare actual output
             status_str = _get_test_status(
                 test_result.test_output,
-                student_test.test_out
+                student_test.test_out,
+                test_result.passed
             )
             
             test_results_data.append(TestResultResponse(
@@ -541,7 +556,11 @@ def get_solution_test_results(
                 expected_output=student_test.test_out,
                 actual_output=test_result.test_output,
                 status=status_str,
-                comment=student_test.reviewer_comment  # Include reviewer's comment if present
+                comment=student_test.reviewer_comment,  # Include reviewer's comment if present
+                checker_mode=test_result.checker_mode,
+                wall_time_ms=test_result.wall_time_ms,
+                cpu_time_ms=test_result.cpu_time_ms,
+                peak_memory_kb=test_result.peak_memory_kb
             ))    
     
     # Calculate scores
@@ -598,7 +617,7 @@ def get_solution_test_results(
 def get_solution_peer_reviews(
     current_user: Annotated[dict, Depends(get_current_user)],
     solution_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> SolutionPeerReviewsResponse:
     """
     Get all peer reviews for a specific student solution.
@@ -707,7 +726,7 @@ def get_student_solution_id(
     current_user: Annotated[dict, Depends(get_current_user)],
     student_id: int,
     game_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> StudentSolutionIdResponse:
     """
     Get the solution ID for a specific student in a game session.
@@ -979,7 +998,7 @@ def get_game_session_scores_list(db: Session, game_id: int) -> List[Tuple[int, s
 def get_all_game_session_scores(
     current_user: Annotated[dict, Depends(get_current_user)],
     game_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> List[Tuple[int, str, float]]:
     """
     Get all session scores for a specific game session.
@@ -1017,7 +1036,7 @@ def get_student_session_score(
     current_user: Annotated[dict, Depends(get_current_user)],
     student_id: int,
     game_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> StudentSessionScoreResponse:
     """
     Get the session score for a specific student in a game session.
@@ -1,16 +1,15 @@
 from typing import List, Optional, Annotated
 from fastapi import APIRouter, HTTPException, status, Depends
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
-from database import get_db
+from database import get_db, get_read_db
 from authentication.routes.auth_routes import get_current_user
 from authentication.repositories.user_repository import UserRepository
-from student_results_api import _get_test_status
 from leaderboard_api import _get_all_student_scores_from_db, _assign_ranks
 from models import (
     StudentSolution,
-    StudentSolutionTest,
     Match,
     GameSession,
     Teacher,
@@ -50,9 +49,9 @@ class UserProfileResponse(BaseModel):
     summary="Get current user profile",
     description="Returns detailed profile information for the authenticated user."
 )
-async def get_user_profile(
+def get_user_profile(
     current_user: Annotated[dict, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ) -> UserProfileResponse:
     user_id = int(current_user["sub"])
     role = current_user.get("role", "student")
@@ -91,23 +90,16 @@ async def get_user_profile(
                     profile.score = entry.score
                     break
             
-            # Fetch student stats
-            solutions = db.query(StudentSolution).filter(StudentSolution.student_id == student.student_id).all()
-            profile.total_matches_played = len(solutions)
-            
-            # Calculate total tests passed and run
-            from models import Test
-            test_results = db.query(
-                StudentSolutionTest.test_output,
-                Test.test_out
-            ).join(
-                StudentSolution, StudentSolution.solution_id == StudentSolutionTest.solution_id
-            ).join(
-                Test, Test.test_id == StudentSolutionTest.teacher_test_id
-            ).filter(StudentSolution.student_id == student.student_id).all()
-            
-            profile.total_tests_run = len(test_results)
-            profile.total_tests_passed = sum(1 for out, expected in test_results if _get_test_status(out, expected) == "Passed")
+            # Fetch student stats (counters kept up to date by phase one)
+            matches_played, tests_run, tests_passed = db.query(
+                func.count(StudentSolution.solution_id),
+                func.coalesce(func.sum(StudentSolution.tests_run), 0),
+                func.coalesce(func.sum(StudentSolution.tests_passed), 0)
+            ).filter(StudentSolution.student_id == student.student_id).one()
+
+            profile.total_matches_played = matches_played
+            profile.total_tests_run = tests_run
+            profile.total_tests_passed = tests_passed
     
     elif role == "teacher":
         # For teachers, find how many matches/sessions they created
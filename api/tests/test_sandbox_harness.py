@@ -0,0 +1,80 @@
+"""
+Regression tests of the Python sandbox harness (api/src/sandbox_harness.py).
+
+The harness runs directly, without nsjail, through code_runner._stream_batch():
+    cd api && python -m unittest discover tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from code_runner import _stream_batch  # noqa: E402
+
+HARNESS_PATH = os.path.join(SRC_DIR, "sandbox_harness.py")
+
+# Walks up the stack of the harness looking for the judge's data, like
+# sys._getframe().f_back....f_locals['expected'], and prints what it finds
+FRAME_WALKING_PROGRAM = textwrap.dedent("""
+    import sys
+
+    found = []
+    frame = sys._getframe()
+    while frame is not None:
+        for name in ("expected", "expected_outputs", "cases"):
+            if name in frame.f_locals:
+                found.append(repr(frame.f_locals[name]))
+        found.extend(repr(value) for value in frame.f_locals.values())
+        frame = frame.f_back
+    print(" ".join(found))
+""")
+
+
+class FrameWalkingTest(unittest.TestCase):
+    def run_batch(self, program, inputs, expected_outputs):
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as program_file:
+            program_file.write(program)
+        self.addCleanup(os.remove, program_file.name)
+
+        proc = subprocess.Popen(
+            [sys.executable, "-I", "-S", "-B", HARNESS_PATH, "--wall-ms", "5000", "--", program_file.name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        try:
+            return list(_stream_batch(proc, inputs, expected_outputs))
+        finally:
+            proc.stdin.close()
+            proc.wait()
+            proc.stdout.close()
+
+    def test_student_code_cannot_read_expected_outputs_or_other_tests(self):
+        inputs = ["input-of-test-1\n", "input-of-test-2\n"]
+        expected_outputs = ["hidden-answer-1", "hidden-answer-2"]
+
+        results = self.run_batch(FRAME_WALKING_PROGRAM, inputs, expected_outputs)
+
+        self.assertEqual(len(results), 2)
+        for index, result in enumerate(results):
+            output = result["stdout"] + result["stderr"]
+            self.assertNotIn("hidden-answer", output)
+            self.assertNotEqual(result["stdout"].strip(), expected_outputs[index])
+            other_input = inputs[1 - index].strip()
+            self.assertNotIn(other_input, output)
+
+    def test_diverging_output_is_stopped(self):
+        program = "import time\nx = int(input())\nprint(x * 2, flush=True)\ntime.sleep(3 if x == 5 else 0)\n"
+        results = self.run_batch(program, ["21\n", "5\n"], ["42", "11"])
+
+        self.assertEqual([result["status"] for result in results], ["success", "wrong_answer"])
+        self.assertEqual(results[0]["stdout"], "42\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
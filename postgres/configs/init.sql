@@ -54,6 +54,9 @@ CREATE TABLE capstone_app.teacher (
 --    login_id   INTEGER REFERENCES capstone_app.login(login_id) NOT NULL  --- user story 5 for modification
 );
 
+-- Role lookups of a logged-in user
+CREATE INDEX idx_teacher_user_id ON capstone_app.teacher (user_id);
+
 -- Creation of Match Setting Table & fk match teacher: (User story 1)
 
 DROP TABLE IF EXISTS capstone_app.match_setting;
@@ -70,6 +73,13 @@ CREATE TABLE capstone_app.match_setting (
     function_inputs TEXT, 
     language VARCHAR(20) NOT NULL DEFAULT 'cpp',
     total_points INTEGER NOT NULL DEFAULT 100, 
+    time_limit_ms INTEGER DEFAULT NULL, -- per-test run limits, NULL = judge default
+    cpu_time_limit_ms INTEGER DEFAULT NULL,
+    memory_limit_mb INTEGER DEFAULT NULL,
+    output_limit_kb INTEGER DEFAULT NULL,
+    checker_mode VARCHAR(20) DEFAULT NULL, -- output checker, NULL = exact (see checkers.py)
+    checker_tolerance DOUBLE PRECISION DEFAULT NULL,
+    checker_source TEXT DEFAULT NULL,
     
     creator_id INTEGER REFERENCES capstone_app.teacher(teacher_id)
 );
@@ -87,6 +97,9 @@ CREATE TABLE capstone_app.tests (
     match_set_id INTEGER REFERENCES capstone_app.match_setting(match_set_id) NOT NULL
 );
 
+-- Tests of a match setting, by scope
+CREATE INDEX idx_tests_match_set_scope ON capstone_app.tests (match_set_id, scope);
+
 -- Creation of Match Table & fk match teacher and match setting:  (User story 2)
 
 DROP TABLE IF EXISTS capstone_app.match;
@@ -144,6 +157,8 @@ CREATE TABLE capstone_app.student (
 -- login_id INTEGER REFERENCES capstone_app.login(login_id)
 );
 
+CREATE INDEX idx_student_user_id ON capstone_app.student (user_id);
+
 DROP TABLE IF EXISTS capstone_app.student_tests;
 
 CREATE TABLE capstone_app.student_tests (
@@ -157,6 +172,9 @@ CREATE TABLE capstone_app.student_tests (
 
 );
 
+-- Tests of a match (all students, or one student)
+CREATE INDEX idx_student_tests_match_student ON capstone_app.student_tests (match_for_game_id, student_id);
+
 DROP TABLE IF EXISTS capstone_app.student_solutions;
 
 CREATE TABLE capstone_app.student_solutions (
@@ -164,10 +182,15 @@ CREATE TABLE capstone_app.student_solutions (
     code TEXT NOT NULL,
     has_passed BOOLEAN NOT NULL DEFAULT FALSE,
     passed_test INTEGER DEFAULT 0,
+    tests_run INTEGER NOT NULL DEFAULT 0, -- teacher tests with a stored result
+    tests_passed INTEGER NOT NULL DEFAULT 0, -- of which passed
     match_for_game_id INTEGER REFERENCES capstone_app.matches_for_game(match_for_game_id) NOT NULL,
     student_id INTEGER REFERENCES capstone_app.student(student_id) NOT NULL
 );
 
+-- Solution of a student for a match
+CREATE INDEX idx_student_solutions_student_match ON capstone_app.student_solutions (student_id, match_for_game_id);
+
 DROP TABLE IF EXISTS capstone_app.student_solution_tests;
 
 CREATE TABLE capstone_app.student_solution_tests (
@@ -175,9 +198,17 @@ CREATE TABLE capstone_app.student_solution_tests (
   solution_id INTEGER REFERENCES capstone_app.student_solutions(solution_id) ON DELETE CASCADE ON UPDATE CASCADE,
   teacher_test_id INTEGER REFERENCES capstone_app.tests(test_id) ON DELETE CASCADE ON UPDATE CASCADE,
   student_test_id INTEGER REFERENCES capstone_app.student_tests(test_id) ON DELETE CASCADE ON UPDATE CASCADE,
-  test_output TEXT NOT NULL
+  test_output TEXT NOT NULL,
+  wall_time_ms INTEGER DEFAULT NULL,
+  cpu_time_ms INTEGER DEFAULT NULL,
+  peak_memory_kb INTEGER DEFAULT NULL,
+  output_bytes INTEGER DEFAULT NULL,
+  passed BOOLEAN DEFAULT NULL, -- verdict of the checker, NULL when there is no expected output
+  checker_mode VARCHAR(20) DEFAULT NULL -- checker that gave the verdict
 );
 
+CREATE INDEX idx_student_solution_tests_solution ON capstone_app.student_solution_tests (solution_id);
+
 --- The creation of table for relationship between students and game session: (User Story 5)
 
 DROP TABLE IF EXISTS capstone_app.student_join_game;
@@ -202,6 +233,9 @@ CREATE TABLE capstone_app.student_assigned_review (
     CONSTRAINT uq_student_assigned_review_pair UNIQUE (student_id, assigned_solution_id)
 );
 
+-- Reviews of a solution (the unique pair only serves lookups by reviewer)
+CREATE INDEX idx_student_assigned_review_solution ON capstone_app.student_assigned_review (assigned_solution_id);
+
 
 CREATE TYPE capstone_app.vote AS ENUM ('correct', 'incorrect', 'skip');
 
@@ -546,6 +580,75 @@ CREATE TABLE capstone_app.student_badge (
 GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.badge TO api_user;
 GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.student_badge TO api_user;
 
+-- Judge job queue (compilation and test runs), drained by the judge workers
+
+DROP TABLE IF EXISTS capstone_app.judge_jobs CASCADE;
+
+CREATE TABLE capstone_app.judge_jobs (
+    job_id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL, -- e.g. 'solution', 'custom_test'
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, done, failed
+    priority INTEGER NOT NULL DEFAULT 0, -- higher runs first
+    payload TEXT NOT NULL, -- JSON arguments of the job
+    result TEXT DEFAULT NULL, -- JSON result, when done
+    error TEXT DEFAULT NULL, -- error message, when failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    student_id INTEGER REFERENCES capstone_app.student(student_id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    finished_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+);
+
+-- Claim order of pending jobs
+CREATE INDEX idx_judge_jobs_pending ON capstone_app.judge_jobs (priority DESC, job_id) WHERE status IN ('queued', 'running');
+CREATE INDEX idx_judge_jobs_student_status ON capstone_app.judge_jobs (student_id, status);
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.judge_jobs TO api_user;
+GRANT USAGE, SELECT ON SEQUENCE capstone_app.judge_jobs_job_id_seq TO api_user;
+
+-- Memoized test runs: result of a build (code + compile flags) on a test input
+
+DROP TABLE IF EXISTS capstone_app.judge_run_memo CASCADE;
+
+CREATE TABLE capstone_app.judge_run_memo (
+    memo_id SERIAL PRIMARY KEY,
+    build_key VARCHAR(64) NOT NULL, -- hash of code, compile flags, compiler version and run limits
+    input_hash VARCHAR(64) NOT NULL, -- sha256 of the test input
+    status VARCHAR(20) NOT NULL,
+    exit_code INTEGER NOT NULL,
+    stdout TEXT NOT NULL,
+    stderr TEXT NOT NULL,
+    wall_time_ms INTEGER DEFAULT NULL,
+    cpu_time_ms INTEGER DEFAULT NULL,
+    peak_memory_kb INTEGER DEFAULT NULL,
+    output_bytes INTEGER DEFAULT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_judge_run_memo_build_input UNIQUE (build_key, input_hash)
+);
+
+CREATE INDEX idx_judge_run_memo_created_at ON capstone_app.judge_run_memo (created_at);
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.judge_run_memo TO api_user;
+GRANT USAGE, SELECT ON SEQUENCE capstone_app.judge_run_memo_memo_id_seq TO api_user;
+
+DROP TABLE IF EXISTS capstone_app.reference_outputs CASCADE;
+
+CREATE TABLE capstone_app.reference_outputs (
+    reference_output_id SERIAL PRIMARY KEY,
+    match_set_id INTEGER NOT NULL REFERENCES capstone_app.match_setting(match_set_id) ON DELETE CASCADE,
+    reference_hash VARCHAR(64) NOT NULL, -- sha256 of the reference solution
+    input_hash VARCHAR(64) NOT NULL, -- sha256 of the test input
+    status VARCHAR(20) NOT NULL,
+    exit_code INTEGER NOT NULL,
+    stdout TEXT NOT NULL,
+    stderr TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_reference_outputs_setting_reference_input UNIQUE (match_set_id, reference_hash, input_hash)
+);
+
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE capstone_app.reference_outputs TO api_user;
+GRANT USAGE, SELECT ON SEQUENCE capstone_app.reference_outputs_reference_output_id_seq TO api_user;
+
 -- Insert Badges
 INSERT INTO capstone_app.badge (name, description, icon_path, criteria_type) VALUES
 -- Hall of Fame Top-N
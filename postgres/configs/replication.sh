@@ -0,0 +1,5 @@
+#!/bin/bash
+# Allows streaming replication connections (db-replica in docker-compose.yml)
+# from the backend network; the replica authenticates as POSTGRES_USER.
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"